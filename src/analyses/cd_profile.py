@@ -1,7 +1,6 @@
 from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QGroupBox
 from PyQt6.QtGui import QAction
-from utils.filters import bandpass_filter
-from utils.measurement import Measurement
+from utils.measurement import Measurement, get_sample_selection
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.statistics import normalized_least_squares_slope
 from utils.types import AnalysisType, PlotAnnotation
@@ -34,6 +33,7 @@ analysis_types = ["CD"]
 class AnalysisController(AnalysisControllerBase, ExportMixin):
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     analysis_range_low: float
     analysis_range_high: float
     waterfall_offset: float
@@ -51,6 +51,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
 
         self.set_default('band_pass_low', settings.CD_PROFILE_BAND_PASS_LOW_DEFAULT_1M)
         self.set_default('band_pass_high', settings.CD_PROFILE_BAND_PASS_HIGH_DEFAULT_1M)
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('analysis_range_low', settings.CD_PROFILE_RANGE_LOW_DEFAULT * self.max_dist)
         self.set_default('analysis_range_high', settings.CD_PROFILE_RANGE_HIGH_DEFAULT * self.max_dist)
         self.set_default('confidence_interval', None)
@@ -106,13 +107,14 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
         x = self.measurement.cd_distances[low_index:high_index]
         self.profile_distances = x
 
-        unfiltered_data = [
-            self.measurement.segments[self.channel][sample_idx][low_index:high_index]
-            for sample_idx in self.selected_samples
-        ]
-
-        filtered_data = [bandpass_filter(
-            i, self.band_pass_low, self.band_pass_high, self.fs) for i in unfiltered_data]
+        filtered_data = self.measurement.get_filtered_segments(
+            self.channel,
+            self.band_pass_low,
+            self.band_pass_high,
+            filter_type=self.band_pass_filter_type,
+            low_index=low_index,
+            high_index=high_index,
+        )[get_sample_selection(self.selected_samples, len(self.measurement.segments[self.channel]))]
 
         self.mean_profile = np.mean(filtered_data, axis=0)
         std_error = np.std(filtered_data, axis=0) / np.sqrt(len(filtered_data))
@@ -1,6 +1,5 @@
 from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QGroupBox
 from PyQt6.QtGui import QAction
-from utils.filters import bandpass_filter
 from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
@@ -33,6 +32,7 @@ analysis_types = ["CD"]
 class AnalysisController(AnalysisControllerBase, ExportMixin):
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     analysis_range_low: float
     analysis_range_high: float
     waterfall_offset: float
@@ -49,6 +49,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             'band_pass_low', settings.CD_PROFILE_BAND_PASS_LOW_DEFAULT_1M)
         self.set_default('band_pass_high',
                          settings.CD_PROFILE_BAND_PASS_HIGH_DEFAULT_1M)
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('analysis_range_low',
                          settings.CD_PROFILE_RANGE_LOW_DEFAULT * self.max_dist)
         self.set_default('analysis_range_high',
@@ -99,15 +100,16 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             self.updated.emit()
             return self.canvas
 
-        unfiltered_data = [
-            self.measurement.segments[self.channel][sample_idx][low_index:high_index]
-            for sample_idx in self.selected_samples
-        ]
+        filtered_profiles = self.measurement.get_filtered_segments(
+            self.channel,
+            self.band_pass_low,
+            self.band_pass_high,
+            filter_type=self.band_pass_filter_type,
+            low_index=low_index,
+            high_index=high_index,
+        )[self.selected_samples]
 
-        filtered_data = [bandpass_filter(
-            i, self.band_pass_low, self.band_pass_high, self.fs) for i in unfiltered_data]
-
-        self.mean_profile = np.mean(filtered_data, axis=0)
+        self.mean_profile = np.mean(filtered_profiles, axis=0)
 
         # Calculate waterfall offset as relative to mean profile value (convert percent to fraction)
         mean_profile_value = np.mean(self.mean_profile)
@@ -120,9 +122,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
         ax.set_ylim(1*y_offset, -1 * y_offset * (len(self.selected_samples)))
 
         for offset_index, sample_idx in enumerate(self.selected_samples):
-            unfiltered_data = self.measurement.segments[self.channel][sample_idx][low_index:high_index]
-            filtered_data = bandpass_filter(
-                unfiltered_data, self.band_pass_low, self.band_pass_high, self.fs)
+            filtered_data = filtered_profiles[offset_index].copy()
 
             # Remove mean
 
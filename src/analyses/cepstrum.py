@@ -19,6 +19,7 @@ from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
 from utils.signal_processing import safe_spectral_params
+from utils.spectral import get_profile_stack, mean_welch
 import matplotlib.patches as mpatches
 from scipy.signal import welch
 import numpy as np
@@ -204,15 +205,13 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
 
             x = self.measurement.cd_distances[self.low_index:self.high_index]
 
-            unfiltered_data = [
-                np.asarray(
-                    self.measurement.segments[self.channel][sample_idx][self.low_index:self.high_index],
-                    dtype=float,
-                )
-                for sample_idx in self.selected_samples
-                if 0 <= sample_idx < len(self.measurement.segments[self.channel])
-            ]
-            if not unfiltered_data:
+            unfiltered_data = get_profile_stack(
+                self.measurement.segments[self.channel],
+                self.selected_samples,
+                self.low_index,
+                self.high_index,
+            )
+            if len(unfiltered_data) == 0:
                 self.canvas.draw()
                 self.updated.emit()
                 return self.canvas
@@ -229,18 +228,14 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             nperseg, noverlap = spectral_params
 
             # Calculate individual power spectra, then use the mean. This to prevent opposite phases canceling each other.
-            spectra = []
-            for y in unfiltered_data:
-                f, profile_pxx = welch(
-                    y,
-                    fs=self.fs,
-                    window='hann',
-                    nperseg=nperseg,
-                    noverlap=noverlap,
-                    scaling='spectrum',
-                )
-                spectra.append(profile_pxx)
-            Pxx = np.mean(spectra, axis=0)
+            f, Pxx = mean_welch(
+                unfiltered_data,
+                fs=self.fs,
+                window='hann',
+                nperseg=nperseg,
+                noverlap=noverlap,
+                scaling='spectrum',
+            )
 
         # --- CEPSTRUM CALCULATION AND PLOTTING ---
         # Use the extracted data segment for cepstrum calculation
@@ -3,6 +3,7 @@ from PyQt6.QtGui import QAction
 from scipy.stats import pearsonr
 from utils.measurement import Measurement
 from utils.filters import bandpass_filter
+from utils.signal_processing import cross_correlation_lag
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
 from gui.components import (
@@ -29,6 +30,7 @@ class AnalysisController(AnalysisControllerBase):
     show_unfiltered_data: bool
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     analysis_range_low: float
     analysis_range_high: float
 
@@ -59,28 +61,41 @@ class AnalysisController(AnalysisControllerBase):
         self.set_default('show_unfiltered_data', False)
         self.set_default('band_pass_low', config["band_pass_low"])
         self.set_default('band_pass_high', config["band_pass_high"])
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('analysis_range_low', config["analysis_range_low"] * self.max_dist)
         self.set_default('analysis_range_high', config["analysis_range_high"] * self.max_dist)
 
+    def calculate_cross_correlation(self, data1, data2, sample_step):
+        """
+        Cross-correlate the channels over lags up to CHANNEL_CORRELATION_XCORR_MAX_LAG.
+
+        :return: Tuple of lags and offset of the maximum in display units, and the normalized correlation at each lag.
+        """
+        max_lag = None
+        if settings.CHANNEL_CORRELATION_XCORR_MAX_LAG is not None:
+            max_lag = int(round(settings.CHANNEL_CORRELATION_XCORR_MAX_LAG / sample_step))
+        lags, correlation, peak_lag = cross_correlation_lag(data1, data2, max_lag)
+        unit_step = sample_step * settings.CORRELATION_ANALYSIS_DISPLAY_UNIT_MULTIPLIER
+        return lags * unit_step, correlation, peak_lag * unit_step
+
     def calculate_max_cross_correlation_offset(self, data1, data2, sample_step):
-        corr = np.correlate(data1 - np.mean(data1),
-                            data2 - np.mean(data2), mode='full')
-        max_corr_idx = np.argmax(corr) - (len(data1) - 1)
-        offset_meters = max_corr_idx * sample_step * \
-            settings.CORRELATION_ANALYSIS_DISPLAY_UNIT_MULTIPLIER
-        return offset_meters
+        _, _, offset = self.calculate_cross_correlation(data1, data2, sample_step)
+        return offset
 
     def plot(self):
         self.figure.clear()
 
-        ax_correlation = self.figure.add_subplot(211)
+        xcorr_output = settings.CHANNEL_CORRELATION_XCORR_OUTPUT
+        num_plots = 3 if xcorr_output else 2
+
+        ax_correlation = self.figure.add_subplot(num_plots, 1, 1)
         ax_correlation.set_xlabel(
             f"{self.channel} [{self.measurement.units[self.channel]}]")
         ax_correlation.set_ylabel(
             f"{self.channel2} [{self.measurement.units[self.channel2]}]")
         ax_correlation.grid()
 
-        ax1 = self.figure.add_subplot(212)
+        ax1 = self.figure.add_subplot(num_plots, 1, 2)
 
         # Plot for the first channel
         data1 = self.plotChannelData(ax1, self.channel, 'tab:blue')
@@ -119,11 +134,21 @@ class AnalysisController(AnalysisControllerBase):
             ax_correlation.set_title(
                 f"Correlation coefficient: {corr_coeff:.2f}")
 
-        if settings.CHANNEL_CORRELATION_XCORR_OUTPUT:
-            max_offset = self.calculate_max_cross_correlation_offset(
+        if xcorr_output:
+            lags, correlation, max_offset = self.calculate_cross_correlation(
                 data1, data2, self.measurement.sample_step)
             logging.info(f"Cross-correlation max at {max_offset:.2f} m ({1000*max_offset:.2f} mm)")
 
+            ax_lag = self.figure.add_subplot(num_plots, 1, 3)
+            ax_lag.plot(lags, correlation)
+            ax_lag.axvline(max_offset, color='red', linestyle='--')
+            ax_lag.set_xlabel(
+                f"Lag [{settings.CORRELATION_ANALYSIS_DISPLAY_UNIT}]")
+            ax_lag.set_ylabel("Cross-correlation")
+            ax_lag.set_title(
+                f"Cross-correlation max at {max_offset:.3f} {settings.CORRELATION_ANALYSIS_DISPLAY_UNIT}")
+            ax_lag.grid()
+
         self.canvas.draw()
         self.updated.emit()
 
@@ -139,8 +164,10 @@ class AnalysisController(AnalysisControllerBase):
 
             x = self.measurement.distances[low_index:high_index]
             unfiltered_data = self.measurement.channel_df[channel][low_index:high_index]
-            filtered_data = bandpass_filter(
-                unfiltered_data, self.band_pass_low, self.band_pass_high, self.fs)
+            filtered_data = self.measurement.get_filtered_channel(
+                channel, self.band_pass_low, self.band_pass_high,
+                filter_type=self.band_pass_filter_type,
+                low_index=low_index, high_index=high_index)
         elif self.window_type == "CD":
             low_index = np.searchsorted(
                 self.measurement.cd_distances, self.analysis_range_low)
@@ -149,21 +176,16 @@ class AnalysisController(AnalysisControllerBase):
 
             x = self.measurement.cd_distances[low_index:high_index]
 
-            profiles = [
-                np.asarray(
-                    self.measurement.segments[channel][sample_idx][low_index:high_index],
-                    dtype=float,
-                )
-                for sample_idx in self.selected_samples
-                if 0 <= sample_idx < len(self.measurement.segments[channel])
-            ]
-            if not profiles:
+            profiles = self.measurement.get_segment_stack(
+                channel, self.selected_samples, low_index, high_index)
+            if len(profiles) == 0:
                 return np.array([])
 
             unfiltered_data = np.mean(profiles, axis=0)
 
             filtered_data = bandpass_filter(
-                unfiltered_data, self.band_pass_low, self.band_pass_high, self.fs)
+                unfiltered_data, self.band_pass_low, self.band_pass_high, self.fs,
+                filter_type=self.band_pass_filter_type)
 
         x = np.asarray(x, dtype=float)
         unfiltered_data = np.asarray(unfiltered_data, dtype=float)
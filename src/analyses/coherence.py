@@ -4,6 +4,7 @@ from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
 from utils.signal_processing import hs_units, safe_spectral_params
+from utils.spectral import get_profile_stack, mean_coherence
 from utils.plot_formatting import wavelength_labels_cm_from_frequencies
 from utils import store
 from gui.components import (
@@ -218,14 +219,18 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             nperseg, noverlap = spectral_params
 
             # Calculate coherence
-            f, Cxy = coherence(
-                data1_norm,
-                data2_norm,
-                fs=self.fs,
-                window=self.spectral_window,
-                nperseg=nperseg,
-                noverlap=noverlap
-            )
+            f, Cxy = self.get_cached_spectral_result(
+                "coherence",
+                [self.channel, self.channel2],
+                dict(fs=self.fs, window=self.spectral_window, nperseg=nperseg, noverlap=noverlap),
+                lambda: coherence(
+                    data1_norm,
+                    data2_norm,
+                    fs=self.fs,
+                    window=self.spectral_window,
+                    nperseg=nperseg,
+                    noverlap=noverlap
+                ))
             # ax.plot(f, Cxy)
 
         elif self.window_type == "CD":
@@ -241,18 +246,18 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
                 return self.canvas
 
             x = self.measurement.cd_distances[self.low_index:self.high_index]
-            sample_pairs = [
-                (
-                    self.measurement.segments[self.channel][sample_idx][self.low_index:self.high_index],
-                    self.measurement.segments[self.channel2][sample_idx][self.low_index:self.high_index],
-                )
-                for sample_idx in self.selected_samples
+            selected_samples = [
+                sample_idx for sample_idx in self.selected_samples
                 if (
                     0 <= sample_idx < len(self.measurement.segments[self.channel])
                     and 0 <= sample_idx < len(self.measurement.segments[self.channel2])
                 )
             ]
-            if not sample_pairs:
+            profiles1 = get_profile_stack(
+                self.measurement.segments[self.channel], selected_samples, self.low_index, self.high_index)
+            profiles2 = get_profile_stack(
+                self.measurement.segments[self.channel2], selected_samples, self.low_index, self.high_index)
+            if len(profiles1) == 0 or len(profiles2) == 0:
                 self.canvas.draw()
                 self.updated.emit()
                 return self.canvas
@@ -260,7 +265,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             spectral_params = safe_spectral_params(
                 self.nperseg,
                 self.overlap,
-                min(len(sample_pairs[0][0]), len(sample_pairs[0][1])),
+                min(profiles1.shape[-1], profiles2.shape[-1]),
             )
             if spectral_params is None:
                 self.canvas.draw()
@@ -268,28 +273,24 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
                 return self.canvas
             nperseg, noverlap = spectral_params
 
-            spectra = []
-            for data1, data2 in sample_pairs:
-                data1_norm = normalize_for_coherence(data1)
-                data2_norm = normalize_for_coherence(data2)
-                if data1_norm is None or data2_norm is None:
-                    continue
-                f, sample_cxy = coherence(
-                    data1_norm,
-                    data2_norm,
+            mean_cxy = self.get_cached_spectral_result(
+                "coherence",
+                [self.channel, self.channel2],
+                dict(fs=self.fs, window=self.spectral_window, nperseg=nperseg, noverlap=noverlap),
+                lambda: mean_coherence(
+                    profiles1,
+                    profiles2,
                     fs=self.fs,
                     window=self.spectral_window,
                     nperseg=nperseg,
                     noverlap=noverlap
-                )
-                spectra.append(sample_cxy)
-
-            if not spectra:
+                ))
+            if mean_cxy is None:
                 self.canvas.draw()
                 self.updated.emit()
                 return self.canvas
 
-            Cxy = np.mean(spectra, axis=0)
+            f, Cxy = mean_cxy
             # ax.plot(f, Cxy)
 
         f_low_index = np.searchsorted(f, self.frequency_range_low)
@@ -5,6 +5,8 @@ from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.plot_formatting import apply_compact_tick_formatting
 from utils.types import AnalysisType, PlotAnnotation
 from utils.filters import bandpass_filter
+from utils.statistics import StreamingCovariance, pairwise_histograms
+from matplotlib import colors
 import matplotlib.patheffects as path_effects
 from gui.components import (
     AnalysisRangeMixin,
@@ -25,6 +27,7 @@ analysis_types = ["MD", "CD"]
 class AnalysisController(AnalysisControllerBase):
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     analysis_range_low: float
     analysis_range_high: float
     selected_samples: list[int]
@@ -50,6 +53,7 @@ class AnalysisController(AnalysisControllerBase):
 
         self.set_default('band_pass_low', config["band_pass_low"])
         self.set_default('band_pass_high', config["band_pass_high"])
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('analysis_range_low', config["analysis_range_low"])
         self.set_default('analysis_range_high', config["analysis_range_high"])
         self.set_default('selected_samples', self.measurement.selected_samples.copy())
@@ -62,11 +66,11 @@ class AnalysisController(AnalysisControllerBase):
         self.figure.clear()
 
         def apply_bandpass_to_dataframe(df, lowcut, highcut, fs):
-            filtered_df = pd.DataFrame()
-            for column in df.columns:
-                filtered_df[column] = bandpass_filter(
-                    df[column], lowcut, highcut, fs)
-            return filtered_df
+            # Filter all channels as one stack of rows
+            filtered = bandpass_filter(
+                df.to_numpy(dtype=float).T, lowcut, highcut, fs,
+                filter_type=self.band_pass_filter_type)
+            return pd.DataFrame(np.asarray(filtered).T, columns=df.columns)
 
         if self.window_type == "MD":
             low_index = np.searchsorted(
@@ -90,15 +94,13 @@ class AnalysisController(AnalysisControllerBase):
             high_index = np.searchsorted(
                 self.measurement.cd_distances, self.analysis_range_high, side='right')
 
-            cd_data_frame = pd.DataFrame(index=range(low_index, high_index))
-
-            for channel in self.measurement.channels:
-                segments = [
-                    self.measurement.segments[channel][sample_idx][low_index:high_index]
-                    for sample_idx in self.selected_samples
-                ]
-                channel_data = np.mean(segments, axis=0)
-                cd_data_frame[channel] = channel_data
+            profiles = self.measurement.get_segment_stack(
+                self.measurement.channels, self.selected_samples, low_index, high_index)
+            cd_data_frame = pd.DataFrame(
+                np.mean(profiles, axis=1).T,
+                index=range(low_index, low_index + profiles.shape[-1]),
+                columns=self.measurement.channels,
+            )
 
             data_slice = apply_bandpass_to_dataframe(
                 cd_data_frame, self.band_pass_low, self.band_pass_high, self.fs)
@@ -110,26 +112,54 @@ class AnalysisController(AnalysisControllerBase):
             return self.canvas
 
         self.data_slice = data_slice
-        correlation_matrix = data_slice.corr()
+        channels = list(data_slice.columns)
+        values = data_slice.to_numpy(dtype=float)
+        block_size = settings.CORRELATION_MATRIX_BLOCK_SIZE
+
+        # Exact statistics of all rows, accumulated block by block
+        statistics = StreamingCovariance(len(channels))
+        for start in range(0, len(values), block_size):
+            statistics.update(values[start:start + block_size])
+        if statistics.count < 2:
+            logging.info("Not enough finite data available for correlation matrix plot.")
+            self.canvas.draw()
+            self.updated.emit()
+            return self.canvas
 
-        channels = data_slice.columns
+        correlation_matrix = statistics.correlation()
+        self.correlation_matrix = pd.DataFrame(correlation_matrix, index=channels, columns=channels)
         for i in range(len(channels)):
             for j in range(i + 1, len(channels)):
                 channel_x = channels[i]
                 channel_y = channels[j]
-                correlation_value = correlation_matrix.iloc[i, j]
+                correlation_value = correlation_matrix[i, j]
                 print(f"{channel_x} to {channel_y} correlation: {
                       correlation_value:.2f}")
 
-        # or use .sample(n=500) for a fixed number of points
-        sampled_data_slice = data_slice.sample(
-            n=settings.CORRELATION_MATRIX_SAMPLE_LIMIT, replace=True)
-
-        axes = pd.plotting.scatter_matrix(sampled_data_slice,
-                                          alpha=0.2,
-                                          figsize=(8, 8),
-                                          ax=self.figure,
-                                          diagonal="hist", hist_kwds={"bins": settings.CORRELATION_MATRIX_HISTOGRAM_BINS})
+        # Density rasters of all rows instead of a scatter plot of a subsample
+        lows = np.where(statistics.maximum > statistics.minimum, statistics.minimum, statistics.minimum - 0.5)
+        highs = np.where(statistics.maximum > statistics.minimum, statistics.maximum, statistics.maximum + 0.5)
+        pair_counts, channel_counts = pairwise_histograms(
+            values, lows, highs, settings.CORRELATION_MATRIX_DENSITY_BINS, block_size,
+            channel_bins=settings.CORRELATION_MATRIX_HISTOGRAM_BINS)
+
+        axes = self.figure.subplots(len(channels), len(channels), squeeze=False)
+        for i, channel_y in enumerate(channels):
+            for j, channel_x in enumerate(channels):
+                ax = axes[i, j]
+                if i == j:
+                    edges = np.linspace(lows[i], highs[i], settings.CORRELATION_MATRIX_HISTOGRAM_BINS + 1)
+                    ax.stairs(channel_counts[i], edges, fill=True)
+                else:
+                    counts = pair_counts[i, j]
+                    ax.imshow(np.ma.masked_equal(counts, 0), origin='lower', aspect='auto',
+                              interpolation='nearest', extent=[lows[j], highs[j], lows[i], highs[i]],
+                              cmap=settings.CORRELATION_MATRIX_COLORMAP,
+                              norm=colors.LogNorm(vmin=1, vmax=max(counts.max(), 1)))
+                ax.set_xlim(lows[j], highs[j])
+                ax.tick_params(labelbottom=i == len(channels) - 1, labelleft=j == 0 and i != j)
+                ax.set_xlabel(channel_x if i == len(channels) - 1 else "")
+                ax.set_ylabel(channel_y if j == 0 else "")
 
         # Adjust font size for axis labels
         max_chars = settings.CORRELATION_MATRIX_TICK_LABEL_TARGET_CHARS
@@ -145,7 +175,7 @@ class AnalysisController(AnalysisControllerBase):
                 if j == 0:  # Leftmost column
                     axes[i, j].yaxis.label.set_fontsize(settings.CORRELATION_MATRIX_LABEL_FONT_SIZE)  # Make y-axis labels smaller
                 if i != j:
-                    annotation = axes[i, j].annotate(f"{correlation_matrix.iloc[i, j]:.2f}", (0.5, 0.5),
+                    annotation = axes[i, j].annotate(f"{correlation_matrix[i, j]:.2f}", (0.5, 0.5),
                                         xycoords='axes fraction',
                                         ha='center',
                                         va='center',
@@ -156,8 +186,6 @@ class AnalysisController(AnalysisControllerBase):
                         path_effects.Stroke(linewidth=2.5, foreground='white'),
                         path_effects.Normal()
                     ])
-                if i < j:
-                    axes[i, j].set_visible(True)
 
         if tick_formatters:
             label_width = max(formatter.label_width for formatter in tick_formatters)
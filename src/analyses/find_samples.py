@@ -7,11 +7,12 @@ from PyQt6.QtWidgets import (QVBoxLayout, QHBoxLayout, QTableWidget,
 from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
-from utils.filters import bandpass_filter
+from utils.envelope import EnvelopeLine
 from gui.components import ChannelMixin, BandPassFilterMixin, ExtraQLabeledDoubleRangeSlider
 from matplotlib.backend_bases import MouseButton
 import settings
 import json
+import numpy as np
 
 analysis_name = "Find samples"
 analysis_types = ["MD"]
@@ -27,6 +28,7 @@ MOUSE_BUTTON_MAP = {
 class AnalysisController(AnalysisControllerBase):
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     min_length: float
     max_length: float
 
@@ -48,15 +50,16 @@ class AnalysisController(AnalysisControllerBase):
             'band_pass_low', settings.FIND_SAMPLES_BAND_PASS_LOW_DEFAULT_1M)
         self.set_default('band_pass_high',
                          settings.FIND_SAMPLES_BAND_PASS_HIGH_DEFAULT_1M)
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('min_length', settings.CD_SAMPLE_MIN_LENGTH_M)
         self.set_default('max_length', settings.CD_SAMPLE_MAX_LENGTH_M)
 
     def get_filtered_signal(self, channel):
-        filtered_data = bandpass_filter(
-            self.measurement.channel_df[channel],
+        filtered_data = self.measurement.get_filtered_channel(
+            channel,
             self.band_pass_low,
             self.band_pass_high,
-            self.fs,
+            filter_type=self.band_pass_filter_type,
         )
 
         if self.invert_data:
@@ -77,19 +80,30 @@ class AnalysisController(AnalysisControllerBase):
         self.data = self.measurement.channel_df[self.channel]
         self.filtered_data = self.get_filtered_signal(self.channel)
 
+        # The signal is drawn as an envelope that is refined when zooming, inverted data is drawn negated
+        pyramid = self.measurement.get_envelope_pyramid(
+            self.channel, self.band_pass_low, self.band_pass_high,
+            filter_type=self.band_pass_filter_type)
+        y_scale = -1 if self.invert_data else 1
+
         alpha = 0.4 if len(self.measurement.selected_samples) else 1
         # Draw the entire data line with lower alpha
-        ax.plot(self.distances, self.filtered_data,
-                color='tab:blue', alpha=alpha)
+        self.envelope_lines = [EnvelopeLine(
+            ax, self.distances, pyramid,
+            points_per_pixel=settings.PLOT_ENVELOPE_POINTS_PER_PIXEL,
+            y_scale=y_scale, color='tab:blue', alpha=alpha)]
 
         # Highlight the selected samples
         for i in self.measurement.selected_samples:
             if i < len(self.peaks) - 1:
                 start = self.peaks[i]
                 end = self.peaks[i + 1]
-                mask = (self.distances >= start) & (self.distances <= end)
-                ax.plot(
-                    self.distances[mask], self.filtered_data[mask], color='tab:blue', alpha=1.0)
+                self.envelope_lines.append(EnvelopeLine(
+                    ax, self.distances, pyramid,
+                    low_index=np.searchsorted(self.distances, start),
+                    high_index=np.searchsorted(self.distances, end, side='right'),
+                    points_per_pixel=settings.PLOT_ENVELOPE_POINTS_PER_PIXEL,
+                    y_scale=y_scale, color='tab:blue', alpha=1.0))
 
         self.draw_peaks()
         if self.channel == self.measurement.peak_channel:
@@ -153,36 +167,17 @@ class AnalysisController(AnalysisControllerBase):
         if self.threshold is None:
             return self.peaks
 
-        x = self.measurement.distances
-        y = self.get_filtered_signal(channel)
-
-        peaks = []
-        start = None
-
-        min_length_meters = self.min_length
-        last_peak_right_edge = None
-
-        for i in range(len(y)):
-            if y[i] > self.threshold and start is None:
-                start = i
-            elif y[i] <= self.threshold and start is not None:
-                end = i - 1
-                left_edge, right_edge, center = self.estimate_tape_geometry(
-                    x, y, start, end)
-
-                if last_peak_right_edge is None or min_length_meters <= (left_edge - last_peak_right_edge):
-                    peaks.append(center)
-                last_peak_right_edge = right_edge
-                start = None
+        x = np.asarray(self.measurement.distances, dtype=float)
+        y = np.asarray(self.get_filtered_signal(channel), dtype=float)
 
-        if start is not None:
-            end = len(y) - 1
-            left_edge, right_edge, center = self.estimate_tape_geometry(
-                x, y, start, end)
+        starts, ends = self.find_runs_above_threshold(y)
+        left_edges, right_edges, centers = self.estimate_tape_geometries(
+            x, y, starts, ends)
 
-            if last_peak_right_edge is None or min_length_meters <= (left_edge - last_peak_right_edge):
-                peaks.append(center)
-            last_peak_right_edge = right_edge
+        # A tape is kept if it is at least min_length from the previous detected tape
+        keep = np.ones(len(centers), dtype=bool)
+        keep[1:] = self.min_length <= (left_edges[1:] - right_edges[:-1])
+        peaks = centers[keep].tolist()
 
         self.peaks = peaks
         self.measurement.peak_locations = self.peaks.copy()
@@ -191,31 +186,59 @@ class AnalysisController(AnalysisControllerBase):
 
         return peaks
 
-    def interpolate_threshold_crossing(self, x0, y0, x1, y1):
-        if y1 == y0:
-            return (x0 + x1) / 2
-
-        t = (self.threshold - y0) / (y1 - y0)
-        t = max(0.0, min(1.0, t))
-        return x0 + t * (x1 - x0)
-
-    def estimate_tape_geometry(self, x, y, start, end):
-        left_edge = x[start]
-        right_edge = x[end]
-
-        if start > 0:
-            left_edge = self.interpolate_threshold_crossing(
-                x[start - 1], y[start - 1], x[start], y[start])
-
-        if end < len(y) - 1:
-            right_edge = self.interpolate_threshold_crossing(
-                x[end], y[end], x[end + 1], y[end + 1])
+    def find_runs_above_threshold(self, y):
+        """
+        Find runs of samples above the threshold.
+
+        Samples that are not comparable to the threshold (NaN) continue the
+        current run or gap.
+
+        :return: Tuple of arrays of the first and last sample index of each run.
+        """
+        above = y > self.threshold
+        not_comparable = np.isnan(y)
+        if not_comparable.any():
+            # Carry the previous state over samples without one
+            last_valid = np.maximum.accumulate(
+                np.where(not_comparable, 0, np.arange(len(y))))
+            above = above[last_valid] & ~not_comparable[last_valid]
+
+        changes = np.diff(above.view(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(changes == 1)
+        ends = np.flatnonzero(changes == -1) - 1
+        return starts, ends
+
+    def interpolate_threshold_crossings(self, x0, y0, x1, y1):
+        """Interpolate where the lines from (x0, y0) to (x1, y1) cross the threshold."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (self.threshold - y0) / (y1 - y0)
+        t = np.where(np.isnan(t), 1.0, np.clip(t, 0.0, 1.0))
+        return np.where(y1 == y0, (x0 + x1) / 2, x0 + t * (x1 - x0))
+
+    def estimate_tape_geometries(self, x, y, starts, ends):
+        """
+        Estimate the edges and centers of tapes from runs above the threshold.
+
+        :return: Tuple of arrays of left edges, right edges and centers.
+        """
+        left_edges = x[starts].copy()
+        right_edges = x[ends].copy()
+
+        interpolate_left = starts > 0
+        previous = starts[interpolate_left] - 1
+        left_edges[interpolate_left] = self.interpolate_threshold_crossings(
+            x[previous], y[previous], x[previous + 1], y[previous + 1])
+
+        interpolate_right = ends < len(y) - 1
+        last = ends[interpolate_right]
+        right_edges[interpolate_right] = self.interpolate_threshold_crossings(
+            x[last], y[last], x[last + 1], y[last + 1])
 
         # Keep threshold as the source of truth: tape center is the midpoint
         # between the interpolated threshold crossings.
-        center = (left_edge + right_edge) / 2
+        centers = (left_edges + right_edges) / 2
 
-        return left_edge, right_edge, center
+        return left_edges, right_edges, centers
 
     def get_peak_bounds(self, index):
         epsilon = 1e-6
@@ -305,6 +328,9 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], ChannelMixin, BandP
     def __init__(self, controller: AnalysisController, window_type: AnalysisType = "MD"):
         super().__init__(controller, window_type)
         self.original_view_limits = None
+        # Threshold is being dragged with the selector button held down
+        self.dragging_threshold = False
+        self.threshold_dragged = False
         self.initUI()
 
     def initMenuBar(self):
@@ -375,6 +401,8 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], ChannelMixin, BandP
         self.controller.canvas.annotations_enabled = False
         self.controller.canvas.custom_context_menu_handler = self.show_tape_context_menu
         self.controller.canvas.mpl_connect('button_press_event', self.on_click)
+        self.controller.canvas.mpl_connect('motion_notify_event', self.on_threshold_drag)
+        self.controller.canvas.mpl_connect('button_release_event', self.on_release)
         self.controller.canvas.mpl_connect('scroll_event', self.on_scroll)
         self.configure_home_button()
 
@@ -474,7 +502,7 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], ChannelMixin, BandP
         if len(self.controller.peaks) >= 2:
             self.measurement.split_data_to_segments()
         else:
-            self.measurement.segments = {}
+            self.measurement.clear_segments()
             self.measurement.cd_distances = []
 
         self.update_table()
@@ -627,6 +655,8 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], ChannelMixin, BandP
         if self.is_selector_button(event.button):
             if event.ydata is not None:
                 self.set_threshold_and_detect(event.ydata)
+                self.dragging_threshold = True
+                self.threshold_dragged = False
             return
 
         if event.button == MouseButton.LEFT and event.xdata is not None:
@@ -637,6 +667,30 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], ChannelMixin, BandP
             self.controller.set_peak_position(nearest_peak_index, event.xdata)
             self.sync_after_peak_change(preserve_view=True)
 
+    def on_threshold_drag(self, event):
+        if not self.dragging_threshold or event.inaxes not in self.controller.figure.axes or event.ydata is None:
+            return
+
+        # Only redraw the threshold and tapes while dragging, the table and
+        # segments are updated when the button is released
+        self.controller.threshold = event.ydata
+        self.controller.detect_peaks(self.controller.channel)
+        self.controller.draw_threshold()
+        self.controller.draw_peaks()
+        self.controller.canvas.draw_idle()
+        self.threshold_dragged = True
+
+    def on_release(self, event):
+        if not self.dragging_threshold:
+            return
+
+        self.dragging_threshold = False
+        if self.threshold_dragged:
+            self.threshold_dragged = False
+            view_limits = self.get_current_view_limits()
+            self.set_threshold_and_detect(self.controller.threshold)
+            self.restore_view_limits(view_limits)
+
     def on_scroll(self, event):
         if event.xdata is None or event.inaxes not in self.controller.figure.axes:
             return
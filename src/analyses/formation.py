@@ -141,11 +141,7 @@ class AnalysisController(AnalysisControllerBase):
                 self.updated.emit()
                 return self.canvas
 
-            def f(x):
-                return linear(x, *params)
-
-            vectorized_function = np.vectorize(f)
-            estimated_bw = vectorized_function(transmission_data)
+            estimated_bw = linear(transmission_data, *params)
 
             self.correlation_coefficient = safe_correlation(bw_data, estimated_bw)
 
@@ -159,26 +155,14 @@ class AnalysisController(AnalysisControllerBase):
 
             x = self.measurement.cd_distances[low_index:high_index]
 
-            transmission_data = [
-                np.asarray(
-                    self.measurement.segments[self.transmission_channel][sample_idx][low_index:high_index],
-                    dtype=float,
-                )
-                for sample_idx in self.selected_samples
-                if 0 <= sample_idx < len(self.measurement.segments[self.transmission_channel])
-            ]
-            bw_profiles = [
-                np.asarray(
-                    self.measurement.segments[self.bw_channel][sample_idx][low_index:high_index],
-                    dtype=float,
-                )
-                for sample_idx in self.selected_samples
-                if 0 <= sample_idx < len(self.measurement.segments[self.bw_channel])
-            ]
+            transmission_data = self.measurement.get_segment_stack(
+                self.transmission_channel, self.selected_samples, low_index, high_index)
+            bw_profiles = self.measurement.get_segment_stack(
+                self.bw_channel, self.selected_samples, low_index, high_index)
             if (
-                not transmission_data
-                or not bw_profiles
-                or min(len(transmission_data[0]), len(bw_profiles[0])) < max(2, settings.FORMATION_WINDOW_LENGTH)
+                len(transmission_data) == 0
+                or len(bw_profiles) == 0
+                or min(transmission_data.shape[-1], bw_profiles.shape[-1]) < max(2, settings.FORMATION_WINDOW_LENGTH)
             ):
                 self.canvas.draw()
                 self.updated.emit()
@@ -197,21 +181,15 @@ class AnalysisController(AnalysisControllerBase):
                 self.updated.emit()
                 return self.canvas
 
-            def f(x):
-                return linear(x, *params)
-
-            vectorized_function = np.vectorize(f)
-            estimated_bw_profiles = [
-                vectorized_function(i) for i in transmission_data]
+            estimated_bw_profiles = linear(transmission_data, *params)
 
             self.correlation_coefficient = safe_correlation(
                 bw_mean_profile,
                 np.mean(estimated_bw_profiles, axis=0),
             )
-            formation_profiles = [self.calculate_formation_index(estimated_bw)
-                                  for estimated_bw in estimated_bw_profiles]
-            formation_profiles = [profile for profile in formation_profiles if len(profile) > 0]
-            if not formation_profiles:
+            # All selected profiles at once
+            formation_profiles = self.calculate_formation_index(estimated_bw_profiles)
+            if formation_profiles.shape[-1] == 0:
                 self.canvas.draw()
                 self.updated.emit()
                 return self.canvas
@@ -261,20 +239,38 @@ class AnalysisController(AnalysisControllerBase):
         return stats
 
     def calculate_formation_index(self, arr, window_size=settings.FORMATION_WINDOW_LENGTH):
-        arr = np.array(arr)
-        num_values = len(arr) - window_size + 1
+        """
+        Formation index, variance / sqrt(mean), of every window of window_size samples.
+
+        Rolling means and variances are computed from cumulative sums in O(n).
+        arr is a single profile or a 2-D stack of profiles, the index is
+        calculated along the last axis. Windows with a non-positive mean or
+        missing values give 0.
+        """
+        arr = np.asarray(arr, dtype=float)
+        num_values = arr.shape[-1] - window_size + 1
         if num_values <= 0:
-            return np.array([])
-        result = np.empty(num_values)
-
-        for i in range(num_values):
-            window = arr[i:i + window_size]
-            variance = np.var(window)
-            mean_value = np.mean(window)
-            sqrt_mean = np.sqrt(mean_value) if mean_value > 0 else 0
-            result[i] = variance / sqrt_mean if sqrt_mean != 0 else 0
-
-        return result
+            return np.empty(arr.shape[:-1] + (0,))
+
+        missing = ~np.isfinite(arr)
+        # Centering keeps the cumulative sums accurate over long ranges
+        offset = np.zeros(arr.shape[:-1] + (1,))
+        if not missing.all():
+            offset = np.nan_to_num(np.nanmean(np.where(missing, np.nan, arr), axis=-1, keepdims=True))
+        centered = np.where(missing, 0.0, arr - offset)
+
+        def window_sums(values):
+            sums = np.cumsum(values, axis=-1)
+            sums = np.concatenate([np.zeros(arr.shape[:-1] + (1,)), sums], axis=-1)
+            return sums[..., window_size:] - sums[..., :-window_size]
+
+        centered_mean = window_sums(centered) / window_size
+        variance = np.maximum(window_sums(centered ** 2) / window_size - centered_mean ** 2, 0)
+        mean_value = centered_mean + offset
+
+        valid = (mean_value > 0) & (window_sums(missing.astype(float)) == 0)
+        sqrt_mean = np.sqrt(np.where(valid, mean_value, 1))
+        return np.where(valid, variance / sqrt_mean, 0)
 
 
 class AnalysisWindow(AnalysisWindowBase[AnalysisController], AnalysisRangeMixin, SampleSelectMixin, ShowProfilesMixin, CopyPlotMixin, ChildWindowCloseMixin):
@@ -2,6 +2,7 @@ from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
 from utils.signal_processing import harmonic_fitting_units
+from gui.components import SOSMethodMixin
 import numpy as np
 import settings
 
@@ -10,6 +11,7 @@ analysis_types = ["MD"]
 
 class AnalysisController(AnalysisControllerBase):
     selected_freqs: list[float]
+    sos_method: str
 
     def __init__(self, measurement: Measurement, window_type: AnalysisType = "MD", annotations: list[PlotAnnotation] = [], attributes: dict = {}):
         super().__init__(measurement, window_type, annotations, attributes)
@@ -20,6 +22,7 @@ class AnalysisController(AnalysisControllerBase):
         self.set_default('channel', None)
         self.set_default('radius_offset_ratio', 0.5)
         self.set_default('radius_max_multiplier', 1.1)
+        self.set_default('sos_method', settings.SOS_METHOD)
 
     def plot(self):
         data = self.data
@@ -39,7 +42,7 @@ class AnalysisController(AnalysisControllerBase):
         self.figure.clear()
 
         ax = self.figure.add_subplot(111, projection='polar')
-        y = harmonic_fitting_units(data, fs, selected_freq)
+        y = harmonic_fitting_units(data, fs, selected_freq, method=self.sos_method)
 
         # Convert distance to angles (theta) for polar plot
         theta = np.linspace(0, 2*np.pi, len(y), endpoint=False)
@@ -68,7 +71,7 @@ class AnalysisController(AnalysisControllerBase):
         return self.canvas
 
 
-class AnalysisWindow(AnalysisWindowBase[AnalysisController]):
+class AnalysisWindow(AnalysisWindowBase[AnalysisController], SOSMethodMixin):
     def __init__(self, controller: AnalysisController, window_type: AnalysisType = "MD"):
         super().__init__(controller, window_type)
         self.initUI()
@@ -77,6 +80,8 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController]):
         self.setWindowTitle("SOS analysis")
         self.resize(*settings.SOS_ANALYSIS_WINDOW_SIZE)
 
+        self.addSOSMethodSelector(self.main_layout)
+
         # Matplotlib figure and canvas
         self.controller.addPlot(self.main_layout)
 
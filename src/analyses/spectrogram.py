@@ -4,8 +4,10 @@ from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase, Analysis
 from utils.types import AnalysisType, PlotAnnotation
 from utils.signal_processing import hs_units, safe_spectral_params
+from utils.spectral import get_profile_stack, mean_spectrogram, tiled_spectrogram
 import matplotlib.pyplot as plt
 import matplotlib
+from matplotlib import mlab
 from gui.components import (
     AnalysisRangeMixin,
     ChannelMixin,
@@ -104,6 +106,7 @@ class AnalysisController(AnalysisControllerBase):
         ax = self.ax
         self.frequencies = np.array([])
         self.amplitudes = np.empty((0, 0))
+        self.full_spectrum = None
         ax.set_title(f"{self.measurement.measurement_label} ({self.channel})")
         ax.set_xlabel("Distance [m]")
         ax.set_ylabel("Frequency [1/m]")
@@ -131,13 +134,33 @@ class AnalysisController(AnalysisControllerBase):
                 self.updated.emit()
                 return self.canvas
             nperseg, noverlap = spectral_params
-            data_mean_removed = self.data - np.mean(self.data)
 
-            Pxx, freqs, bins, im = ax.specgram(data_mean_removed,
-                                               NFFT=nperseg,
-                                               Fs=self.fs,
-                                               noverlap=noverlap,
-                                               window=np.hanning(nperseg))
+            def compute_spectrogram():
+                data_mean_removed = self.data - np.mean(self.data)
+                return mlab.specgram(data_mean_removed,
+                                     NFFT=nperseg,
+                                     Fs=self.fs,
+                                     noverlap=noverlap,
+                                     window=np.hanning(nperseg))
+
+            tiled_result = None
+            if settings.MD_SPECTROGRAM_TILED:
+                # At most one column per pixel of plot width, from tiles shared by all ranges
+                tiled_result = tiled_spectrogram(
+                    self.measurement.spectral_cache,
+                    ("specgram_tiles", self.channel, self.fs, nperseg, noverlap),
+                    np.asarray(self.measurement.channel_df[self.channel], dtype=float),
+                    self.low_index, self.high_index, self.fs, np.hanning(nperseg), nperseg, noverlap,
+                    max_columns=ax.bbox.width,
+                    tile_columns=settings.MD_SPECTROGRAM_TILE_COLUMNS)
+            if tiled_result is not None:
+                freqs, bins, Pxx = tiled_result
+            else:
+                Pxx, freqs, bins = self.get_cached_spectral_result(
+                    "specgram",
+                    [self.channel],
+                    dict(fs=self.fs, nperseg=nperseg, noverlap=noverlap),
+                    compute_spectrogram)
 
         elif self.window_type == "CD":
             self.low_index = np.searchsorted(
@@ -151,15 +174,13 @@ class AnalysisController(AnalysisControllerBase):
                 return self.canvas
 
             x = self.measurement.cd_distances[self.low_index:self.high_index]
-            unfiltered_data = [
-                np.asarray(
-                    self.measurement.segments[self.channel][sample_idx][self.low_index:self.high_index],
-                    dtype=float,
-                )
-                for sample_idx in self.selected_samples
-                if 0 <= sample_idx < len(self.measurement.segments[self.channel])
-            ]
-            if not unfiltered_data:
+            unfiltered_data = get_profile_stack(
+                self.measurement.segments[self.channel],
+                self.selected_samples,
+                self.low_index,
+                self.high_index,
+            )
+            if len(unfiltered_data) == 0:
                 self.canvas.draw()
                 self.updated.emit()
                 return self.canvas
@@ -180,26 +201,23 @@ class AnalysisController(AnalysisControllerBase):
                 settings, 'SPECTRUM_MODE', 'mean_spectrum_of_profiles')
             if spectrum_mode == 'spectrum_of_mean_profile':
                 # Take mean profile, then spectrogram
-                mean_profile = np.mean(unfiltered_data, axis=0)
-                mean_profile = mean_profile - np.mean(mean_profile)
-                freqs, bins, Pxx = spectrogram(
-                    mean_profile,
-                    fs=self.fs,
-                    window=np.hanning(nperseg),
-                    nperseg=nperseg,
-                    noverlap=noverlap,
-                    mode='psd',
-                    scaling="density"
-                )
+                def compute_spectrogram():
+                    mean_profile = np.mean(unfiltered_data, axis=0)
+                    mean_profile = mean_profile - np.mean(mean_profile)
+                    return spectrogram(
+                        mean_profile,
+                        fs=self.fs,
+                        window=np.hanning(nperseg),
+                        nperseg=nperseg,
+                        noverlap=noverlap,
+                        mode='psd',
+                        scaling="density"
+                    )
             else:
                 # Take spectrogram of each, then calculate mean spectrogram
-                Pxx_sum = None
-                freqs = None
-                bins = None
-                for profile in unfiltered_data:
-                    profile = profile - np.mean(profile)
-                    freqs, bins, Pxx_i = spectrogram(
-                        profile,
+                def compute_spectrogram():
+                    return mean_spectrogram(
+                        unfiltered_data,
                         fs=self.fs,
                         window=np.hanning(nperseg),
                         nperseg=nperseg,
@@ -207,13 +225,16 @@ class AnalysisController(AnalysisControllerBase):
                         mode='psd',
                         scaling="density"
                     )
-                    if Pxx_sum is None:
-                        Pxx_sum = Pxx_i
-                    else:
-                        Pxx_sum += Pxx_i
-                Pxx = Pxx_sum / len(unfiltered_data)
+            freqs, bins, Pxx = self.get_cached_spectral_result(
+                f"spectrogram:{spectrum_mode}",
+                [self.channel],
+                dict(fs=self.fs, nperseg=nperseg, noverlap=noverlap),
+                compute_spectrogram)
 
         amplitudes = np.sqrt(Pxx*2) * settings.SPECTRUM_AMPLITUDE_SCALING
+        # Mean amplitude spectrum over time, reused by frequency refinement
+        if amplitudes.size:
+            self.full_spectrum = (freqs, np.mean(amplitudes, axis=1))
         freq_indices = (freqs >= self.frequency_range_low) & (
             freqs <= self.frequency_range_high)
         freqs_cut = freqs[freq_indices]
@@ -578,7 +599,10 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], AnalysisRangeMixin,
             return
 
         print("Original frequency: ", self.controller.selected_freqs[-1])
-        d = self.measurement.channel_df[self.controller.channel][self.controller.low_index:self.controller.high_index]
+        spectrum = self.controller.full_spectrum
+        d = None
+        if spectrum is None:
+            d = self.measurement.channel_df[self.controller.channel][self.controller.low_index:self.controller.high_index]
         import time
         start_time = time.time()  # Capture start time
 
@@ -588,7 +612,8 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], AnalysisRangeMixin,
         wrange = (plot_max - plot_min) * 0.01
 
         refined = hs_units(d, self.controller.fs, self.controller.selected_freqs[-1],
-                           wrange, plot_min, plot_max, settings.MAX_HARMONICS_DISPLAY)
+                           wrange, plot_min, plot_max, settings.MAX_HARMONICS_DISPLAY,
+                           spectrum=spectrum, interpolate=True)
 
         print(self.controller.fs)
         # Todo: Only search withing the visible window
@@ -5,6 +5,7 @@ from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase, Analysis
 from utils.types import AnalysisType, PlotAnnotation
 from utils.signal_processing import hs_units, safe_spectral_params
+from utils.spectral import get_profile_stack, incremental_welch, mean_welch
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.ticker import AutoMinorLocator, LogLocator
@@ -172,6 +173,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
         ax = self.ax
         self.frequencies = np.array([])
         self.amplitudes = np.array([])
+        self.full_spectrum = None
         self.data = np.array([])
         ax.figure.set_constrained_layout(True)
         ax.set_xlabel("Frequency [1/m]")
@@ -219,12 +221,32 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             # Test with synthetic data: sine wave at 5 Hz amplitude zero-to-peak is 1, RMS 1/sqrt(2) and peak-to-peak 2
             # self.data = np.sin(2 * np.pi * 5 * np.arange(len(self.data)) / self.fs)
 
-            f, Pxx = welch(self.data,
-                           fs=self.fs,
-                           window=self.spectral_window,
-                           nperseg=nperseg,
-                           noverlap=noverlap,
-                           scaling='spectrum')
+            if settings.MD_SPECTRUM_INCREMENTAL_WELCH:
+                def compute_spectrum():
+                    return incremental_welch(
+                        self.measurement.spectral_cache,
+                        ("welch_segments", self.channel, self.fs, self.spectral_window, nperseg, noverlap),
+                        self.measurement.channel_df[self.channel].to_numpy(),
+                        self.low_index,
+                        self.high_index,
+                        fs=self.fs,
+                        window=self.spectral_window,
+                        nperseg=nperseg,
+                        noverlap=noverlap,
+                        scaling='spectrum')
+            else:
+                def compute_spectrum():
+                    return welch(self.data,
+                                 fs=self.fs,
+                                 window=self.spectral_window,
+                                 nperseg=nperseg,
+                                 noverlap=noverlap,
+                                 scaling='spectrum')
+            f, Pxx = self.get_cached_spectral_result(
+                "incremental_welch" if settings.MD_SPECTRUM_INCREMENTAL_WELCH else "welch",
+                [self.channel],
+                dict(fs=self.fs, window=self.spectral_window, nperseg=nperseg, noverlap=noverlap),
+                compute_spectrum)
 
         elif self.window_type == "CD":
 
@@ -242,15 +264,13 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
 
             x = self.measurement.cd_distances[self.low_index:self.high_index]
 
-            unfiltered_data = [
-                np.asarray(
-                    self.measurement.segments[self.channel][sample_idx][self.low_index:self.high_index],
-                    dtype=float,
-                )
-                for sample_idx in self.selected_samples
-                if 0 <= sample_idx < len(self.measurement.segments[self.channel])
-            ]
-            if not unfiltered_data:
+            unfiltered_data = get_profile_stack(
+                self.measurement.segments[self.channel],
+                self.selected_samples,
+                self.low_index,
+                self.high_index,
+            )
+            if len(unfiltered_data) == 0:
                 self.canvas.draw()
                 self.updated.emit()
                 return self.canvas
@@ -277,23 +297,26 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
                 settings, 'SPECTRUM_MODE', 'mean_spectrum_of_profiles')
             if spectrum_mode == 'spectrum_of_mean_profile':
                 # Take mean profile, then spectrum
-                mean_profile = np.mean(unfiltered_data, axis=0)
-                f, Pxx = welch(mean_profile, fs=self.fs, window='hann', nperseg=nperseg,
-                               noverlap=noverlap, scaling='spectrum')
+                def compute_spectrum():
+                    mean_profile = np.mean(unfiltered_data, axis=0)
+                    return welch(mean_profile, fs=self.fs, window='hann', nperseg=nperseg,
+                                 noverlap=noverlap, scaling='spectrum')
             else:
                 # Take spectrum of each, then mean spectrum
-                spectra = []
-                for y in unfiltered_data:
-                    f, profile_pxx = welch(
-                        y,
+                def compute_spectrum():
+                    return mean_welch(
+                        unfiltered_data,
                         fs=self.fs,
                         window='hann',
                         nperseg=nperseg,
                         noverlap=noverlap,
                         scaling='spectrum',
                     )
-                    spectra.append(profile_pxx)
-                Pxx = np.mean(spectra, axis=0)
+            f, Pxx = self.get_cached_spectral_result(
+                f"welch:{spectrum_mode}",
+                [self.channel],
+                dict(fs=self.fs, window='hann', nperseg=nperseg, noverlap=noverlap),
+                compute_spectrum)
 
         f_low_index = np.searchsorted(f, self.frequency_range_low)
         f_high_index = np.searchsorted(
@@ -301,6 +324,8 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
         # Convert power spectral density to amplitude spectrum (sqrt of power)
         amplitude_spectrum = np.sqrt(
             Pxx*2) * settings.SPECTRUM_AMPLITUDE_SCALING
+        # Whole spectrum, reused by frequency refinement
+        self.full_spectrum = (f, amplitude_spectrum)
 
         if self.ax:
             xlim = self.ax.get_xlim()
@@ -797,7 +822,10 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], AnalysisRangeMixin,
         analysisParamsLayout = QVBoxLayout()
         analysisParamsGroup.setLayout(analysisParamsLayout)
         self.controlsPanel.addWidget(analysisParamsGroup)
-        self.addAnalysisRangeSlider(analysisParamsLayout)
+        self.addAnalysisRangeSlider(
+            analysisParamsLayout,
+            live_update=settings.UPDATE_ON_SLIDE or (
+                self.window_type == "MD" and settings.MD_SPECTRUM_INCREMENTAL_WELCH))
         self.addFrequencyRangeSlider(analysisParamsLayout)
         self.addSpectrumLengthSlider(analysisParamsLayout)
         if self.controller.window_type == "MD":
@@ -851,7 +879,10 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], AnalysisRangeMixin,
             return
 
         print("Original frequency: ", selected_freqs[-1])
-        d = self.measurement.channel_df[self.controller.channel][self.controller.low_index:self.controller.high_index]
+        spectrum = self.controller.full_spectrum
+        d = None
+        if spectrum is None:
+            d = self.measurement.channel_df[self.controller.channel][self.controller.low_index:self.controller.high_index]
         import time
         start_time = time.time()  # Capture start time
 
@@ -861,7 +892,8 @@ class AnalysisWindow(AnalysisWindowBase[AnalysisController], AnalysisRangeMixin,
         wrange = (plot_max - plot_min) * 0.01
 
         refined = hs_units(
-            d, self.controller.fs, selected_freqs[-1], wrange, plot_min, plot_max, settings.MAX_HARMONICS_FREQUENCY_ESTIMATOR)
+            d, self.controller.fs, selected_freqs[-1], wrange, plot_min, plot_max, settings.MAX_HARMONICS_FREQUENCY_ESTIMATOR,
+            spectrum=spectrum, interpolate=True)
 
         print(self.controller.fs)
         # Todo: Only search withing the visible window
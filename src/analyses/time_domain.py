@@ -1,8 +1,8 @@
 from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QGroupBox
 from utils.measurement import Measurement
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
-from utils.filters import bandpass_filter
 from utils.statistics import normalized_least_squares_slope
+from utils.envelope import EnvelopeLine, EnvelopePyramid
 from utils.types import PlotAnnotation
 from matplotlib.ticker import AutoMinorLocator
 from gui.components import (
@@ -31,6 +31,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
     analysis_range_high: float
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     machine_speed: float
     show_unfiltered_data: bool
     show_time_labels: bool
@@ -42,6 +43,7 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
         self.set_default('analysis_range_high', settings.TIME_DOMAIN_ANALYSIS_RANGE_HIGH_DEFAULT * self.max_dist)
         self.set_default('band_pass_low', settings.TIME_DOMAIN_BAND_PASS_LOW_DEFAULT_1M)
         self.set_default('band_pass_high', settings.TIME_DOMAIN_BAND_PASS_HIGH_DEFAULT_1M)
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('machine_speed', settings.PAPER_MACHINE_SPEED_DEFAULT)
         self.set_default('show_unfiltered_data', settings.TIME_DOMAIN_SHOW_UNFILTERED_DATA_DEFAULT)
         self.set_default('show_time_labels', settings.TIME_DOMAIN_SHOW_TIME_LABELS_DEFAULT)
@@ -100,8 +102,10 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             self.data = unfiltered_data
         else:
             self.data = np.asarray(
-                bandpass_filter(
-                    unfiltered_data, self.band_pass_low, self.band_pass_high, self.fs),
+                self.measurement.get_filtered_channel(
+                    self.channel, self.band_pass_low, self.band_pass_high,
+                    filter_type=self.band_pass_filter_type,
+                    low_index=low_index, high_index=low_index + common_length),
                 dtype=float,
             ).reshape(-1)
             common_length = min(len(self.distances), len(self.data))
@@ -110,14 +114,28 @@ class AnalysisController(AnalysisControllerBase, ExportMixin):
             unfiltered_data = unfiltered_data[:common_length]
         self.constrain_values()
 
+        # Long signals are drawn as envelopes that are refined when zooming
+        self.envelope_lines = []
         if self.show_unfiltered_data and len(self.distances):
-            ax.plot(self.distances * settings.TIME_DOMAIN_ANALYSIS_DISPLAY_UNIT_MULTIPLIER,
-                    unfiltered_data,
-                    alpha=0.5,
-                    color="gray")
+            self.envelope_lines.append(EnvelopeLine(
+                ax, self.measurement.distances, self.measurement.get_envelope_pyramid(self.channel),
+                low_index=low_index, high_index=low_index + common_length,
+                points_per_pixel=settings.PLOT_ENVELOPE_POINTS_PER_PIXEL,
+                x_scale=settings.TIME_DOMAIN_ANALYSIS_DISPLAY_UNIT_MULTIPLIER,
+                alpha=0.5,
+                color="gray"))
         if len(self.distances):
-            ax.plot(self.distances *
-                    settings.TIME_DOMAIN_ANALYSIS_DISPLAY_UNIT_MULTIPLIER, self.data)
+            if len(unfiltered_data) < 4:
+                pyramid = EnvelopePyramid(self.data)
+            else:
+                pyramid = self.measurement.get_envelope_pyramid(
+                    self.channel, self.band_pass_low, self.band_pass_high,
+                    filter_type=self.band_pass_filter_type,
+                    low_index=low_index, high_index=low_index + common_length)
+            self.envelope_lines.append(EnvelopeLine(
+                ax, self.distances, pyramid, high_index=common_length,
+                points_per_pixel=settings.PLOT_ENVELOPE_POINTS_PER_PIXEL,
+                x_scale=settings.TIME_DOMAIN_ANALYSIS_DISPLAY_UNIT_MULTIPLIER))
 
         if settings.TIME_DOMAIN_FIXED_YLIM_ALL_DATA:
             # fixed y limits based on full unfiltered dataset
@@ -1,7 +1,6 @@
 from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QGroupBox, QCheckBox, QLabel
 from PyQt6.QtGui import QAction
-from utils.filters import bandpass_filter
-from utils.measurement import Measurement
+from utils.measurement import Measurement, get_sample_selection
 from utils.analysis import AnalysisControllerBase, AnalysisWindowBase
 from utils.types import AnalysisType, PlotAnnotation
 from matplotlib.ticker import MaxNLocator
@@ -24,6 +23,7 @@ analysis_types = ["CD"]
 class AnalysisController(AnalysisControllerBase):
     band_pass_low: float
     band_pass_high: float
+    band_pass_filter_type: str
     analysis_range_low: float
     analysis_range_high: float
     remove_cd_variations: bool
@@ -38,6 +38,7 @@ class AnalysisController(AnalysisControllerBase):
 
         self.set_default('band_pass_low', settings.VCA_BAND_PASS_LOW_DEFAULT_1M)
         self.set_default('band_pass_high', settings.VCA_BAND_PASS_HIGH_DEFAULT_1M)
+        self.set_default('band_pass_filter_type', settings.BAND_PASS_FILTER_TYPE)
         self.set_default('analysis_range_low', settings.VCA_RANGE_LOW_DEFAULT * self.max_dist)
         self.set_default('analysis_range_high', settings.VCA_RANGE_HIGH_DEFAULT * self.max_dist)
         self.set_default('remove_cd_variations', settings.VCA_REMOVE_CD_VARIATIONS_DEFAULT)
@@ -60,17 +61,16 @@ class AnalysisController(AnalysisControllerBase):
             self.measurement.cd_distances, self.analysis_range_high, side='right')
 
         # Preparation of data for plotting
-        selected_profiles = [
-            bandpass_filter(
-                self.measurement.segments[self.channel][sample_idx][low_index:high_index],
-                self.band_pass_low,
-                self.band_pass_high,
-                self.fs,
-            )
-            for sample_idx in self.selected_samples
-            if 0 <= sample_idx < len(self.measurement.segments[self.channel])
-        ]
-        self.filtered_data = np.array(selected_profiles)
+        sample_indexes = get_sample_selection(
+            self.selected_samples, len(self.measurement.segments[self.channel]))
+        self.filtered_data = self.measurement.get_filtered_segments(
+            self.channel,
+            self.band_pass_low,
+            self.band_pass_high,
+            filter_type=self.band_pass_filter_type,
+            low_index=low_index,
+            high_index=high_index,
+        )[sample_indexes]
 
         if self.filtered_data.size == 0:
             self.plot_data = np.array([])
@@ -0,0 +1,68 @@
+"""
+Benchmark and frequency response comparison of the band pass filter engines.
+
+Filters random MD channels of increasing length and a stack of CD profiles
+with every engine in settings.BAND_PASS_FILTER_TYPES and reports the filtering
+time. The frequency response of each engine is measured by filtering sine
+waves and comparing the RMS of the middle of the output to the input.
+
+Run from the src directory:
+    python -m benchmarks.bandpass_filters [samples ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+import settings
+from utils.filters import bandpass_filter
+
+DEFAULT_SAMPLES = [100_000, 1_000_000, 5_000_000]
+# Sampling rate in 1/m and a narrow low-frequency band
+FS = 1000.0
+LOWCUT = 0.5
+HIGHCUT = 2.0
+CD_PROFILES = (200, 4000)
+RESPONSE_FREQUENCIES = [0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 20.0, 100.0]
+RESPONSE_SAMPLES = 200_000
+
+
+def time_filter(data, filter_type):
+    start = time.perf_counter()
+    bandpass_filter(data, LOWCUT, HIGHCUT, FS, filter_type=filter_type)
+    return time.perf_counter() - start
+
+
+def measure_response(filter_type, frequency):
+    """Gain in dB of a sine wave at frequency, measured away from the edges."""
+    t = np.arange(RESPONSE_SAMPLES) / FS
+    sine = np.sin(2 * np.pi * frequency * t)
+    filtered = bandpass_filter(sine, LOWCUT, HIGHCUT, FS, filter_type=filter_type, correct_mean=False)
+    middle = slice(RESPONSE_SAMPLES // 4, 3 * RESPONSE_SAMPLES // 4)
+    gain = np.sqrt(np.mean(filtered[middle]**2) / np.mean(sine[middle]**2))
+    return 20 * np.log10(max(gain, 1e-12))
+
+
+def run(samples):
+    filter_types = settings.BAND_PASS_FILTER_TYPES
+    rng = np.random.default_rng(0)
+
+    print(f"Band {LOWCUT} - {HIGHCUT} 1/m at {FS} 1/m sampling rate\n")
+    print(f"{'Data':>18} " + " ".join(f"{filter_type + ' [s]':>14}" for filter_type in filter_types))
+    for num_samples in samples:
+        data = rng.normal(size=num_samples).cumsum()
+        times = [time_filter(data, filter_type) for filter_type in filter_types]
+        print(f"{num_samples:>18} " + " ".join(f"{t:>14.3f}" for t in times))
+    profiles = rng.normal(size=CD_PROFILES).cumsum(axis=1)
+    times = [time_filter(profiles, filter_type) for filter_type in filter_types]
+    label = f"{CD_PROFILES[0]}x{CD_PROFILES[1]} profiles"
+    print(f"{label:>18} " + " ".join(f"{t:>14.3f}" for t in times))
+
+    print(f"\n{'Frequency [1/m]':>18} " + " ".join(f"{filter_type + ' [dB]':>14}" for filter_type in filter_types))
+    for frequency in RESPONSE_FREQUENCIES:
+        gains = [measure_response(filter_type, frequency) for filter_type in filter_types]
+        print(f"{frequency:>18} " + " ".join(f"{gain:>14.1f}" for gain in gains))
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SAMPLES)
@@ -0,0 +1,74 @@
+"""
+Benchmark for loading legacy Tapio .ca2/.da2/.pk2 measurements.
+
+Generates synthetic .da2 files of increasing size next to the calibration and
+header files from test-data and reports the load time and peak traced memory
+of each.
+
+Run from the src directory:
+    python -m benchmarks.legacy_loader [size_mb ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from loaders import tapio
+
+DEFAULT_SIZES_MB = [5, 25, 100, 250]
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "test-data")
+CALIBRATION_FILE = os.path.join(TEST_DATA_DIR, "test_CD.ca2")
+HEADER_FILE = os.path.join(TEST_DATA_DIR, "test_CD.pk2")
+
+
+def get_number_of_channels(cal_file_path):
+    with open(cal_file_path, 'r', encoding='iso-8859-1') as cal_file:
+        sensor_names, _, _ = tapio.read_channel_names_units_from_ca(cal_file)
+    return len(sensor_names)
+
+
+def write_synthetic_data_file(file_path, size_mb, num_channels, rng):
+    """Write random big-endian int16 samples, roughly size_mb megabytes."""
+    num_data_points = int(size_mb * 1024 * 1024) // (2 * num_channels)
+    data = rng.integers(1000, 30000, size=(num_data_points, num_channels), dtype=np.int16)
+    data.astype('>i2').tofile(file_path)
+    return num_data_points
+
+
+def run(sizes_mb):
+    num_channels = get_number_of_channels(CALIBRATION_FILE)
+    rng = np.random.default_rng(0)
+    temp_dir = tempfile.mkdtemp()
+
+    print(f"{'Size [MB]':>10} {'Samples':>12} {'Load [s]':>10} {'MB/s':>10} {'Peak [MB]':>10}")
+    try:
+        cal_file_path = shutil.copy(CALIBRATION_FILE, temp_dir)
+        header_file_path = shutil.copy(HEADER_FILE, temp_dir)
+        for size_mb in sizes_mb:
+            data_file_path = os.path.join(temp_dir, f"benchmark_{size_mb}.da2")
+            num_data_points = write_synthetic_data_file(
+                data_file_path, size_mb, num_channels, rng)
+            file_size_mb = os.path.getsize(data_file_path) / (1024 * 1024)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            tapio.parse_legacy_data(header_file_path, cal_file_path, data_file_path)
+            elapsed = time.perf_counter() - start
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"{file_size_mb:>10.1f} {num_data_points:>12} {elapsed:>10.3f} {file_size_mb / elapsed:>10.1f} {peak_bytes / (1024 * 1024):>10.1f}")
+            os.remove(data_file_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sizes = [float(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_MB
+    run(sizes)
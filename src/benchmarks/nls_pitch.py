@@ -0,0 +1,59 @@
+"""
+Benchmark of the fast NLS fundamental frequency estimator against the exact one.
+
+Generates harmonic signals with noise and a fundamental between the grid
+steps of nls_units, and estimates the fundamental with nls_units (exact NLS
+cost on a grid of settings.NLS_STEP) and fast_nls_units. Reports the time
+and the absolute error of both.
+
+Run from the src directory:
+    python -m benchmarks.nls_pitch [samples ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+import settings
+from utils.signal_processing import fast_nls_units, nls_units
+
+DEFAULT_SAMPLES = [2_000, 10_000, 50_000]
+FS = 100.0
+FUNDAMENTAL = 1.23456
+HARMONICS = 5
+NOISE = 0.5
+
+
+def make_signal(num_samples, rng):
+    t = np.arange(num_samples) / FS
+    x = sum(np.sin(2 * np.pi * FUNDAMENTAL * harmonic * t + harmonic) / harmonic
+            for harmonic in range(1, HARMONICS + 1))
+    return x + rng.normal(scale=NOISE, size=num_samples)
+
+
+def time_estimator(estimator, *args, **kwargs):
+    start = time.perf_counter()
+    estimate = estimator(*args, **kwargs)
+    return time.perf_counter() - start, abs(estimate - FUNDAMENTAL)
+
+
+def run(samples):
+    rng = np.random.default_rng(0)
+    w_initial = FUNDAMENTAL + settings.NLS_RANGE / 3
+    # Warm up imports and FFT plans so that the first row is not skewed
+    fast_nls_units(make_signal(1000, rng), FS, w_initial, settings.NLS_RANGE, HARMONICS)
+
+    print(f"Fundamental {FUNDAMENTAL} at {FS} samples per unit, {HARMONICS} harmonics, "
+          f"search range +-{settings.NLS_RANGE}, exact grid step {settings.NLS_STEP}\n")
+    print(f"{'Samples':>10} {'exact [s]':>12} {'exact error':>12} {'fast [s]':>12} {'fast error':>12}")
+    for num_samples in samples:
+        x = make_signal(num_samples, rng)
+        exact_time, exact_error = time_estimator(
+            nls_units, x, FS, w_initial, settings.NLS_RANGE, settings.NLS_STEP, HARMONICS)
+        fast_time, fast_error = time_estimator(
+            fast_nls_units, x, FS, w_initial, settings.NLS_RANGE, HARMONICS)
+        print(f"{num_samples:>10} {exact_time:>12.3f} {exact_error:>12.2e} {fast_time:>12.3f} {fast_error:>12.2e}")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SAMPLES)
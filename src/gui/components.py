@@ -544,6 +544,32 @@ class BandPassFilterMixin:
         self.bandPassFilterSlider.setValue((band_pass_low, band_pass_high))
         self.bandPassFilterSlider.blockSignals(False)
         self._update_wavelength_label()
+        if hasattr(self, 'bandPassFilterTypeComboBox'):
+            self.initBandPassFilterTypeSelector(block_signals)
+
+    def initBandPassFilterTypeSelector(self, block_signals=False):
+        # Prevent recursive refresh calls when updating values elsewhere
+        self.bandPassFilterTypeComboBox.blockSignals(block_signals)
+        index = self.bandPassFilterTypeComboBox.findText(
+            self.controller.band_pass_filter_type)
+        if index >= 0:
+            self.bandPassFilterTypeComboBox.setCurrentIndex(index)
+        self.bandPassFilterTypeComboBox.blockSignals(False)
+
+    def addBandPassFilterTypeSelector(self, layout):
+        filterTypeLayout = QHBoxLayout()
+        filterTypeLayout.addWidget(QLabel("Filter type"))
+        self.bandPassFilterTypeComboBox = QComboBox()
+        self.bandPassFilterTypeComboBox.addItems(settings.BAND_PASS_FILTER_TYPES)
+        self.initBandPassFilterTypeSelector()
+        self.bandPassFilterTypeComboBox.currentIndexChanged.connect(
+            self.bandPassFilterTypeChanged)
+        filterTypeLayout.addWidget(self.bandPassFilterTypeComboBox)
+        layout.addLayout(filterTypeLayout)
+
+    def bandPassFilterTypeChanged(self):
+        self.controller.band_pass_filter_type = self.bandPassFilterTypeComboBox.currentText()
+        self.refresh()
 
     def addBandPassRangeSlider(self, layout, live_update=settings.UPDATE_ON_SLIDE):
         # Band pass filter range slider
@@ -570,6 +596,35 @@ class BandPassFilterMixin:
 
         self.bandPassFilterSlider.setTracking(True)
 
+        if hasattr(self.controller, 'band_pass_filter_type'):
+            self.addBandPassFilterTypeSelector(layout)
+
+
+class SOSMethodMixin:
+
+    def initSOSMethodSelector(self, block_signals=False):
+        # Prevent recursive refresh calls when updating values elsewhere
+        self.sosMethodComboBox.blockSignals(block_signals)
+        index = self.sosMethodComboBox.findText(self.controller.sos_method)
+        if index >= 0:
+            self.sosMethodComboBox.setCurrentIndex(index)
+        self.sosMethodComboBox.blockSignals(False)
+
+    def addSOSMethodSelector(self, layout):
+        sosMethodLayout = QHBoxLayout()
+        sosMethodLayout.addWidget(QLabel("Method"))
+        self.sosMethodComboBox = QComboBox()
+        self.sosMethodComboBox.addItems(settings.SOS_METHODS)
+        self.initSOSMethodSelector()
+        self.sosMethodComboBox.currentIndexChanged.connect(self.sosMethodChanged)
+        sosMethodLayout.addWidget(self.sosMethodComboBox)
+        sosMethodLayout.addStretch(1)
+        layout.addLayout(sosMethodLayout)
+
+    def sosMethodChanged(self):
+        self.controller.sos_method = self.sosMethodComboBox.currentText()
+        self.refresh()
+
 
 class SampleSelectMixin:
 
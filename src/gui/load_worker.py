@@ -0,0 +1,104 @@
+from typing import Any, Callable, Optional
+
+from PyQt6.QtCore import QEventLoop, QObject, Qt, QThread, pyqtSignal, pyqtSlot
+from PyQt6.QtWidgets import QProgressDialog
+
+from utils.load_progress import LoadProgress, get_overall_fraction
+from utils.measurement import Measurement
+
+PROGRESS_STEPS = 1000
+
+
+class MainThreadInvoker(QObject):
+    """Runs functions on the thread that created it, blocking the calling thread until done."""
+
+    call_requested = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.call_requested.connect(
+            self._call, Qt.ConnectionType.BlockingQueuedConnection)
+
+    @pyqtSlot(object)
+    def _call(self, call: Callable[[], None]):
+        call()
+
+    def run(self, function: Callable[..., Any], *args, **kwargs):
+        if QThread.currentThread() == self.thread():
+            return function(*args, **kwargs)
+
+        result = {}
+
+        def call():
+            try:
+                result["value"] = function(*args, **kwargs)
+            except Exception as e:
+                result["error"] = e
+
+        self.call_requested.emit(call)
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+
+class MeasurementLoadWorker(QThread):
+    """
+    Runs a measurement load function in a background thread.
+
+    The load function receives a LoadProgress whose stage updates are
+    emitted as progress_changed signals on the GUI thread.
+    """
+
+    progress_changed = pyqtSignal(str, float)
+
+    def __init__(self, load: Callable[[LoadProgress], Optional[Measurement]], parent=None):
+        super().__init__(parent)
+        self._load = load
+        self._invoker = MainThreadInvoker()
+        self.progress = LoadProgress(
+            lambda stage, fraction: self.progress_changed.emit(stage or "", fraction),
+            self._invoker.run)
+        self.measurement: Optional[Measurement] = None
+        self.error: Optional[Exception] = None
+
+    def run(self):
+        try:
+            self.measurement = self._load(self.progress)
+        except Exception as e:
+            self.error = e
+
+
+def load_measurement_in_background(load: Callable[[LoadProgress], Optional[Measurement]],
+                                   progress_dialog: QProgressDialog) -> Optional[Measurement]:
+    """
+    Run load in a worker thread while keeping the GUI responsive.
+
+    Returns when loading has finished. Stage progress is shown in
+    progress_dialog and cancelling the dialog cancels the load. Errors raised
+    by load, including LoadCancelledError, are re-raised on the GUI thread.
+    """
+    worker = MeasurementLoadWorker(load)
+    event_loop = QEventLoop()
+
+    def show_progress(stage: str, fraction: float):
+        if not progress_dialog.wasCanceled():
+            progress_dialog.setLabelText(f"{stage}...")
+            progress_dialog.setValue(
+                int(get_overall_fraction(stage, fraction) * PROGRESS_STEPS))
+
+    def cancel():
+        worker.progress.cancel()
+        progress_dialog.setLabelText("Cancelling...")
+
+    progress_dialog.setRange(0, PROGRESS_STEPS)
+    progress_dialog.canceled.connect(cancel)
+    worker.progress_changed.connect(show_progress)
+    worker.finished.connect(event_loop.quit)
+
+    worker.start()
+    event_loop.exec()
+    worker.wait()
+
+    if worker.error is not None:
+        raise worker.error
+    return worker.measurement
@@ -13,6 +13,7 @@ from PyQt6.QtGui import QPixmap, QAction
 from PyQt6.QtCore import Qt, pyqtSlot
 import inspect
 import os
+from typing import Optional
 
 from gui.report import ReportWindow
 from gui.log_window import LogWindow
@@ -22,9 +23,12 @@ from gui.drop_zone import DropZoneWidget
 from gui.custom_settings_dialog import show_custom_settings_dialog
 from utils.types import LoaderModule, ExporterModule
 from utils import store
+from utils import measurement_cache
+from utils.load_progress import LoadProgress, LoadCancelledError
+from gui.load_worker import load_measurement_in_background
 import settings
 from gui.download_handler import prompt_for_url, download_zip_to_temp
-from utils.zip_utils import unpack_zip_to_temp_with_password_prompt
+from utils.zip_utils import ZipSource, get_member_patterns, ALWAYS_EXTRACTED_PATTERNS
 import shutil
 from utils.analysis import Analysis, parse_preconfigured_analyses, PreconfiguredAnalysis
 import json
@@ -53,23 +57,74 @@ class MainWindow(QMainWindow):
             app.aboutToQuit.connect(self._cleanup_temp_dirs)
 
     @staticmethod
-    def _load_data_accepts_parent(load_data):
+    def _load_data_accepts(load_data, argument_name):
         try:
             parameters = inspect.signature(load_data).parameters.values()
         except (TypeError, ValueError):
             return False
 
         return any(
-            parameter.name == "parent"
+            parameter.name == argument_name
             or parameter.kind == inspect.Parameter.VAR_KEYWORD
             for parameter in parameters
         )
 
-    def _load_measurement_data(self, loader_module: LoaderModule, file_paths, parent):
+    @staticmethod
+    def _load_data_accepts_parent(load_data):
+        return MainWindow._load_data_accepts(load_data, "parent")
+
+    def _load_measurement_data(self, loader_module: LoaderModule, file_paths, parent,
+                               progress: Optional[LoadProgress] = None, zip_sources: list[ZipSource] = ()):
         load_data = loader_module.load_data
-        if self._load_data_accepts_parent(load_data):
-            return load_data(file_paths, parent=parent)
-        return load_data(file_paths)
+        loader_name = getattr(loader_module, "__name__", None)
+        # Measurements are cached under the files as they were opened, so ZIP files are only unpacked on a cache miss
+        source_file_paths = file_paths + [zip_source.zip_file_path for zip_source in zip_sources]
+
+        def load():
+            loaded_file_paths = file_paths
+            # The ZIP members loaders use are extracted here, in the loading thread
+            for zip_source in zip_sources:
+                loaded_file_paths = loaded_file_paths + zip_source.extract(
+                    zip_source.pending_members, parent, progress)
+
+            kwargs = {}
+            if self._load_data_accepts_parent(load_data):
+                kwargs["parent"] = parent
+            if progress is not None and self._load_data_accepts(load_data, "progress"):
+                kwargs["progress"] = progress
+            if self._load_data_accepts(load_data, "cache_file_paths"):
+                kwargs["cache_file_paths"] = source_file_paths
+            return load_data(loaded_file_paths, **kwargs)
+
+        if loader_name is None or not measurement_cache.is_cacheable(loader_module):
+            return load()
+        if loader_name == "auto_loader":
+            # Auto loader checks the cache for each loader it tries, but only after unpacking
+            if zip_sources:
+                measurement = measurement_cache.find_cached_measurement(
+                    source_file_paths, self._get_cacheable_loader_names())
+                if measurement is not None:
+                    return measurement
+            return load()
+        return measurement_cache.load_with_cache(source_file_paths, loader_name, load)
+
+    @staticmethod
+    def _get_cacheable_loader_names() -> list[str]:
+        return [
+            loader_name for loader_name, loader in store.loaders.items()
+            if loader_name != "auto_loader" and measurement_cache.is_cacheable(loader)
+        ]
+
+    def _can_load_in_background(self, loader_module: LoaderModule):
+        """
+        Loaders that accept a progress argument report stages, support
+        cancellation and run their dialogs on the GUI thread. Loaders that
+        only accept a parent may open dialogs directly and stay on the GUI
+        thread.
+        """
+        load_data = loader_module.load_data
+        return (self._load_data_accepts(load_data, "progress")
+                or not self._load_data_accepts_parent(load_data))
 
     def initUI(self):
         self.setWindowTitle(f'Tapio Analysis {__version__}')
@@ -209,39 +264,96 @@ class MainWindow(QMainWindow):
                         f"Error cleaning up temporary directory {temp_dir}: {e}")
         self._temp_extraction_dirs = []
 
-    def _preprocess_file_paths(self, file_paths: list[str]) -> list[str]:
-        """Processes a list of file paths. If a ZIP file is found, it's unpacked
-        to a temporary directory, and its contents are added to the list.
-        Non-ZIP files are added directly.
-        Keeps track of temporary directories for later cleanup.
+    def _get_zip_member_patterns(self, loader_module: Optional[LoaderModule] = None):
+        """Returns the patterns of ZIP members that loader_module can use, or that
+        any loader can use if no loader is given. None means all members are needed.
         """
-        processed_paths = []
+        if loader_module is not None and getattr(loader_module, '__name__', None) != 'auto_loader':
+            return get_member_patterns(getattr(loader_module, 'file_types', None))
 
+        member_patterns = []
+        for loader_name, loader in store.loaders.items():
+            if loader_name == 'auto_loader':
+                continue
+            loader_patterns = get_member_patterns(getattr(loader, 'file_types', None))
+            if loader_patterns is None:
+                return None
+            member_patterns.extend(
+                p for p in loader_patterns if p not in member_patterns)
+        return member_patterns or None
+
+    def _track_temp_dir(self, temp_dir_path: Optional[str]):
+        if temp_dir_path and temp_dir_path not in self._temp_extraction_dirs:
+            self._temp_extraction_dirs.append(temp_dir_path)
+
+    def _expand_folders(self, file_paths: list[str]) -> list[str]:
+        """Replaces folders in file_paths with the files in them."""
+        expanded_paths = []
         for file_path in file_paths:
             if os.path.isdir(file_path):
                 print(f"Expanding folder: {file_path}")
-                folder_files = []
                 for root, _, files in os.walk(file_path):
                     for name in sorted(files):
-                        folder_files.append(os.path.join(root, name))
-                if folder_files:
-                    processed_paths.extend(
-                        self._preprocess_file_paths(folder_files))
+                        expanded_paths.append(os.path.join(root, name))
+            else:
+                expanded_paths.append(file_path)
+        return expanded_paths
+
+    def _get_first_file_extension(self, file_paths: list[str]) -> str:
+        """Returns the extension of the first file, looking inside folders and ZIP files."""
+        for file_path in self._expand_folders(file_paths):
+            if not file_path.lower().endswith('.zip'):
+                return os.path.splitext(file_path)[1].lower()
+            try:
+                members = ZipSource(file_path).members
+            except Exception:
                 continue
+            if members:
+                return os.path.splitext(members[0].filename)[1].lower()
+        return ""
+
+    def _preprocess_file_paths(self, file_paths: list[str], loader_module: Optional[LoaderModule] = None) -> tuple[list[str], list[ZipSource]]:
+        """Processes a list of file paths. Folders are replaced by the files in them.
+        ZIP files are opened and their settings files and analysis configurations,
+        which are needed before loading, are unpacked to a temporary directory
+        and added to the list. The other members that loader_module (or any
+        loader) can use are unpacked while loading, from the returned ZIP sources.
+        Non-ZIP files are added directly.
+        Keeps track of temporary directories for later cleanup.
+        """
+        processed_paths = []
+        zip_sources = []
 
-            if file_path.lower().endswith('.zip'):
-                print(f"Unpacking ZIP file: {file_path}")
-                extracted_files, temp_dir_path = unpack_zip_to_temp_with_password_prompt(
-                    file_path, self)
-                if extracted_files:
-                    processed_paths.extend(extracted_files)
-                    if temp_dir_path and temp_dir_path not in self._temp_extraction_dirs:
-                        self._temp_extraction_dirs.append(
-                            temp_dir_path)  # Track for cleanup
-            else:
+        for file_path in self._expand_folders(file_paths):
+            if not file_path.lower().endswith('.zip'):
                 processed_paths.append(file_path)
+                continue
+
+            print(f"Opening ZIP file: {file_path}")
+            try:
+                zip_source = ZipSource(
+                    file_path, self._get_zip_member_patterns(loader_module))
+            except Exception as e:
+                QMessageBox.critical(
+                    self, "Error", f"Invalid or corrupted ZIP file {os.path.basename(file_path)}: {e}")
+                continue
+
+            try:
+                processed_paths.extend(zip_source.extract(
+                    zip_source.get_members(ALWAYS_EXTRACTED_PATTERNS), self))
+            except LoadCancelledError:
+                continue  # Password prompt was cancelled, a message has been shown
+            except Exception as e:
+                QMessageBox.critical(
+                    self, "Extraction Error", f"Failed to extract ZIP file {os.path.basename(file_path)}: {e}")
+                continue
+            finally:
+                self._track_temp_dir(zip_source.temp_dir)
+
+            if zip_source.pending_members:
+                zip_sources.append(zip_source)
 
-        return processed_paths
+        return processed_paths, zip_sources
 
     def loadFiles(self, loader_module: LoaderModule, file_paths=None):
         """Load files using the specified loader module.
@@ -265,9 +377,10 @@ class MainWindow(QMainWindow):
             if not file_paths:  # User canceled
                 return
 
-        processed_file_paths = self._preprocess_file_paths(file_paths)
+        processed_file_paths, zip_sources = self._preprocess_file_paths(
+            file_paths, loader_module)
 
-        if not processed_file_paths:
+        if not processed_file_paths and not zip_sources:
             QMessageBox.information(
                 self, "No Files", "No files were found after processing (e.g., empty ZIP or unpacking error).")
             return
@@ -297,7 +410,7 @@ class MainWindow(QMainWindow):
         # Update processed_file_paths to only include measurement files
         processed_file_paths = measurement_files
 
-        if not processed_file_paths:
+        if not processed_file_paths and not zip_sources:
             if settings_accepted:
                 QMessageBox.information(
                     self, "Settings Applied", "Custom settings were applied, but no measurement files were found to load.")
@@ -308,8 +421,8 @@ class MainWindow(QMainWindow):
 
         json_files = [
             p for p in processed_file_paths if p.lower().endswith('.json')]
-        is_only_json = all(p.lower().endswith('.json')
-                           for p in processed_file_paths)
+        is_only_json = not zip_sources and all(p.lower().endswith('.json')
+                                               for p in processed_file_paths)
 
         # If only JSON files are passed and a measurement is already loaded,
         # try to treat them as analysis files. If that fails, proceed to load them as a new measurement.
@@ -335,16 +448,21 @@ class MainWindow(QMainWindow):
         self.closeAll()
 
         progress_dialog = QProgressDialog(
-            "Loading measurement file(s)...", None, 0, 0, self)
+            "Loading measurement file(s)...", "Cancel", 0, 0, self)
         progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
         progress_dialog.setWindowTitle("Loading...")
-        progress_dialog.setCancelButton(None)
-        # progress_dialog.show() # TODO: Dialog is not displayed due to main thread being blocked
-        QApplication.processEvents()
 
         try:
-            measurement = self._load_measurement_data(
-                loader_module, processed_file_paths, progress_dialog)
+            if self._can_load_in_background(loader_module):
+                measurement = load_measurement_in_background(
+                    lambda progress: self._load_measurement_data(
+                        loader_module, processed_file_paths, progress_dialog, progress, zip_sources),
+                    progress_dialog)
+            else:
+                progress_dialog.setCancelButton(None)
+                QApplication.processEvents()
+                measurement = self._load_measurement_data(
+                    loader_module, processed_file_paths, progress_dialog, zip_sources=zip_sources)
             progress_dialog.close()
 
             # Check if the loader returned None or an invalid measurement
@@ -354,11 +472,17 @@ class MainWindow(QMainWindow):
                 return
 
             store.loaded_measurement = measurement
+        except LoadCancelledError:
+            progress_dialog.close()
+            return
         except Exception as e:
             progress_dialog.close()
             store.loaded_measurement = None
             QMessageBox.critical(self, "Error", f"Error loading data: {e}")
             return
+        finally:
+            for zip_source in zip_sources:
+                self._track_temp_dir(zip_source.temp_dir)
 
         self.refresh()
 
@@ -371,19 +495,12 @@ class MainWindow(QMainWindow):
         if not file_paths:
             return
 
-        processed_file_paths = self._preprocess_file_paths(file_paths)
+        # Find appropriate loader based on file extension of the first file
+        # Note: if a ZIP was dropped, this will be the first file *in* the ZIP.
+        file_extension = self._get_first_file_extension(file_paths)
 
-        if not processed_file_paths:
-            QMessageBox.information(
-                self, "No Files", "No files were found after processing dropped files (e.g., empty ZIP or unpacking error).")
-            return
-
-        # Find appropriate loader based on file extension of the *first processed file*
-        # Note: if a ZIP was dropped, this will be the first file *from* the ZIP.
-        file_extension = os.path.splitext(processed_file_paths[0])[1].lower()
-
-        # Find a suitable loader and load the files
-        self.findLoaderAndLoad(file_extension, processed_file_paths)
+        # Find a suitable loader and load the files, ZIP files are unpacked by loadFiles
+        self.findLoaderAndLoad(file_extension, file_paths)
 
     def handleDropZoneClick(self):
         """Handle clicks on the drop zone by opening a file picker."""
@@ -397,23 +514,9 @@ class MainWindow(QMainWindow):
             file_extension: The file extension to match, or "all" for any loader
             file_paths: Optional list of file paths. If None, will open a file dialog.
         """
+        # ZIP files and folders in file_paths are unpacked by loadFiles.
+        # If file_paths is None, loadFiles opens a file dialog.
         actual_file_paths = file_paths
-        if actual_file_paths is None:
-            # This path is tricky because we need to select a loader *before* knowing the files
-            # if we are to preprocess. Standard dialogs don't give us this luxury.
-            # The original logic was to open a dialog based on loader_module in loadFiles.
-            # If file_paths is None here, it means we clicked the drop zone empty or a menu item
-            # that doesn't pre-supply paths.
-            # For now, if file_paths is None, we defer preprocessing until loadFiles.
-            pass  # Preprocessing will be handled in loadFiles if paths are obtained via dialog there
-        else:
-            # If file_paths are provided (e.g. from drop, download, or direct call with paths),
-            # they should already be preprocessed by the caller.
-            # However, to be safe, let's ensure it if this function is called directly with zips.
-            # self._cleanup_temp_dirs() # Potentially redundant if called by loadFiles/handleDroppedFiles
-            # actual_file_paths = self._preprocess_file_paths(file_paths) #This might be too broad here
-            # The intent is that `file_paths` given to this function are ALREADY processed.
-            pass  # Callers should ensure preprocessing.
 
         # If auto_loader is available, use it directly
         if 'auto_loader' in store.loaders:
@@ -602,15 +705,9 @@ class MainWindow(QMainWindow):
 
             if downloaded_zip_path:
                 try:
-                    # Preprocess the downloaded ZIP. This will unpack it to a managed temp dir.
-                    processed_paths = self._preprocess_file_paths(
-                        [downloaded_zip_path])
-
-                    if processed_paths:
-                        # At this point, `processed_paths` contains paths to files *extracted* from the ZIP.
-                        # The original `downloaded_zip_path` can now be deleted.
-                        self.findLoaderAndLoad("all", processed_paths)
-                    # else: _preprocess_file_paths or unpack_zip_to_temp_with_password_prompt already showed a message
+                    # loadFiles unpacks the downloaded ZIP to a managed temp dir while loading.
+                    # The original `downloaded_zip_path` can be deleted after loading.
+                    self.findLoaderAndLoad("all", [downloaded_zip_path])
                 finally:
                     # Ensure the originally downloaded temporary ZIP file is deleted
                     # after attempting to process it, regardless of success/failure of unpacking or loading.
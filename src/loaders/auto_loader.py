@@ -12,6 +12,8 @@ Auto Loader module that tries all available loaders until one successfully loads
 """
 
 from utils.measurement import Measurement
+from utils import measurement_cache
+from utils.load_progress import LoadProgress, LoadCancelledError
 import logging
 import inspect
 
@@ -21,31 +23,47 @@ file_types = "All Supported Files (*.*)"
 menu_priority = 1
 
 
-def _load_data_accepts_parent(load_data):
+def _load_data_accepts(load_data, argument_name):
     try:
         parameters = inspect.signature(load_data).parameters.values()
     except (TypeError, ValueError):
         return False
 
     return any(
-        parameter.name == "parent"
+        parameter.name == argument_name
         or parameter.kind == inspect.Parameter.VAR_KEYWORD
         for parameter in parameters
     )
 
 
-def _load_with_optional_parent(loader, fileNames: list[str], parent=None):
+def _load_data_accepts_parent(load_data):
+    return _load_data_accepts(load_data, "parent")
+
+
+def _load_with_optional_parent(loader, fileNames: list[str], parent=None, progress: LoadProgress | None = None):
+    if progress is not None and _load_data_accepts(loader.load_data, "progress"):
+        if parent is not None and _load_data_accepts_parent(loader.load_data):
+            return loader.load_data(fileNames, parent=parent, progress=progress)
+        return loader.load_data(fileNames, progress=progress)
     if parent is not None and _load_data_accepts_parent(loader.load_data):
+        # Loaders without progress support may open dialogs, run them on the GUI thread
+        if progress is not None:
+            return progress.run_in_main_thread(loader.load_data, fileNames, parent=parent)
         return loader.load_data(fileNames, parent=parent)
     return loader.load_data(fileNames)
 
 
-def load_data(fileNames: list[str], parent=None) -> Measurement | None:
+def load_data(fileNames: list[str], parent=None, progress: LoadProgress | None = None,
+              cache_file_paths: list[str] | None = None) -> Measurement | None:
     """
     Try to load data using all available loaders until one succeeds.
 
     Args:
         fileNames: List of file paths to load data from
+        parent: Optional parent widget for loader-owned dialogs
+        progress: Optional progress reporter passed on to the loaders
+        cache_file_paths: Optional files the measurement is cached under, fileNames by default.
+            Given when fileNames were unpacked from ZIP files, which are cached as they are.
 
     Returns:
         Measurement object if loading was successful, None otherwise
@@ -57,18 +75,32 @@ def load_data(fileNames: list[str], parent=None) -> Measurement | None:
     # Import store here to avoid circular import
     from utils import store
 
-    # Try each loader in sequence
-    for loader_name, loader in store.loaders.items():
-        # Skip ourselves to avoid infinite recursion
-        if loader_name == "auto_loader":
-            continue
+    # Skip ourselves to avoid infinite recursion
+    loaders = {
+        loader_name: loader for loader_name, loader in store.loaders.items()
+        if loader_name != "auto_loader"
+    }
+
+    if cache_file_paths is None:
+        cache_file_paths = fileNames
 
+    measurement = measurement_cache.find_cached_measurement(cache_file_paths, [
+        loader_name for loader_name, loader in loaders.items() if measurement_cache.is_cacheable(loader)])
+    if measurement is not None:
+        return measurement
+
+    # Try each loader in sequence
+    for loader_name, loader in loaders.items():
         logging.info(f"Trying to load files with {loader_name}")
         try:
-            measurement = _load_with_optional_parent(loader, fileNames, parent)
+            measurement = _load_with_optional_parent(loader, fileNames, parent, progress)
             if measurement is not None:
                 logging.info(f"Successfully loaded files with {loader_name}")
+                if measurement_cache.is_cacheable(loader):
+                    measurement_cache.cache_measurement(cache_file_paths, loader_name, measurement)
                 return measurement
+        except LoadCancelledError:
+            raise
         except Exception as e:
             logging.debug(f"Loader {loader_name} failed with error: {str(e)}")
             continue
@@ -1,15 +1,19 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from PyQt6.QtWidgets import QInputDialog, QWidget
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import json
 from scipy.interpolate import interp1d
 from scipy.optimize import curve_fit
 import settings
 from utils.measurement import Measurement
+from utils.load_progress import LoadProgress, LoadCancelledError, report_stage
 
 menu_text = "Load Tapio Parquet data"
 menu_priority = 3
@@ -17,6 +21,12 @@ menu_priority = 3
 file_types = "All Files (*);;Parquet files (*.parquet);;Calibration files (*.tcal);;Paper machine files (*.pmdata.json)"
 
 RESAMPLE_STEP_DEFAULT_MM = 1
+# Number of resampled points processed per chunk when resampling
+RESAMPLE_CHUNK_SIZE = 1_000_000
+# Number of rows read from the Parquet file at a time
+PARQUET_BATCH_SIZE = 1_000_000
+# Rows skipped from the start of Parquet files longer than this
+PARQUET_SKIP_ROWS = 1000
 
 ASH_MAC = -100
 LOG_VALS_MAX = 1000  # Maximum allowed value for logarithmic calibration output
@@ -37,6 +47,11 @@ def load_cd_samples_data(samples_file_path: str):
     return peak_channel, threshold, peak_locations, selected_samples, tape_width_mm
 
 
+def is_cacheable() -> bool:
+    """The sample step asked when distances are generated is not part of the measurement cache key."""
+    return not settings.PQ_LOADER_GENERATE_DISTANCES
+
+
 def get_sample_step(parent: Optional[QWidget] = None):
     """Prompt the user for a sample step value."""
     sample_step, ok = QInputDialog.getDouble(parent,
@@ -50,7 +65,7 @@ def get_sample_step(parent: Optional[QWidget] = None):
         return None
 
 
-def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measurement | None:
+def load_data(fileNames: list[str], parent: Optional[QWidget] = None, progress: Optional[LoadProgress] = None) -> Measurement | None:
     measurement = Measurement()
     parquet_file_path = None
     tcal_file_path = None
@@ -82,9 +97,11 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
 
     # Process Parquet file
     try:
+        report_stage(progress, "Parsing")
         logger.debug("Loading Parquet data from: %s", parquet_file_path)
-        # Load Parquet data directly from the file path
-        data_df = pd.read_parquet(parquet_file_path)
+        parquet_file = pq.ParquetFile(parquet_file_path)
+        file_columns = get_parquet_channel_columns(parquet_file)
+        num_rows = parquet_file.metadata.num_rows
 
         basename = os.path.basename(parquet_file_path)
         measurement.data_file_path = basename
@@ -92,30 +109,44 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
             basename)[0]  # Label from parquet file
 
         # This logic was previously inside zip processing, ensure it's correctly placed
-        if len(data_df) > 1000:
-            data_df = data_df.iloc[1000:]
+        skip_rows = PARQUET_SKIP_ROWS if num_rows > PARQUET_SKIP_ROWS else 0
 
         # Find the distance column (case-insensitive)
         distance_col = None
-        for col in data_df.columns:
+        for col in file_columns:
             if col.lower() == 'distance':
                 distance_col = col
                 break
 
+        # Ignored channels are never read from the file
+        read_columns = [
+            col for col in file_columns if col not in settings.IGNORE_CHANNELS]
+
         if settings.PQ_LOADER_GENERATE_DISTANCES:
-            sample_step = get_sample_step(parent)
+            if progress is not None:
+                sample_step = progress.run_in_main_thread(get_sample_step, parent)
+            else:
+                sample_step = get_sample_step(parent)
             if sample_step is None:
                 return None  # User canceled the input
-            distances = np.arange(len(data_df)) * sample_step
-            measurement.sample_step = sample_step
             # Keep all columns as data columns when generating distances
-            data_columns = list(data_df.columns)
+            data_columns = read_columns
+            column_values = read_parquet_columns(
+                parquet_file, data_columns, skip_rows)
+            distances = np.arange(num_rows - skip_rows) * sample_step
+            measurement.sample_step = sample_step
         else:
             if distance_col is None:
                 logger.debug("Error: No 'distance' column found in parquet file")
                 return None
 
-            distances = data_df[distance_col].values
+            # Exclude distance column from data columns when using it for distances
+            data_columns = [
+                col for col in read_columns if col != distance_col]
+            column_values = read_parquet_columns(
+                parquet_file, data_columns + [distance_col], skip_rows)
+
+            distances = column_values.pop(distance_col)
             distances = distances - distances[0]
 
             if len(distances) > 1:
@@ -140,22 +171,20 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
                 "Total length of measurement [seconds]: %.2f", total_time_seconds)
             logger.debug("Total distance of measurement [m]: %.2f", total_distance)
 
-            # Exclude distance column from data columns when using it for distances
-            data_columns = [
-                col for col in data_df.columns if col != distance_col]
-
-        raw_data = data_df[data_columns].values
+        channel_values = [column_values[column] for column in data_columns]
 
         logger.debug("Ensuring unique distance")
         unique_distances, first_occurrence_indices = np.unique(
             distances, return_index=True)
-        aggregated_data = raw_data[first_occurrence_indices, :]
 
         logger.debug("Resampling")
+        report_stage(progress, "Aligning")
         if len(unique_distances) < 2:  # Need at least two points to define a range for arange
             logger.debug("Not enough unique distance points to resample. Using original data.")
             resampled_distances = unique_distances
-            resampled_data = aggregated_data
+            resampled_data = np.empty((len(unique_distances), len(channel_values)))
+            for index, values in enumerate(channel_values):
+                resampled_data[:, index] = values[first_occurrence_indices]
             measurement.sample_step = np.diff(unique_distances).mean() if len(
                 unique_distances) > 1 else (RESAMPLE_STEP_DEFAULT_MM / 1000)
         else:
@@ -165,28 +194,16 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
             if len(resampled_distances) == 0 and len(unique_distances) > 0:
                 resampled_distances = unique_distances[:1]  # Use first point
 
-            resampled_data = np.zeros(
-                (len(resampled_distances), aggregated_data.shape[1]))
-
-            # Check if there are columns to interpolate and enough points
-            if aggregated_data.shape[1] > 0 and len(unique_distances) >= 2:
-                for i in range(aggregated_data.shape[1]):
-                    voltage_interp = interp1d(unique_distances,
-                                              aggregated_data[:, i],
-                                              kind='linear',
-                                              fill_value="extrapolate")
-                    resampled_data[:, i] = voltage_interp(resampled_distances)
-                measurement.sample_step = RESAMPLE_STEP_DEFAULT_MM / 1000
-            # Single unique point
-            elif aggregated_data.shape[1] > 0 and len(unique_distances) == 1:
-                resampled_data = aggregated_data  # Use original aggregated data
-                measurement.sample_step = (
-                    RESAMPLE_STEP_DEFAULT_MM / 1000)  # Default step
-            else:  # No data columns or not enough points and arange was empty
-                # Empty data with correct num columns
-                resampled_data = np.array([]).reshape(
-                    0, aggregated_data.shape[1])
-                measurement.sample_step = (RESAMPLE_STEP_DEFAULT_MM / 1000)
+            # Check if there are columns to interpolate
+            if channel_values:
+                resampled_data = resample_channels(
+                    unique_distances,
+                    first_occurrence_indices,
+                    channel_values,
+                    resampled_distances)
+            else:  # No data columns
+                resampled_data = np.array([]).reshape(0, 0)
+            measurement.sample_step = RESAMPLE_STEP_DEFAULT_MM / 1000
         # Finish distance generation
 
         measurement.channel_df = pd.DataFrame(
@@ -198,6 +215,8 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
         measurement.channels = measurement.channel_df.columns
         valid_files_processed = True
 
+    except LoadCancelledError:
+        raise
     except Exception as e:
         logger.exception(
             "Error reading or processing parquet file %s: %s",
@@ -208,6 +227,7 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
 
     # Process TCAL file if found and Parquet was loaded
     if tcal_file_path and valid_files_processed:
+        report_stage(progress, "Calibrating")
         try:
             logger.debug("Loading TCAL data from: %s", tcal_file_path)
             with open(tcal_file_path, 'r', encoding='utf-8') as tcal_data_file:
@@ -255,7 +275,7 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
                 "Error loading PM data file %s: %s", pmdata_file_path, e)
 
     if valid_files_processed and measurement.channel_df is not None and not measurement.channel_df.empty:
-        finalize_measurement(measurement)
+        finalize_measurement(measurement, progress)
         return measurement
     else:
         if not valid_files_processed:
@@ -265,6 +285,115 @@ def load_data(fileNames: list[str], parent: Optional[QWidget] = None) -> Measure
     return None
 
 
+def get_parquet_channel_columns(parquet_file: pq.ParquetFile) -> list[str]:
+    """Return the column names of a Parquet file, excluding stored pandas index columns."""
+    index_columns = []
+    pandas_metadata = parquet_file.schema_arrow.pandas_metadata
+    if pandas_metadata:
+        # Range indexes are stored as metadata dicts, other indexes as named columns
+        index_columns = [
+            col for col in pandas_metadata.get('index_columns', []) if isinstance(col, str)]
+    return [
+        col for col in parquet_file.schema_arrow.names if col not in index_columns]
+
+
+def read_parquet_columns(parquet_file: pq.ParquetFile, columns: list[str], skip_rows=0, batch_size=PARQUET_BATCH_SIZE):
+    """
+    Stream the given columns of a Parquet file into one NumPy array per column.
+
+    Only the requested columns are read, and row groups are read one batch at
+    a time into preallocated arrays, so the file is never materialised as a
+    whole in pandas or Arrow. Floating point columns keep their precision,
+    other columns are converted to float.
+
+    :param parquet_file: The opened Parquet file.
+    :param columns: Names of the columns to read.
+    :param skip_rows: Number of rows to skip from the start of the file.
+    :param batch_size: Number of rows read per batch.
+    :return: dict mapping column name to its values.
+    """
+    num_rows = max(parquet_file.metadata.num_rows - skip_rows, 0)
+    schema = parquet_file.schema_arrow
+    column_values = {}
+    for col in columns:
+        column_type = schema.field(col).type
+        dtype = column_type.to_pandas_dtype() if pa.types.is_floating(column_type) else float
+        column_values[col] = np.empty(num_rows, dtype=dtype)
+
+    if not columns:
+        return column_values
+
+    rows_read = 0
+    position = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        batch_start = max(skip_rows - rows_read, 0)
+        rows_read += batch.num_rows
+        if batch_start >= batch.num_rows:
+            continue
+        batch = batch.slice(batch_start)
+        for col in columns:
+            column_values[col][position:position + batch.num_rows] = batch.column(
+                col).to_numpy(zero_copy_only=False)
+        position += batch.num_rows
+
+    return column_values
+
+
+def resample_channels(unique_distances, source_rows, channel_values, resampled_distances, chunk_size=RESAMPLE_CHUNK_SIZE):
+    """
+    Linearly resample all channels onto resampled_distances at once.
+
+    The resampled grid is processed in chunks. For each chunk the
+    interpolation indices and slopes are computed once and applied to all
+    channels as one array operation, gathering only the source rows the chunk
+    needs. Chunks are processed in parallel threads and written straight into
+    the output, so apart from the output only one chunk of temporaries per
+    thread is held in memory. Values outside the source range are linearly
+    extrapolated.
+
+    :param unique_distances: Sorted, unique source distances.
+    :param source_rows: Row index into channel_values for each unique distance.
+    :param channel_values: List of 1-D source arrays, one per channel.
+    :param resampled_distances: Sorted distances to resample to.
+    :param chunk_size: Number of resampled points processed per chunk.
+    :return: Array of shape (len(resampled_distances), len(channel_values)).
+    """
+    resampled_data = np.empty((len(resampled_distances), len(channel_values)))
+
+    def resample_chunk(start):
+        stop = min(start + chunk_size, len(resampled_distances))
+        chunk_distances = resampled_distances[start:stop]
+
+        upper = np.searchsorted(unique_distances, chunk_distances)
+        upper = np.clip(upper, 1, len(unique_distances) - 1)
+        lower = upper - 1
+
+        # Gather the source rows covered by this chunk for all channels
+        first_row = lower[0]
+        rows = source_rows[first_row:upper[-1] + 1]
+        chunk_values = np.empty((len(rows), len(channel_values)))
+        for index, values in enumerate(channel_values):
+            chunk_values[:, index] = values[rows]
+
+        lower_distances = unique_distances[lower]
+        lower_values = chunk_values[lower - first_row]
+        slope = (chunk_values[upper - first_row] - lower_values) / \
+            (unique_distances[upper] - lower_distances)[:, np.newaxis]
+        resampled_data[start:stop] = slope * \
+            (chunk_distances - lower_distances)[:, np.newaxis] + lower_values
+
+    chunk_starts = range(0, len(resampled_distances), chunk_size)
+    if len(chunk_starts) > 1:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            # Consume results so that exceptions in workers are raised
+            list(executor.map(resample_chunk, chunk_starts))
+    else:
+        for start in chunk_starts:
+            resample_chunk(start)
+
+    return resampled_data
+
+
 def remove_ignored_channels(measurement: Measurement):
     """Remove ignored source channels from the dataframe and units mapping."""
     measurement.channel_df = measurement.channel_df.drop(
@@ -308,13 +437,15 @@ def load_samples_if_available(measurement: Measurement):
     measurement.split_data_to_segments()
 
 
-def finalize_measurement(measurement: Measurement):
+def finalize_measurement(measurement: Measurement, progress: Optional[LoadProgress] = None):
     # Remove ignored source channels before calculated channels are added.
     # This lets calculated channels intentionally replace stale raw channels
     # with the same name, such as Density.
+    report_stage(progress, "Calculating channels")
     remove_ignored_channels(measurement)
     add_calculated_channels(measurement)
     measurement.channels = measurement.channel_df.columns
+    report_stage(progress, "Segmenting")
     load_samples_if_available(measurement)
 
 
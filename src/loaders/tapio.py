@@ -5,8 +5,10 @@ import os
 import numpy as np
 import pandas as pd
 import json
-import struct
+from functools import partial
 from utils.measurement import Measurement
+from utils.channel_store import LazyChannelStore
+from utils.load_progress import LoadProgress, report_stage, report_fraction
 
 menu_text = "Load Tapio data"
 menu_priority = 2
@@ -14,7 +16,7 @@ menu_priority = 2
 file_types = "All Files (*);;Calibration files (*.ca2);;Data files (*.da2);;Header files (*.pk2);;Paper machine files (*.pmdata.json);;CD Sample location files (*.samples.json)"
 
 
-def load_data(fileNames: list[str]) -> Measurement | None:
+def load_data(fileNames: list[str], progress: LoadProgress | None = None) -> Measurement | None:
     """
     Load Tapio data from a list of files and return a Measurement object.
     """
@@ -41,7 +43,9 @@ def load_data(fileNames: list[str]) -> Measurement | None:
         sensor_df, units, sample_step, info, pm_speed = parse_legacy_data(
             measurement.header_file_path,
             measurement.calibration_file_path,
-            measurement.data_file_path
+            measurement.data_file_path,
+            lazy=settings.LAZY_CHANNEL_LOADING,
+            progress=progress
         )
 
         # Remove ignored source channels before calculated channels are added.
@@ -50,6 +54,7 @@ def load_data(fileNames: list[str]) -> Measurement | None:
         sensor_df, units = remove_ignored_channels(sensor_df, units)
 
         # Add calculated channels
+        report_stage(progress, "Calculating channels")
         sensor_df, units = add_calculated_channels(sensor_df, units)
 
         # Update measurement object with loaded data
@@ -74,6 +79,7 @@ def load_data(fileNames: list[str]) -> Measurement | None:
             measurement.peak_locations = peak_locations
             measurement.selected_samples = selected_samples
             measurement.tape_width_mm = tape_width_mm
+            report_stage(progress, "Segmenting")
             measurement.split_data_to_segments()
 
         logging.info("Loaded data")
@@ -101,7 +107,13 @@ def add_calculated_channels(sensor_df, units):
         unit = channel['unit']
         function = channel['function']
         try:
-            sensor_df[name] = function(sensor_df)
+            values = function(sensor_df)
+            if isinstance(sensor_df, LazyChannelStore):
+                # Recalculate on demand so the result can be dropped from the cache
+                sensor_df.add_channel(
+                    name, lambda function=function: function(sensor_df), values)
+            else:
+                sensor_df[name] = values
             units[name] = unit
             print(f"Added calculated channel {name}")
         except Exception as e:
@@ -268,19 +280,29 @@ def read_meas_param(header_file):
 
 
 def read_binary_data(file_path, num_channels):
-    """Read binary data from data file."""
-    with open(file_path, 'rb') as file:
-        file_content = file.read()
-    num_data_points = len(file_content) // (2 * num_channels)
-    format_str = '>' + 'h' * num_channels * num_data_points
-    data_points = struct.unpack(format_str, file_content)
+    """
+    Memory-map binary data from data file.
+
+    Returns a read-only (samples, channels) view of the big-endian int16
+    samples. Nothing is read from disk until the data is accessed.
+    """
+    num_data_points = os.path.getsize(file_path) // (2 * num_channels)
+    if num_data_points == 0:
+        return np.empty((0, num_channels), dtype='>i2')
 
-    reshaped_data = np.reshape(data_points, (num_data_points, num_channels))
-    return reshaped_data
+    return np.memmap(file_path, dtype='>i2', mode='r',
+                     shape=(num_data_points, num_channels))
 
 
-def parse_legacy_data(header_file_path, cal_file_path, data_file_path):
-    """Parse legacy Tapio data files and return processed data."""
+def parse_legacy_data(header_file_path, cal_file_path, data_file_path, lazy=False, progress=None):
+    """
+    Parse legacy Tapio data files and return processed data.
+
+    If lazy is True, the returned sensor data is a LazyChannelStore that
+    calibrates each channel from the memory-mapped data file on first access.
+    Loading stages are reported to progress if given.
+    """
+    report_stage(progress, "Parsing")
     with open(cal_file_path, 'r', encoding='iso-8859-1') as cal_file:
         sensor_names, units, logical_channel_numbers = read_channel_names_units_from_ca(
             cal_file)
@@ -296,27 +318,51 @@ def parse_legacy_data(header_file_path, cal_file_path, data_file_path):
     data = read_binary_data(data_file_path, len(sensor_names))
 
     # Align data based on sensor distances
+    report_stage(progress, "Aligning")
     data = align_sensor_data(data, sensor_names, sensor_distances, sample_step)
 
-    # Create dataframe from aligned data
-    sensor_df = pd.DataFrame(data, columns=sensor_names)
-
-    # Apply calibrations
-    sensor_df = apply_calibrations(
-        sensor_df,
+    if lazy:
+        data_len = len(data[0]) if data else 0
+        sensor_df = LazyChannelStore(
+            data_len, settings.LAZY_CHANNEL_MEMORY_BUDGET_MB * 1024 * 1024)
+        for index, sensor_name in enumerate(sensor_names):
+            sensor_df.add_channel(sensor_name, partial(
+                calibrate_channel,
+                data[index],
+                sensor_calibration_types[sensor_name],
+                ad_factor,
+                sensor_scales[sensor_name],
+                sensor_offsets[sensor_name],
+                asymptotic_values[sensor_name]
+            ))
+        return sensor_df, units, sample_step, info, pm_speed
+
+    # Apply calibrations to the aligned raw channels
+    report_stage(progress, "Calibrating")
+    data = apply_calibrations(
+        data,
         sensor_names,
         sensor_calibration_types,
         ad_factor,
         sensor_scales,
         sensor_offsets,
-        asymptotic_values
+        asymptotic_values,
+        progress
     )
 
+    # Create dataframe from calibrated data
+    sensor_df = pd.DataFrame(data, columns=sensor_names)
+
     return sensor_df, units, sample_step, info, pm_speed
 
 
 def align_sensor_data(data, sensor_names, sensor_distances, sample_step):
-    """Align sensor data based on sensor distances."""
+    """
+    Align sensor data based on sensor distances.
+
+    Returns a list of per-channel strided views into data, in the order of
+    sensor_names, trimmed to a common length. No samples are copied.
+    """
     align_data_slices = {}
 
     # Compensate for the case that minimum distance is smaller than zero (some calibrations might have this).
@@ -329,29 +375,52 @@ def align_sensor_data(data, sensor_names, sensor_distances, sample_step):
         align_data_slices[i] = round(
             (distance_zero_offset + sensor_distances[i]) / sample_step)
 
-    data_len = data.shape[0] - max(align_data_slices.values())
-    trimmed_data = np.empty((data_len, data.shape[1]))
+    data_len = max(data.shape[0] - max(align_data_slices.values()), 0)
+    aligned_channels = []
 
     for index, sensor_name in enumerate(sensor_names):
         start_trim = align_data_slices[sensor_name]
-        channel_data = data[start_trim:start_trim + data_len, index]
-        trimmed_data[:, index] = channel_data
+        aligned_channels.append(data[start_trim:start_trim + data_len, index])
+
+    return aligned_channels
+
 
-    return trimmed_data
+def apply_calibrations(channel_data, sensor_names, sensor_calibration_types, ad_factor, sensor_scales, sensor_offsets, asymptotic_values, progress=None):
+    """
+    Apply calibrations to aligned raw channel data.
+
+    channel_data is a sequence of equally long raw arrays in the order of
+    sensor_names, as returned by align_sensor_data. Every channel is
+    calibrated as a whole column with NumPy in a single pass over the raw
+    data. Channels with an unknown calibration type keep their raw values.
+    The result is a Fortran-ordered (samples, channels) float array so that
+    each channel is contiguous in memory. The calibrated fraction of
+    channels is reported to progress if given.
+    """
+    data_len = len(channel_data[0]) if len(channel_data) else 0
+    calibrated = np.empty((data_len, len(sensor_names)), dtype=float, order='F')
+
+    for index, sensor_name in enumerate(sensor_names):
+        calibrated[:, index] = calibrate_channel(
+            channel_data[index],
+            sensor_calibration_types[sensor_name],
+            ad_factor,
+            sensor_scales[sensor_name],
+            sensor_offsets[sensor_name],
+            asymptotic_values[sensor_name]
+        )
+        report_fraction(progress, (index + 1) / len(sensor_names))
 
+    return calibrated
 
-def apply_calibrations(sensor_df, sensor_names, sensor_calibration_types, ad_factor, sensor_scales, sensor_offsets, asymptotic_values):
-    """Apply calibrations to sensor data."""
-    for sensor_name in sensor_df.columns:
-        calibration_type = sensor_calibration_types[sensor_name]
-        if calibration_type == 0:
-            sensor_df[sensor_name] = sensor_df[sensor_name].apply(
-                linear_calibration, args=(ad_factor, sensor_scales[sensor_name], sensor_offsets[sensor_name]))
-        elif calibration_type in [1, 2]:
-            sensor_df[sensor_name] = sensor_df[sensor_name].apply(
-                logarithmic_calibration, args=(ad_factor, sensor_scales[sensor_name], sensor_offsets[sensor_name], asymptotic_values[sensor_name]))
 
-    return sensor_df
+def calibrate_channel(raw_values, calibration_type, ad_factor, scale, offset, asymptotic_value):
+    """Calibrate the raw values of a single channel as a whole array."""
+    if calibration_type == 0:
+        return linear_calibration(raw_values, ad_factor, scale, offset)
+    elif calibration_type in [1, 2]:
+        return logarithmic_calibration(raw_values, ad_factor, scale, offset, asymptotic_value)
+    return np.asarray(raw_values, dtype=float)
 
 
 def load_cd_samples_data(samples_file_path: str):
@@ -372,7 +441,7 @@ def linear_calibration(y, a, s, f):
     Linear calibration function.
 
     Args:
-        y: Raw value
+        y: Raw value or array of raw values
         a: AD factor
         s: Scale
         f: Offset
@@ -385,7 +454,7 @@ def logarithmic_calibration(y, a, s, f, c):
     Logarithmic calibration function.
 
     Args:
-        y: Raw value
+        y: Raw value or array of raw values
         a: AD factor
         s: Scale
         f: Offset
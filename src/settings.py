@@ -10,6 +10,20 @@ DEBUG = False
 # Meters per minute
 PAPER_MACHINE_SPEED_DEFAULT = 1600.00
 FILTER_NUMTAPS = 2500
+# Output samples per FFT block when filtering long channels
+FILTER_BLOCK_SIZE = 2**16
+# Number of band-pass filter designs kept in memory
+FILTER_BANK_MAX_FILTERS = 32
+# Default band pass filter engine of analyses, one of BAND_PASS_FILTER_TYPES
+# "fir": windowed FIR with FILTER_NUMTAPS taps
+# "iir": zero-phase Butterworth filter (second-order sections, filtered forward and backward)
+# "multirate": decimate, filter with the zero-phase IIR filter and interpolate back, for bands far below Nyquist
+BAND_PASS_FILTER_TYPE = "fir"
+BAND_PASS_FILTER_TYPES = ["fir", "iir", "multirate"]
+# Order of the Butterworth filter used by the "iir" and "multirate" engines
+IIR_FILTER_ORDER = 4
+# The "multirate" engine decimates as long as the high cutoff stays below this fraction of the decimated Nyquist frequency
+MULTIRATE_FILTER_MAX_CUTOFF_FRACTION = 0.25
 
 REPORT_ADDITIONAL_INFO_DEFAULT = f"Speed at reel: {PAPER_MACHINE_SPEED_DEFAULT:.0f} m/min\nGrammage:"
 MD_REPORT_TEMPLATE_DEFAULT = None
@@ -85,8 +99,29 @@ ANALYSES_EXCLUDED_FROM_REPORT = ["sos", "find_samples"]
 
 UPDATE_ON_SLIDE = False
 IGNORE_CHANNELS = ["Density"]
-CORRELATION_MATRIX_SAMPLE_LIMIT = 2000
+
+# Calibrate channels of legacy Tapio data only when they are first accessed
+LAZY_CHANNEL_LOADING = False
+# Memory limit for lazily loaded channels, least recently used channels are dropped first
+LAZY_CHANNEL_MEMORY_BUDGET_MB = 1024
+# Memory budget of spectral results shared by the analysis windows of a measurement
+SPECTRAL_CACHE_MAX_SIZE_MB = 256
+# Memory budget of band pass filtered channels and segments shared by the analysis windows of a measurement
+FILTER_CACHE_MAX_SIZE_MB = 512
+# Long MD signals are drawn as min/max envelopes with this many points per pixel of plot width, 0 draws every sample
+PLOT_ENVELOPE_POINTS_PER_PIXEL = 2
+# Keep loaded measurements in an on-disk cache so that reopening the same files is fast
+MEASUREMENT_CACHE_ENABLED = False
+# Cache folder, None uses a folder in the system temporary directory
+MEASUREMENT_CACHE_DIR = None
+# Least recently used measurements are removed when the cache grows past this size
+MEASUREMENT_CACHE_MAX_SIZE_MB = 4096
 CORRELATION_MATRIX_HISTOGRAM_BINS = 20
+# Bins along each channel in the density rasters between channels, computed from all data points
+CORRELATION_MATRIX_DENSITY_BINS = 64
+CORRELATION_MATRIX_COLORMAP = "Blues"
+# Rows processed at a time when accumulating correlations and densities
+CORRELATION_MATRIX_BLOCK_SIZE = 2**16
 CORRELATION_MATRIX_LABEL_FONT_SIZE = 8
 CORRELATION_MATRIX_WINDOW_SIZE = (1000, 600)
 CORRELATION_MATRIX_TICK_LABEL_TARGET_CHARS = 5
@@ -167,6 +202,9 @@ MD_SPECTRUM_PEAK_RANGE_MAX_DEFAULT = 500.00
 MD_SPECTRUM_ANALYSIS_RANGE_LOW_DEFAULT = 0.00
 MD_SPECTRUM_ANALYSIS_RANGE_HIGH_DEFAULT = 1.00
 MD_SPECTRUM_OVERLAP = 0.85
+# Reuse Welch segment periodograms on a grid aligned to the measurement start when the
+# analysis range changes. Also updates the MD spectrum while dragging the analysis range slider.
+MD_SPECTRUM_INCREMENTAL_WELCH = False
 MD_SPECTRUM_FIXED_YLIM = {}
 
 # MD_SPECTRUM_FIXED_YLIM = {"Tapio BW": (0, 0.2)}
@@ -189,6 +227,11 @@ MD_SPECTROGRAM_OVERLAP = 0.75
 MD_SPECTROGRAM_LENGTH_SLIDER_MIN = 1000
 MD_SPECTROGRAM_LENGTH_SLIDER_MAX = 100000
 MD_SPECTROGRAM_OVERLAP = 0.75
+# Compute MD spectrograms in cached tiles of columns aligned to the start of the measurement,
+# and draw at most one column per pixel of plot width by averaging columns on overviews.
+# Columns are detrended separately, so the results differ slightly from the default spectrogram.
+MD_SPECTROGRAM_TILED = False
+MD_SPECTROGRAM_TILE_COLUMNS = 256
 
 # CD (Cross Direction) Spectrum Analysis Settings
 CD_SPECTRUM_DEFAULT_LENGTH = 5000
@@ -243,6 +286,10 @@ EXTRA_DATA_ADJUST_RANGE = 1
 # Channel correlation settings
 CHANNEL_CORRELATION_SHOW_BEST_FIT = False
 CHANNEL_CORRELATION_XCORR_OUTPUT = False
+# Largest cross-correlation lag searched in either direction [m], None searches all lags
+CHANNEL_CORRELATION_XCORR_MAX_LAG = None
+# Number of samples correlated at a time when the lag search is limited
+CROSS_CORRELATION_BLOCK_SIZE = 2**16
 
 CHANNEL_CORRELATION_WINDOW_SIZE = (1000, 800)
 
@@ -342,12 +389,20 @@ REPORT_ENABLE_ANALYSIS_TITLE = False
 
 
 SOS_HARMONICS = 10
+# "least_squares" fits the harmonics to the whole signal, "synchronous_average" averages
+# revolutions resampled to the selected frequency before keeping the harmonics
+SOS_METHOD = "least_squares"
+SOS_METHODS = ["least_squares", "synchronous_average"]
+# Samples processed at a time, memory use of SOS analysis does not grow with the data length
+SOS_CHUNK_SIZE = 2**16
 
 ANALYSIS_EXPORT_ATTRIBUTES = [
     "channel",
     "channel2",
     "band_pass_low",
     "band_pass_high",
+    "band_pass_filter_type",
+    "sos_method",
     "analysis_range_low",
     "analysis_range_high",
     "peak_detection_range_min",
@@ -1,10 +1,31 @@
 import numpy as np
 import pandas as pd
+import pytest
+from scipy.signal import coherence, convolve, spectrogram, welch
 
 from utils.measurement import DataSegment, MeasurementChannel
-from utils.filters import bandpass_filter
+from utils.channel_store import LazyChannelStore
+from utils.envelope import EnvelopeLine, EnvelopePyramid
+from utils.filters import FIRFilterBank, bandpass_filter, mirror_pad
 from utils.plot_formatting import wavelength_labels_cm_from_frequencies
-from utils.signal_processing import get_n_peaks, safe_spectral_params
+from utils.signal_processing import (
+    cross_correlation_lag,
+    fast_nls_units,
+    get_n_peaks,
+    harmonic_fitting_units,
+    hs_units,
+    nls_units,
+    safe_spectral_params,
+)
+from utils.result_cache import ResultCache
+from utils.spectral import (
+    get_profile_stack,
+    incremental_welch,
+    mean_coherence,
+    mean_spectrogram,
+    mean_welch,
+    tiled_spectrogram,
+)
 
 
 def test_measurement_channel_get_segment_accepts_indexes_and_segment():
@@ -21,6 +42,35 @@ def test_measurement_channel_get_segment_accepts_indexes_and_segment():
     assert by_segment["value"].tolist() == [20, 30]
 
 
+def test_lazy_channel_store_loads_on_access_and_evicts_over_budget():
+    load_counts = {"A": 0, "B": 0}
+
+    def loader(name, value):
+        def load():
+            load_counts[name] += 1
+            return np.full(4, value)
+        return load
+
+    # Budget fits one channel of four float64 values
+    store = LazyChannelStore(4, memory_budget_bytes=32)
+    store.add_channel("A", loader("A", 1.0))
+    store.add_channel("B", loader("B", 2.0))
+
+    assert list(store.columns) == ["A", "B"]
+    assert load_counts == {"A": 0, "B": 0}
+
+    assert store["A"].tolist() == [1.0] * 4
+    assert store["A"].tolist() == [1.0] * 4
+    assert load_counts == {"A": 1, "B": 0}
+
+    assert store.iloc[1:3]["B"].tolist() == [2.0, 2.0]
+    assert store.cached_channels == ["B"]
+
+    store["A"]
+    assert load_counts == {"A": 2, "B": 1}
+    assert store.drop(columns=["A", "Missing"], errors="ignore").columns.tolist() == ["B"]
+
+
 def test_bandpass_filter_returns_short_data_unchanged():
     data = np.array([1.0, 2.0, 3.0])
 
@@ -57,3 +107,216 @@ def test_get_n_peaks_applies_frequency_threshold_before_sorting():
     peaks = get_n_peaks(data, n=1, threshold=1.0)
 
     assert peaks.tolist() == [[3.0, 20.0]]
+
+
+def test_cross_correlation_lag_matches_direct_correlation_and_interpolates_peak():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=5000)
+    y = np.roll(x, -37) + 0.1 * rng.normal(size=5000)
+
+    lags, correlation, peak_lag = cross_correlation_lag(x, y)
+    direct = np.correlate(x - x.mean(), y - y.mean(), mode='full')
+    assert np.allclose(correlation * np.sqrt(np.sum((x - x.mean()) ** 2) * np.sum((y - y.mean()) ** 2)), direct)
+    assert lags[np.argmax(direct)] == 37
+    assert abs(peak_lag - 37) < 0.5
+
+    window_lags, window_correlation, window_peak_lag = cross_correlation_lag(
+        x, y, max_lag=100, block_size=512)
+    assert np.array_equal(window_lags, np.arange(-100, 101))
+    assert np.allclose(window_correlation, correlation[np.isin(lags, window_lags)])
+    assert window_peak_lag == peak_lag
+
+    # Half sample delay of a smooth signal is found between samples
+    t = np.arange(2000)
+    smooth = np.sin(2 * np.pi * t / 200) * np.exp(-((t - 1000) / 300) ** 2)
+    delayed = np.sin(2 * np.pi * (t - 0.5) / 200) * np.exp(-((t - 0.5 - 1000) / 300) ** 2)
+    _, _, smooth_peak_lag = cross_correlation_lag(delayed, smooth, max_lag=20)
+    assert abs(smooth_peak_lag - 0.5) < 0.05
+
+
+def test_batched_spectral_estimators_match_per_profile_loops():
+    rng = np.random.default_rng(2)
+    segments = rng.normal(size=(6, 256))
+    segments[4] = 1.0
+    profiles = get_profile_stack(segments, [0, 2, 4, 10], 10, 200)
+    assert profiles.shape == (3, 190)
+
+    f, Pxx = mean_welch(profiles, fs=100, window='hann', nperseg=64, noverlap=32)
+    expected = np.mean([
+        welch(profile, fs=100, window='hann', nperseg=64, noverlap=32, scaling='spectrum')[1]
+        for profile in profiles
+    ], axis=0)
+    assert np.allclose(Pxx, expected)
+
+    _, _, Sxx = mean_spectrogram(profiles, fs=100, window='hann', nperseg=64, noverlap=32)
+    expected = np.mean([
+        spectrogram(profile - profile.mean(), fs=100, window='hann', nperseg=64, noverlap=32)[2]
+        for profile in profiles
+    ], axis=0)
+    assert np.allclose(Sxx, expected)
+
+    # The constant profile is left out of the coherence average
+    other = get_profile_stack(rng.normal(size=(6, 256)), [0, 2, 4, 10], 10, 200)
+    _, Cxy = mean_coherence(profiles, other, fs=100, window='hann', nperseg=64, noverlap=32)
+    expected = np.mean([
+        coherence(profiles[i], other[i], fs=100, window='hann', nperseg=64, noverlap=32)[1]
+        for i in range(2)
+    ], axis=0)
+    assert np.allclose(Cxy, expected)
+
+
+def test_incremental_welch_reuses_grid_segments():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=4000)
+    cache = ResultCache()
+    params = dict(fs=10.0, window="hann", nperseg=256, noverlap=192)
+
+    for low, high in [(640, 2000), (320, 3000), (960, 2500)]:
+        f, Pxx = incremental_welch(cache, "A", data, low, high, **params)
+        expected_f, expected_Pxx = welch(data[low:high], scaling="spectrum", **params)
+        assert np.allclose(f, expected_f)
+        assert np.allclose(Pxx, expected_Pxx)
+
+    _, start, periodograms = cache.get("A")
+    assert start == 5
+    assert len(periodograms) == (3000 - 256) // 64 + 1 - 5
+
+    f, Pxx = incremental_welch(cache, "A", data, 10, 300, **params)
+    assert np.allclose(Pxx, welch(data[10:300], scaling="spectrum", **params)[1])
+
+
+def test_bandpass_filter_matches_direct_convolution_for_rows_and_blocks():
+    rng = np.random.default_rng(3)
+    profiles = rng.normal(size=(3, 1000)).cumsum(axis=1)
+    filter_bank = FIRFilterBank(block_size=64)
+
+    for mirror in (True, False):
+        filtered = filter_bank.filter(profiles, 0.5, 20, 100, numtaps=101, mirror=mirror)
+        for profile, filtered_profile in zip(profiles, filtered):
+            padded = mirror_pad(profile, 101) if mirror else profile
+            expected = convolve(padded, filter_bank.get_coefficients(101, 0.5, 20, 100), mode="same")
+            if mirror:
+                expected = expected[101:-101]
+            expected += np.mean(profile) - np.mean(expected)
+            assert np.allclose(filtered_profile, expected)
+            assert np.allclose(bandpass_filter(profile, 0.5, 20, 100, numtaps=101, mirror=mirror),
+                               filtered_profile)
+
+    assert filter_bank.get_coefficients(101, 0.5, 20, 100) is filter_bank.get_coefficients(101, 0.5, 20, 100)
+
+
+def test_zero_phase_bandpass_filter_types_keep_band_and_reject_outside():
+    fs = 100.0
+    t = np.arange(20000) / fs
+    in_band = np.sin(2 * np.pi * 1.0 * t)
+    data = np.vstack([
+        5 + in_band + np.sin(2 * np.pi * 0.02 * t) + np.sin(2 * np.pi * 20 * t),
+        in_band,
+    ])
+    middle = slice(5000, 15000)
+
+    for filter_type in ("iir", "multirate"):
+        filtered = bandpass_filter(data, 0.5, 2.0, fs, filter_type=filter_type)
+        assert filtered.shape == data.shape
+        assert np.allclose(filtered[0, middle], 5 + in_band[middle], atol=0.02)
+        assert np.allclose(filtered[1, middle], in_band[middle], atol=0.02)
+
+    with pytest.raises(ValueError):
+        bandpass_filter(data, 0.5, 2.0, fs, filter_type="unknown")
+
+
+def test_envelope_pyramid_keeps_block_extremes_and_refines_on_zoom():
+    from matplotlib.figure import Figure
+
+    data = np.random.default_rng(0).normal(size=100_003)
+    data[5] = np.nan
+    pyramid = EnvelopePyramid(data, factor=4, min_blocks=64)
+    block_size, mins, maxs = pyramid.levels[1]
+    assert block_size == 16 and len(mins) == -(-len(data) // 16)
+    assert mins[0] == np.nanmin(data[:16]) and maxs[-1] == np.max(data[-(len(data) % 16):])
+
+    indexes, values = pyramid.get_envelope(1000, 90_000, 1000)
+    assert len(values) <= 1000 and values.min() == data[1000:90_000].min()
+    assert np.array_equal(pyramid.get_envelope(10, 500, 1000)[1], data[10:500])
+
+    ax = Figure().add_subplot(111)
+    x = np.arange(len(data)) * 0.01
+    envelope_line = EnvelopeLine(ax, x, pyramid, points_per_pixel=1)
+    assert len(envelope_line.line.get_xdata()) <= 2 * ax.bbox.width
+    ax.set_xlim(100.0, 101.0)
+    assert np.array_equal(envelope_line.line.get_ydata(), data[9999:10102])
+
+
+def test_tiled_spectrogram_matches_spectrogram_and_decimates_to_max_columns():
+    data = np.random.default_rng(0).normal(size=20_000)
+    window = np.hanning(100)
+    cache = ResultCache()
+
+    f, bins, Sxx = tiled_spectrogram(cache, "data", data, 500, 15_000, 100.0, window, 100, 50,
+                                     max_columns=1000, tile_columns=16)
+    expected_f, expected_bins, expected = spectrogram(
+        data[500:15_000], fs=100.0, window=window, nperseg=100, noverlap=50, detrend='constant')
+    assert np.allclose(f, expected_f) and np.allclose(bins, expected_bins) and np.allclose(Sxx, expected)
+
+    misses = cache.misses
+    tiled_spectrogram(cache, "data", data, 1000, 12_000, 100.0, window, 100, 50, max_columns=1000, tile_columns=16)
+    assert cache.misses == misses
+
+    _, overview_bins, overview = tiled_spectrogram(cache, "data", data, 0, len(data), 100.0, window, 100, 50,
+                                                   max_columns=100, tile_columns=16)
+    _, _, full = tiled_spectrogram(cache, "data", data, 0, len(data), 100.0, window, 100, 50,
+                                   max_columns=1000, tile_columns=16)
+    assert overview.shape[1] <= 100 and len(overview_bins) == overview.shape[1]
+    assert np.allclose(np.sqrt(overview).mean(axis=1), np.sqrt(full).mean(axis=1), rtol=0.02)
+
+
+def test_hs_units_finds_fundamental_from_raw_data_and_welch_spectrum():
+    fs = 100.0
+    t = np.arange(60_000) / fs
+    fundamental = 2.37
+    x = sum(np.sin(2 * np.pi * fundamental * harmonic * t + harmonic) / harmonic for harmonic in range(1, 6))
+    x = x + np.random.default_rng(0).normal(scale=0.5, size=len(t))
+
+    # Raw data is searched on the FFT bins of the whole signal
+    assert hs_units(x, fs, 2.3, 0.2, 0, 50) == pytest.approx(fundamental, abs=fs / len(x))
+
+    # A coarse Welch spectrum is refined between its bins
+    f, Pxx = welch(x, fs=fs, nperseg=1000, scaling='spectrum')
+    refined = hs_units(None, fs, 2.3, 0.2, 0, 50, spectrum=(f, np.sqrt(2 * Pxx)), interpolate=True)
+    assert abs(refined - fundamental) < 0.25 * (f[1] - f[0])
+
+
+def test_fast_nls_matches_exact_nls_between_grid_steps():
+    fs = 100.0
+    t = np.arange(3000) / fs
+    fundamental = 1.2345
+    x = sum(np.sin(2 * np.pi * fundamental * harmonic * t + harmonic) / harmonic for harmonic in range(1, 4))
+
+    exact = nls_units(x, fs, 1.25, wrange=0.05, step=0.001, L=3)
+    fast = fast_nls_units(x, fs, 1.25, wrange=0.05, L=3)
+    assert exact == pytest.approx(fundamental, abs=0.001)
+    assert fast == pytest.approx(fundamental, abs=1e-4)
+
+
+def test_chunked_sos_fitting_matches_full_least_squares(monkeypatch):
+    import scipy
+    import settings
+    from utils.signal_processing import vandermonde
+
+    monkeypatch.setattr(settings, "SOS_HARMONICS", 4)
+    fs, frequency = 200.0, 3.3
+    t = np.arange(5000) / fs
+    x = np.sin(2 * np.pi * frequency * t) + 0.5 * np.cos(2 * np.pi * 2 * frequency * t + 1)
+    x = x + np.random.default_rng(0).normal(scale=0.2, size=len(t))
+
+    w_rad = frequency / fs * 2 * np.pi
+    harmonics = np.array([-4, -3, -2, -1, 1, 2, 3, 4])
+    Z = vandermonde(w_rad * harmonics, len(x))
+    expected = (Z @ scipy.linalg.lstsq(Z, x)[0]).real[:int(fs / frequency)]
+
+    assert np.allclose(harmonic_fitting_units(x, fs, frequency, chunk_size=700), expected)
+    averaged = harmonic_fitting_units(x, fs, frequency, method="synchronous_average", chunk_size=700)
+    assert np.allclose(averaged, expected, atol=0.05)
+    with pytest.raises(ValueError):
+        harmonic_fitting_units(x, fs, frequency, method="unknown")
+
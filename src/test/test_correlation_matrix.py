@@ -11,11 +11,6 @@ def test_cd_correlation_matrix_uses_selected_range_once(qt_app, monkeypatch):
         "bandpass_filter",
         lambda data, *_args, **_kwargs: np.asarray(data, dtype=float),
     )
-    monkeypatch.setattr(
-        correlation_matrix.settings,
-        "CORRELATION_MATRIX_SAMPLE_LIMIT",
-        5,
-    )
 
     cd_distances = np.arange(10, dtype=float)
     measurement = Measurement(
@@ -51,3 +46,36 @@ def test_cd_correlation_matrix_uses_selected_range_once(qt_app, monkeypatch):
 
     assert controller.data_slice["A"].tolist() == [7.0, 8.0, 9.0]
     assert controller.data_slice["B"].tolist() == [27.0, 28.0, 29.0]
+
+
+def test_md_correlation_matrix_uses_all_rows(qt_app, monkeypatch):
+    monkeypatch.setattr(
+        correlation_matrix,
+        "bandpass_filter",
+        lambda data, *_args, **_kwargs: np.asarray(data, dtype=float),
+    )
+    monkeypatch.setattr(correlation_matrix.settings, "CORRELATION_MATRIX_BLOCK_SIZE", 1000)
+
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=5000)
+    distances = np.arange(len(a), dtype=float)
+    measurement = Measurement(
+        channel_df=pd.DataFrame({"A": a, "B": a + rng.normal(size=len(a)), "C": rng.normal(size=len(a))}),
+        channels=["A", "B", "C"],
+        units={"A": "u", "B": "u", "C": "u"},
+        distances=distances,
+        sample_step=1.0,
+    )
+
+    controller = correlation_matrix.AnalysisController(measurement, "MD")
+    controller.analysis_range_low = 0
+    controller.analysis_range_high = distances[-1]
+    controller.plot()
+
+    assert len(controller.data_slice) == len(a)
+    assert np.allclose(controller.correlation_matrix, controller.data_slice.corr())
+    axes = controller.figure.axes
+    assert len(axes) == 9
+    assert sum(len(ax.images) for ax in axes) == 6
+    assert sum(image.get_array().sum() for image in axes[1].images) == len(a)
+
@@ -0,0 +1,31 @@
+import pytest
+from PyQt6.QtWidgets import QProgressDialog
+
+from gui.load_worker import load_measurement_in_background
+from utils.load_progress import LoadCancelledError
+from utils.measurement import Measurement
+
+
+def test_background_load_returns_measurement_and_runs_dialogs_on_gui_thread(qt_app):
+    measurement = Measurement(measurement_label="loaded")
+    threads = []
+
+    def load(progress):
+        progress.stage("Parsing")
+        threads.append(progress.run_in_main_thread(lambda: qt_app.thread().currentThread()))
+        progress.update(1.0)
+        return measurement
+
+    progress_dialog = QProgressDialog()
+    assert load_measurement_in_background(load, progress_dialog) is measurement
+    assert threads == [qt_app.thread()]
+    assert progress_dialog.labelText() == "Parsing..."
+
+
+def test_background_load_raises_cancellation_on_gui_thread(qt_app):
+    def load(progress):
+        progress.cancel()
+        progress.stage("Parsing")
+
+    with pytest.raises(LoadCancelledError):
+        load_measurement_in_background(load, QProgressDialog())
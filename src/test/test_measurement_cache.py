@@ -0,0 +1,157 @@
+import importlib
+import os
+import shutil
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from PyQt6.QtWidgets import QMessageBox
+
+from gui.main_window import MainWindow
+from loaders import tapio
+from utils import measurement_cache, store
+from utils.zip_utils import ZipSource
+
+TEST_DATA_FOLDER = os.path.join(os.path.dirname(__file__), '../../test-data')
+
+
+def copy_test_files(target_dir):
+    return [
+        shutil.copy(os.path.join(TEST_DATA_FOLDER, name), target_dir)
+        for name in ("test_CD.ca2", "test_CD.da2", "test_CD.pk2")
+    ]
+
+
+def test_cached_measurement_matches_loaded_measurement(tmp_path, monkeypatch):
+    monkeypatch.setattr(measurement_cache.settings, "MEASUREMENT_CACHE_ENABLED", True)
+    monkeypatch.setattr(measurement_cache.settings, "MEASUREMENT_CACHE_DIR", str(tmp_path / "cache"))
+    first_dir = tmp_path / "first"
+    second_dir = tmp_path / "second"
+    first_dir.mkdir()
+    second_dir.mkdir()
+
+    loads = []
+
+    def load(file_names):
+        loads.append(file_names)
+        return tapio.load_data(file_names)
+
+    first_files = copy_test_files(first_dir)
+    loaded = measurement_cache.load_with_cache(first_files, "tapio", lambda: load(first_files))
+    # Same file contents in another folder hit the cache
+    second_files = copy_test_files(second_dir)
+    cached = measurement_cache.load_with_cache(second_files, "tapio", lambda: load(second_files))
+
+    assert len(loads) == 1
+    assert cached.channels == loaded.channels
+    assert cached.units == loaded.units
+    assert cached.sample_step == loaded.sample_step
+    assert cached.data_file_path == os.path.join(str(second_dir), "test_CD.da2")
+    assert np.array_equal(cached.distances, loaded.distances)
+    pd.testing.assert_frame_equal(cached.channel_df, loaded.channel_df, check_dtype=False)
+
+    # Changed settings miss the cache
+    monkeypatch.setattr(measurement_cache.settings, "TAPE_WIDTH_MM", 30)
+    measurement_cache.load_with_cache(second_files, "tapio", lambda: load(second_files))
+    assert len(loads) == 2
+
+
+def test_evict_removes_least_recently_used_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(measurement_cache.settings, "MEASUREMENT_CACHE_DIR", str(tmp_path))
+    measurement = tapio.load_data(copy_test_files(tmp_path))
+
+    measurement_cache.store_measurement("old", measurement)
+    measurement_cache.store_measurement("new", measurement)
+    old_metadata = tmp_path / "old" / measurement_cache.METADATA_FILE
+    os.utime(old_metadata, (0, 0))
+
+    entry_size = measurement_cache.get_entry_size(str(tmp_path / "new"))
+    measurement_cache.evict(entry_size)
+
+    assert not (tmp_path / "old").exists()
+    assert (tmp_path / "new").exists()
+
+
+def test_parquet_loader_bypasses_cache_when_asking_for_sample_step(monkeypatch):
+    parquet_loader = importlib.import_module("loaders.tapio-parquet-loader")
+
+    monkeypatch.setattr(measurement_cache.settings, "PQ_LOADER_GENERATE_DISTANCES", False)
+    assert measurement_cache.is_cacheable(parquet_loader)
+    assert measurement_cache.is_cacheable(tapio)
+
+    monkeypatch.setattr(measurement_cache.settings, "PQ_LOADER_GENERATE_DISTANCES", True)
+    assert not measurement_cache.is_cacheable(parquet_loader)
+
+
+def test_evict_keeps_entries_that_can_not_be_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(measurement_cache.settings, "MEASUREMENT_CACHE_DIR", str(tmp_path))
+    measurement = tapio.load_data(copy_test_files(tmp_path))
+    measurement_cache.store_measurement("oldest", measurement)
+    measurement_cache.store_measurement("old", measurement)
+    measurement_cache.store_measurement("new", measurement)
+    os.utime(tmp_path / "oldest" / measurement_cache.METADATA_FILE, (0, 0))
+    os.utime(tmp_path / "old" / measurement_cache.METADATA_FILE, (1, 1))
+
+    replace = os.replace
+
+    def replace_unless_in_use(source, target):
+        if os.path.basename(source) == "oldest":
+            raise PermissionError("in use")
+        replace(source, target)
+
+    monkeypatch.setattr(measurement_cache.os, "replace", replace_unless_in_use)
+    entry_size = measurement_cache.get_entry_size(str(tmp_path / "new"))
+    measurement_cache.evict(entry_size)
+
+    # The entry in use is kept and not counted as freed, so the next one is evicted too
+    assert (tmp_path / "oldest").exists()
+    assert not (tmp_path / "old").exists()
+    assert not any(name.startswith(measurement_cache.EVICTED_PREFIX) for name in os.listdir(tmp_path))
+
+
+@pytest.mark.parametrize("loader_name", ["tapio", "auto_loader"])
+def test_zip_files_are_unpacked_only_on_cache_miss(tmp_path, monkeypatch, qt_app, loader_name):
+    monkeypatch.setattr(measurement_cache.settings, "MEASUREMENT_CACHE_ENABLED", True)
+    monkeypatch.setattr(measurement_cache.settings, "MEASUREMENT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(QMessageBox, "critical", lambda *args: pytest.fail(args[2]))
+    monkeypatch.setattr(store, "loaded_measurement", None)
+    archive_path = tmp_path / "measurement.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for name in ("test_CD.ca2", "test_CD.da2", "test_CD.pk2"):
+            archive.write(os.path.join(TEST_DATA_FOLDER, name), f"meas/{name}")
+
+    extracted = []
+    extract = ZipSource.extract
+
+    def record_extract(self, members, *args, **kwargs):
+        extracted.extend(member.filename for member in members)
+        return extract(self, members, *args, **kwargs)
+
+    monkeypatch.setattr(ZipSource, "extract", record_extract)
+    main_window = MainWindow()
+    try:
+        main_window.loadFiles(store.loaders[loader_name], [str(archive_path)])
+        loaded = store.loaded_measurement
+        assert sorted(extracted) == ["meas/test_CD.ca2", "meas/test_CD.da2", "meas/test_CD.pk2"]
+
+        extracted.clear()
+        main_window.loadFiles(store.loaders[loader_name], [str(archive_path)])
+        assert extracted == []
+        assert store.loaded_measurement is not loaded
+        pd.testing.assert_frame_equal(
+            store.loaded_measurement.channel_df, loaded.channel_df, check_dtype=False)
+    finally:
+        main_window.closeAll()
+        main_window._cleanup_temp_dirs()
+        main_window.close()
+
+
+def test_cache_key_changes_with_globals_read_by_calculated_channels(monkeypatch):
+    key = measurement_cache.get_cache_key("files", "tapio")
+
+    monkeypatch.setattr(measurement_cache.settings, "BASIS_WEIGHT_CHANNEL_CANDIDATES", ["Grammage"])
+    assert measurement_cache.get_cache_key("files", "tapio") != key
+
+    monkeypatch.undo()
+    assert measurement_cache.get_cache_key("files", "tapio") == key
@@ -134,3 +134,55 @@ def test_parquet_loader_preserves_uncalibrated_channels(tmp_path, monkeypatch):
     assert measurement.units["RawOnly"] == "V"
     assert np.allclose(measurement.channel_df["Moisture"], [10.0, 20.0, 30.0])
     assert np.allclose(measurement.channel_df["RawOnly"], [10.0, 20.0, 30.0])
+
+
+def test_resample_channels_matches_linear_interpolation_across_chunks():
+    loader = load_parquet_loader_module()
+    unique_distances = np.array([0.0, 0.0013, 0.0021, 0.0035, 0.0042, 0.0061])
+    source_rows = np.array([0, 2, 3, 4, 6, 7])
+    channel_values = [
+        np.array([1.0, 99.0, 2.0, 4.0, 3.0, 99.0, 5.0, 8.0]),
+        np.array([-1.0, 99.0, 0.5, 0.0, 2.5, 99.0, 1.0, 3.0]),
+    ]
+    resampled_distances = np.arange(0.0, 0.007, 0.001)
+
+    resampled = loader.resample_channels(
+        unique_distances,
+        source_rows,
+        channel_values,
+        resampled_distances,
+        chunk_size=3,
+    )
+
+    for index, values in enumerate(channel_values):
+        expected = loader.interp1d(
+            unique_distances,
+            values[source_rows],
+            kind="linear",
+            fill_value="extrapolate",
+        )(resampled_distances)
+        assert np.allclose(resampled[:, index], expected)
+
+
+def test_read_parquet_columns_streams_selected_columns_and_skips_rows(tmp_path):
+    loader = load_parquet_loader_module()
+    parquet_path = tmp_path / "sample-data.parquet"
+    pd.DataFrame(
+        {
+            "Distance": np.arange(10, dtype=float),
+            "BW": np.arange(10, 20, dtype=np.float32),
+            "Density": np.arange(20, 30, dtype=float),
+        },
+        index=np.arange(10) * 2,
+    ).to_parquet(parquet_path, engine="pyarrow", row_group_size=4)
+
+    parquet_file = loader.pq.ParquetFile(parquet_path)
+    columns = loader.get_parquet_channel_columns(parquet_file)
+    values = loader.read_parquet_columns(
+        parquet_file, ["BW", "Distance"], skip_rows=5, batch_size=3)
+
+    assert columns == ["Distance", "BW", "Density"]
+    assert list(values) == ["BW", "Distance"]
+    assert values["BW"].dtype == np.float32
+    assert values["BW"].tolist() == [15.0, 16.0, 17.0, 18.0, 19.0]
+    assert values["Distance"].tolist() == [5.0, 6.0, 7.0, 8.0, 9.0]
@@ -1,8 +1,14 @@
+from types import SimpleNamespace
+
 import numpy as np
 import pandas as pd
+import pytest
 
-from analyses import channel_correlation, coherence, formation, spectrogram, spectrum, vca
+import settings
+from analyses import channel_correlation, coherence, find_samples, formation, sos, spectrogram, spectrum, time_domain, vca
+from utils.filters import bandpass_filter
 from utils.measurement import Measurement
+from utils.result_cache import ResultCache
 
 
 def make_cd_measurement(selected_samples=None):
@@ -88,3 +94,261 @@ def test_vca_variance_components_do_not_return_negative_residual(qt_app):
     )
 
     assert all(value >= 0 for value in variances)
+
+
+def test_formation_index_matches_windowed_variance_for_profile_stacks(qt_app):
+    controller = formation.AnalysisController(make_cd_measurement(), "CD")
+    rng = np.random.default_rng(0)
+    profiles = 50 + rng.normal(size=(3, 40))
+    profiles[1, 5] = np.nan
+    profiles[2, 20:] = -1
+
+    result = controller.calculate_formation_index(profiles, window_size=8)
+
+    expected = np.zeros((3, 33))
+    for row, profile in enumerate(profiles):
+        for start in range(33):
+            window = profile[start:start + 8]
+            mean_value = np.mean(window)
+            if mean_value > 0:
+                expected[row, start] = np.var(window) / np.sqrt(mean_value)
+    assert np.allclose(result, expected)
+    assert np.allclose(
+        controller.calculate_formation_index(profiles[0], window_size=8), expected[0])
+
+
+def test_spectral_results_are_cached_per_measurement(qt_app):
+    measurement = make_cd_measurement()
+
+    for window_type in ("MD", "CD"):
+        measurement.spectral_cache.clear()
+        controller = spectrum.AnalysisController(measurement, window_type)
+        controller.plot()
+        first_amplitudes = controller.amplitudes.copy()
+        misses = measurement.spectral_cache.misses
+
+        spectrum.AnalysisController(measurement, window_type).plot()
+        controller.plot()
+
+        assert measurement.spectral_cache.misses == misses
+        assert np.array_equal(controller.amplitudes, first_amplitudes)
+
+        controller.nperseg = 8
+        controller.plot()
+        assert measurement.spectral_cache.misses == misses + 1
+
+
+def test_result_cache_evicts_least_recently_used_results():
+    cache = ResultCache(max_bytes=2 * 8 * 10)
+    cache.get_or_compute("a", lambda: np.zeros(10))
+    cache.get_or_compute("b", lambda: np.zeros(10))
+    cache.get_or_compute("a", lambda: np.ones(10))
+    cache.get_or_compute("c", lambda: np.zeros(10))
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 2, "bytes": 160}
+    assert not cache.get_or_compute("a", lambda: None).flags.writeable
+
+
+def test_filtered_channels_and_segments_are_cached_until_resegmented(qt_app):
+    measurement = make_cd_measurement()
+
+    segments = measurement.get_filtered_segments("A", 0.01, 0.4, filter_type="iir")
+    assert measurement.get_filtered_segments("A", 0.01, 0.4, filter_type="iir") is segments
+    assert np.allclose(
+        segments[1], bandpass_filter(measurement.segments["A"][1], 0.01, 0.4, 1.0, filter_type="iir"))
+    channel = measurement.get_filtered_channel("A", 0.01, 0.4, filter_type="iir", low_index=4, high_index=20)
+    assert np.allclose(
+        channel, bandpass_filter(measurement.channel_df["A"][4:20], 0.01, 0.4, 1.0, filter_type="iir"))
+
+    measurement.peak_locations = [0.0, 10.0, 20.0]
+    measurement.tape_width_mm = 2000.0
+    measurement.split_data_to_segments()
+
+    assert measurement.get_filtered_segments("A", 0.01, 0.4, filter_type="iir") is not segments
+    assert measurement.get_filtered_channel(
+        "A", 0.01, 0.4, filter_type="iir", low_index=4, high_index=20) is channel
+
+
+def split_segments_per_peak(measurement, channel):
+    segments = []
+    for start_dist, end_dist in zip(measurement.peak_locations[:-1], measurement.peak_locations[1:]):
+        start_index = np.searchsorted(measurement.distances, start_dist + measurement.tape_width_mm / 2000.0)
+        end_index = np.searchsorted(
+            measurement.distances, end_dist - measurement.tape_width_mm / 2000.0, side='right')
+        segments.append(measurement.channel_df[channel].iloc[start_index:end_index])
+    min_length = min(map(len, segments))
+    return np.array([
+        segment[(len(segment) - min_length) // 2:(len(segment) + min_length) // 2] for segment in segments])
+
+
+def test_moving_one_tape_only_replaces_adjacent_segments(qt_app):
+    distances = np.arange(400, dtype=float)
+    measurement = make_cd_measurement(selected_samples=[0, 4])
+    measurement.channel_df = pd.DataFrame({channel: np.random.default_rng(0).normal(size=len(distances))
+                                           for channel in measurement.channels})
+    measurement.distances = distances
+    measurement.tape_width_mm = 2000.0
+    measurement.peak_locations = [10.0, 50.0, 110.0, 160.0, 210.0, 260.0]
+    measurement.split_data_to_segments()
+    segments = measurement.segments["A"].copy()
+
+    controller = spectrum.AnalysisController(measurement, "CD")
+    controller.plot()
+    filtered = measurement.get_filtered_segments("A", 0.01, 0.2, filter_type="iir")
+    misses = measurement.spectral_cache.misses
+
+    measurement.peak_locations[2] = 112.0
+    measurement.split_data_to_segments()
+
+    for channel in measurement.channels:
+        assert np.array_equal(measurement.segments[channel], split_segments_per_peak(measurement, channel))
+    changed = np.flatnonzero(np.any(measurement.segments["A"] != segments, axis=1))
+    assert changed.tolist() == [1, 2]
+
+    refiltered = measurement.get_filtered_segments("A", 0.01, 0.2, filter_type="iir")
+    assert np.array_equal(refiltered[[0, 3, 4]], filtered[[0, 3, 4]])
+    assert np.allclose(refiltered[2], bandpass_filter(measurement.segments["A"][2], 0.01, 0.2, 1.0,
+                                                      filter_type="iir"))
+
+    controller.plot()
+    assert measurement.spectral_cache.misses == misses
+
+
+def test_segments_are_views_to_one_segment_tensor(qt_app):
+    measurement = make_cd_measurement()
+    measurement.channel_df = pd.DataFrame({channel: np.arange(200.0) * (index + 1)
+                                           for index, channel in enumerate(measurement.channels)})
+    measurement.distances = np.arange(200, dtype=float)
+    measurement.tape_width_mm = 2000.0
+    measurement.peak_locations = [10.0, 50.0, 90.0, 136.0]
+    measurement.split_data_to_segments()
+
+    tensor = measurement.segment_tensor
+    assert tensor.shape == (3, 3, 39) and tensor.flags.c_contiguous
+    assert all(measurement.segments[channel].base is tensor for channel in measurement.channels)
+
+    profiles = measurement.get_segment_stack("A", [1, 2], 5, 20)
+    assert np.shares_memory(profiles, tensor)
+    assert np.array_equal(profiles, split_segments_per_peak(measurement, "A")[1:3, 5:20])
+    stack = measurement.get_segment_stack(["Transmission", "A"], [2, 0, 7])
+    assert np.array_equal(stack, tensor[[2, 0]][:, [2, 0]])
+
+    measurement.peak_locations[3] = 138.0
+    measurement.split_data_to_segments()
+    assert measurement.segment_tensor is tensor
+    assert np.array_equal(measurement.segments["Basis Weight"], split_segments_per_peak(measurement, "Basis Weight"))
+
+
+def test_find_samples_detects_runs_above_threshold(qt_app, monkeypatch):
+    measurement = make_cd_measurement()
+    measurement.distances = np.arange(12, dtype=float)
+    controller = find_samples.AnalysisController(measurement, "MD")
+    signal = np.array([2, 0, 0, 2, np.nan, 2, 0, 2, 0, 0, 0, 2], dtype=float)
+    monkeypatch.setattr(controller, "get_filtered_signal", lambda channel: signal)
+    controller.threshold = 1.0
+    controller.min_length = 2.0
+
+    peaks = controller.detect_peaks("A")
+
+    # Runs 0, 3-5 and 11 are kept, run 7 is closer than min_length to run 3-5
+    assert peaks == [0.25, 4.0, 10.75]
+    assert measurement.peak_locations == peaks
+
+
+def test_find_samples_threshold_drag_redetects_tapes(qt_app, monkeypatch):
+    measurement = make_cd_measurement()
+    controller = find_samples.AnalysisController(measurement, "MD")
+    controller.min_length = 0.0
+    window = find_samples.AnalysisWindow(controller)
+    button = settings.FREQUENCY_SELECTOR_MOUSE_BUTTON
+    signal = controller.get_filtered_signal("A")
+
+    window.on_click(SimpleNamespace(inaxes=controller.figure.axes[0], button=button, ydata=0.5, xdata=1.0))
+    ax = controller.figure.axes[0]
+    window.on_threshold_drag(SimpleNamespace(inaxes=ax, ydata=-0.5))
+    assert controller.threshold == -0.5
+    assert len(controller.peaks) == len(find_samples_runs(signal, -0.5))
+
+    window.on_release(SimpleNamespace(inaxes=ax, button=button))
+    assert not window.dragging_threshold
+    assert measurement.peak_locations == controller.peaks
+
+
+def test_find_samples_draws_inverted_data_from_cached_envelope(qt_app, monkeypatch):
+    monkeypatch.setattr(settings, "PLOT_ENVELOPE_POINTS_PER_PIXEL", 0)
+    measurement = make_cd_measurement()
+    controller = find_samples.AnalysisController(measurement, "MD")
+    controller.band_pass_low = 0.0
+    controller.band_pass_high = 0.4
+    controller.invert_data = True
+    controller.plot()
+    pyramid = controller.envelope_lines[0].pyramid
+    misses = measurement.filter_cache.misses
+
+    controller.plot()
+
+    assert controller.envelope_lines[0].pyramid is pyramid
+    assert measurement.filter_cache.misses == misses
+    assert np.allclose(controller.envelope_lines[0].line.get_ydata(), controller.get_filtered_signal("A"))
+
+
+def find_samples_runs(signal, threshold):
+    above = np.concatenate([[False], signal > threshold, [False]])
+    return np.flatnonzero(np.diff(above.astype(int)) == 1)
+
+
+@pytest.mark.parametrize("points_per_pixel", [2, 0])
+def test_envelope_plots_autoscale_to_the_signal(qt_app, monkeypatch, points_per_pixel):
+    monkeypatch.setattr(settings, "PLOT_ENVELOPE_POINTS_PER_PIXEL", points_per_pixel)
+    distances = np.arange(200_000) * 0.001
+    values = 100 + 50 * np.sin(distances)
+    measurement = Measurement(
+        channel_df=pd.DataFrame({"A": values}),
+        channels=["A"],
+        units={"A": "u"},
+        distances=distances,
+        sample_step=0.001,
+    )
+
+    for module in (time_domain, find_samples):
+        controller = module.AnalysisController(measurement, "MD")
+        controller.band_pass_low = 0.0
+        controller.band_pass_high = 100.0
+        controller.show_unfiltered_data = True
+        controller.plot()
+        ax = controller.figure.axes[0]
+        x_low, x_high = ax.get_xlim()
+        y_low, y_high = ax.get_ylim()
+        x_scale = settings.TIME_DOMAIN_ANALYSIS_DISPLAY_UNIT_MULTIPLIER if module is time_domain else 1.0
+        assert x_low <= controller.distances[0] * x_scale and x_high >= controller.distances[-1] * x_scale
+        lines = [line for line in ax.lines if len(line.get_xdata()) > 100]
+        assert lines and all(y_low <= np.nanmin(line.get_ydata()) and np.nanmax(line.get_ydata()) <= y_high
+                             for line in lines)
+        assert y_high - y_low > 50
+
+
+def test_sos_window_method_selector_sets_method(qt_app, monkeypatch):
+    monkeypatch.setattr(settings, "SOS_METHOD", "least_squares")
+    distances = np.arange(20_000) * 0.001
+    measurement = Measurement(
+        channel_df=pd.DataFrame({"A": np.sin(2 * np.pi * 5 * distances)}),
+        channels=["A"],
+        units={"A": "u"},
+        distances=distances,
+        sample_step=0.001,
+    )
+    controller = sos.AnalysisController(measurement, "MD")
+    controller.channel = "A"
+    controller.data = measurement.channel_df["A"].to_numpy()
+    controller.selected_freqs = [5.0]
+    window = sos.AnalysisWindow(controller)
+
+    assert [window.sosMethodComboBox.itemText(i) for i in range(window.sosMethodComboBox.count())] == settings.SOS_METHODS
+    assert window.sosMethodComboBox.currentText() == "least_squares"
+
+    window.sosMethodComboBox.setCurrentText("synchronous_average")
+    assert controller.sos_method == "synchronous_average"
+    assert controller.figure.axes[0].get_title() == "A pattern at 5.00 1/m"
+    window.close()
+
@@ -6,7 +6,7 @@ import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils.statistics import normalized_least_squares_slope
+from utils.statistics import StreamingCovariance, normalized_least_squares_slope, pairwise_histograms
 
 
 class TestStatistics(unittest.TestCase):
@@ -48,6 +48,35 @@ class TestStatistics(unittest.TestCase):
         self.assertAlmostEqual(
             normalized_least_squares_slope(data, positions), 2.0)
 
+    def test_streaming_covariance_matches_numpy_over_blocks(self):
+        data = np.random.default_rng(0).normal(size=(1000, 3)) * [1.0, 5.0, 0.1] + [1e6, 0.0, -3.0]
+        data[:, 1] += data[:, 0] - 1e6
+        data[10, 2] = np.nan
+
+        statistics = StreamingCovariance(3)
+        for start in range(0, len(data), 64):
+            statistics.update(data[start:start + 64])
+
+        finite = np.delete(data, 10, axis=0)
+        self.assertEqual(statistics.count, len(finite))
+        np.testing.assert_allclose(statistics.mean, finite.mean(axis=0))
+        np.testing.assert_allclose(statistics.covariance(), np.cov(finite, rowvar=False))
+        np.testing.assert_allclose(statistics.correlation(), np.corrcoef(finite, rowvar=False))
+        np.testing.assert_array_equal(statistics.maximum, finite.max(axis=0))
+
+    def test_pairwise_histograms_match_histogram2d(self):
+        data = np.random.default_rng(1).normal(size=(500, 2))
+        minimum, maximum = data.min(axis=0), data.max(axis=0)
+
+        pair_counts, channel_counts = pairwise_histograms(data, minimum, maximum, 8, 100, channel_bins=5)
+
+        expected, _, _ = np.histogram2d(data[:, 1], data[:, 0], bins=8,
+                                        range=[(minimum[1], maximum[1]), (minimum[0], maximum[0])])
+        np.testing.assert_array_equal(pair_counts[1, 0], expected)
+        np.testing.assert_array_equal(pair_counts[0, 1], expected.T)
+        np.testing.assert_array_equal(
+            channel_counts[0], np.histogram(data[:, 0], bins=5, range=(minimum[0], maximum[0]))[0])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pytest
+
+from loaders import tapio
+from utils.channel_store import LazyChannelStore
+from utils.load_progress import LoadCancelledError, LoadProgress
+
+
+def test_apply_calibrations_matches_elementwise_calibration():
+    sensor_names = ["Linear", "Log", "Raw"]
+    data = np.array([
+        [100, 40000, 7],
+        [200, 50000, 8],
+        [300, 60000, 9],
+    ])
+    calibration_types = {"Linear": 0.0, "Log": 1.0, "Raw": 5.0}
+    scales = {"Linear": 2.0, "Log": -300.0, "Raw": 1.0}
+    offsets = {"Linear": 1.5, "Log": 690.0, "Raw": 0.0}
+    asymptotic_values = {"Linear": 0.0, "Log": -4.4, "Raw": 0.0}
+    ad_factor = 6553.6
+
+    calibrated = tapio.apply_calibrations(
+        list(data.T),
+        sensor_names,
+        calibration_types,
+        ad_factor,
+        scales,
+        offsets,
+        asymptotic_values,
+    )
+
+    expected_linear = [
+        tapio.linear_calibration(y, ad_factor, scales["Linear"], offsets["Linear"])
+        for y in data[:, 0]
+    ]
+    expected_log = [
+        tapio.logarithmic_calibration(
+            y, ad_factor, scales["Log"], offsets["Log"], asymptotic_values["Log"])
+        for y in data[:, 1]
+    ]
+
+    assert calibrated.dtype == float
+    assert np.allclose(calibrated[:, 0], expected_linear)
+    assert np.allclose(calibrated[:, 1], expected_log)
+    assert np.allclose(calibrated[:, 2], data[:, 2])
+
+
+def test_read_binary_data_aligns_channels_as_views(tmp_path):
+    data_file_path = tmp_path / "data.da2"
+    samples = np.array([
+        [1, -10],
+        [2, -20],
+        [3, -30],
+        [4, -40],
+    ], dtype='>i2')
+    samples.tofile(data_file_path)
+
+    data = tapio.read_binary_data(str(data_file_path), 2)
+    aligned = tapio.align_sensor_data(
+        data, ["A", "B"], {"A": 0.0, "B": 0.002}, 0.001)
+
+    assert data.shape == (4, 2)
+    assert aligned[0].tolist() == [1, 2]
+    assert aligned[1].tolist() == [-30, -40]
+    assert all(np.shares_memory(channel, data) for channel in aligned)
+
+
+def test_lazy_loading_matches_eager_loading(monkeypatch):
+    test_data_folder = os.path.join(os.path.dirname(__file__), '../../test-data')
+    file_names = [
+        os.path.join(test_data_folder, name)
+        for name in ("test_CD.ca2", "test_CD.da2", "test_CD.pk2")
+    ]
+
+    monkeypatch.setattr(tapio.settings, "LAZY_CHANNEL_LOADING", False)
+    eager = tapio.load_data(file_names)
+    monkeypatch.setattr(tapio.settings, "LAZY_CHANNEL_LOADING", True)
+    lazy = tapio.load_data(file_names)
+
+    assert isinstance(lazy.channel_df, LazyChannelStore)
+    assert lazy.channels == eager.channels
+    assert len(lazy.channel_df) == len(eager.channel_df)
+    for channel in eager.channels:
+        assert np.allclose(
+            lazy.channel_df[channel], eager.channel_df[channel], equal_nan=True)
+
+
+def test_load_reports_stages_and_can_be_cancelled():
+    test_data_folder = os.path.join(os.path.dirname(__file__), '../../test-data')
+    file_names = [
+        os.path.join(test_data_folder, name)
+        for name in ("test_CD.ca2", "test_CD.da2", "test_CD.pk2")
+    ]
+
+    stages = []
+    progress = LoadProgress(lambda stage, fraction: stages.append((stage, fraction)))
+    assert tapio.load_data(file_names, progress=progress) is not None
+    reported_stages = list(dict.fromkeys(stage for stage, _ in stages))
+    assert reported_stages == ["Parsing", "Aligning", "Calibrating", "Calculating channels"]
+    assert ("Calibrating", 1.0) in stages
+
+    def cancel_when_calibrating(stage, fraction):
+        if stage == "Calibrating":
+            progress.cancel()
+
+    progress = LoadProgress(cancel_when_calibrating)
+    with pytest.raises(LoadCancelledError):
+        tapio.load_data(file_names, progress=progress)
@@ -1,44 +1,22 @@
 import os
 import shutil
+import time
 import zipfile
 
 import pyzipper
-from PyQt6.QtWidgets import QInputDialog, QMessageBox
+import pytest
+from PyQt6.QtCore import QThread
+from PyQt6.QtWidgets import QInputDialog, QMessageBox, QProgressDialog
 
 import utils.zip_utils as zip_utils
-
-
-class DummyProgressDialog:
-    def __init__(self, *args, **kwargs):
-        pass
-
-    def setWindowModality(self, *args, **kwargs):
-        pass
-
-    def setWindowTitle(self, *args, **kwargs):
-        pass
-
-    def setLabelText(self, *args, **kwargs):
-        pass
-
-    def setRange(self, *args, **kwargs):
-        pass
-
-    def setCancelButton(self, *args, **kwargs):
-        pass
-
-    def show(self):
-        pass
-
-    def close(self):
-        pass
+from gui.load_worker import load_measurement_in_background
+from utils.load_progress import LoadCancelledError, LoadProgress
 
 
 def stub_zip_dialogs(monkeypatch):
     monkeypatch.setattr(QMessageBox, "critical", lambda *args, **kwargs: None)
     monkeypatch.setattr(QMessageBox, "warning", lambda *args, **kwargs: None)
     monkeypatch.setattr(QMessageBox, "information", lambda *args, **kwargs: None)
-    monkeypatch.setattr(zip_utils, "QProgressDialog", DummyProgressDialog)
 
 
 def test_zip_unpack_extracts_unencrypted_archive(tmp_path, monkeypatch, qt_app):
@@ -47,9 +25,9 @@ def test_zip_unpack_extracts_unencrypted_archive(tmp_path, monkeypatch, qt_app):
     with zipfile.ZipFile(archive_path, "w") as archive:
         archive.writestr("nested/data.txt", "plain payload")
 
-    extracted_paths, temp_dir = zip_utils.unpack_zip_to_temp_with_password_prompt(
-        str(archive_path), None
-    )
+    zip_source = zip_utils.ZipSource(str(archive_path))
+    extracted_paths = zip_source.extract(zip_source.members)
+    temp_dir = zip_source.temp_dir
 
     try:
         assert extracted_paths is not None
@@ -81,9 +59,9 @@ def test_zip_unpack_extracts_aes_archive_after_password_prompt(
         lambda *args, **kwargs: ("secret", True),
     )
 
-    extracted_paths, temp_dir = zip_utils.unpack_zip_to_temp_with_password_prompt(
-        str(archive_path), None
-    )
+    zip_source = zip_utils.ZipSource(str(archive_path))
+    extracted_paths = zip_source.extract(zip_source.members)
+    temp_dir = zip_source.temp_dir
 
     try:
         assert extracted_paths is not None
@@ -93,3 +71,102 @@ def test_zip_unpack_extracts_aes_archive_after_password_prompt(
     finally:
         if temp_dir:
             shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_zip_unpack_extracts_only_members_matching_patterns(tmp_path, monkeypatch, qt_app):
+    stub_zip_dialogs(monkeypatch)
+    archive_path = tmp_path / "measurement.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("meas/data.DA2", b"\x00\x01" * 100)
+        archive.writestr("meas/header.pk2", "header")
+        archive.writestr("meas/analysis.json", "{}")
+        archive.writestr("meas/photo.jpg", "not needed")
+
+    member_patterns = zip_utils.get_member_patterns(
+        "All Files (*);;Data files (*.da2);;Header files (*.pk2)")
+    zip_source = zip_utils.ZipSource(str(archive_path), member_patterns)
+    extracted_paths = zip_source.extract(zip_source.members)
+    temp_dir = zip_source.temp_dir
+
+    try:
+        assert sorted(os.path.basename(path) for path in extracted_paths) == [
+            "analysis.json", "data.DA2", "header.pk2"]
+        assert all(os.path.isfile(path) for path in extracted_paths)
+        assert not os.path.exists(os.path.join(temp_dir, "meas", "photo.jpg"))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_member_patterns_extract_everything_for_catch_all_file_types():
+    assert zip_utils.get_member_patterns("All Files (*)") is None
+    assert zip_utils.get_member_patterns("All Supported Files (*.*)") is None
+
+
+def test_zip_source_extracts_in_background_and_asks_password_on_gui_thread(
+    tmp_path, monkeypatch, qt_app
+):
+    stub_zip_dialogs(monkeypatch)
+    archive_path = tmp_path / "protected.zip"
+    with pyzipper.AESZipFile(
+        archive_path, "w", compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES
+    ) as archive:
+        archive.setpassword(b"secret")
+        archive.writestr("meas/settings.py", "TAPE_WIDTH_MM = 20")
+        archive.writestr("meas/data.da2", b"\x00\x01" * 100)
+
+    password_threads = []
+
+    def get_text(*args, **kwargs):
+        password_threads.append(QThread.currentThread())
+        return "secret", True
+
+    monkeypatch.setattr(QInputDialog, "getText", get_text)
+
+    zip_source = zip_utils.ZipSource(str(archive_path))
+    # Members are listed without the password
+    assert [member.filename for member in zip_source.pending_members] == [
+        "meas/settings.py", "meas/data.da2"]
+
+    progress_dialog = QProgressDialog()
+    try:
+        extracted_paths = load_measurement_in_background(
+            lambda progress: zip_source.extract(zip_source.pending_members, None, progress),
+            progress_dialog)
+
+        assert [os.path.basename(path) for path in extracted_paths] == ["settings.py", "data.da2"]
+        assert password_threads == [qt_app.thread()]
+        assert progress_dialog.labelText() == "Unzipping..."
+        assert zip_source.pending_members == []
+    finally:
+        shutil.rmtree(zip_source.temp_dir, ignore_errors=True)
+
+
+def test_zip_source_extraction_stops_when_cancelled(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_utils, "MAX_EXTRACTION_WORKERS", 1)
+    archive_path = tmp_path / "measurement.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for index in range(20):
+            archive.writestr(f"meas/data_{index}.da2", b"\x00\x01" * 100)
+
+    # Members after the first are slow to extract, so that the rest are still pending when cancelled
+    extract = pyzipper.AESZipFile.extract
+    extract_calls = []
+
+    def slow_extract(self, member, *args, **kwargs):
+        extract_calls.append(member)
+        if len(extract_calls) > 1:
+            time.sleep(0.1)
+        return extract(self, member, *args, **kwargs)
+
+    monkeypatch.setattr(pyzipper.AESZipFile, "extract", slow_extract)
+    zip_source = zip_utils.ZipSource(str(archive_path))
+    progress = LoadProgress(lambda stage, fraction: progress.cancel() if fraction > 0 else None)
+    try:
+        with pytest.raises(LoadCancelledError):
+            zip_source.extract(zip_source.pending_members, None, progress)
+
+        extracted_files = os.listdir(os.path.join(zip_source.temp_dir, "meas"))
+        assert 0 < len(extracted_files) < 20
+    finally:
+        shutil.rmtree(zip_source.temp_dir, ignore_errors=True)
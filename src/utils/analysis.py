@@ -5,6 +5,7 @@ from typing import Type, List, Optional, TypeVar, Generic, Any
 from dataclasses import dataclass
 from gui.components import PlotMixin
 from utils.measurement import Measurement
+from utils.result_cache import make_key
 from utils.types import PlotAnnotation, AnalysisType, PreconfiguredAnalysis
 import settings
 import json
@@ -35,6 +36,32 @@ class AnalysisControllerBase(QObject, PlotMixin):
         if annotations:
             self.set_annotations(annotations)
 
+    def get_cached_spectral_result(self, estimator: str, channels: list[str], parameters: dict, compute):
+        """
+        Return a spectral result from the cache shared by all windows of the
+        measurement, calling compute() only on a miss.
+
+        The cache key is made of the estimator, channels, window type,
+        analysis index range, selected CD samples and estimator parameters.
+        CD samples are identified by their position in the channel data, so
+        results stay valid when other samples are moved.
+        """
+        samples = None
+        if self.window_type == "CD":
+            samples = self.measurement.get_segment_positions(self.selected_samples)
+            if samples is None:
+                samples = ("samples", self.selected_samples)
+        key = make_key((
+            estimator,
+            channels,
+            self.window_type,
+            int(self.low_index),
+            int(self.high_index),
+            samples,
+            parameters,
+        ))
+        return self.measurement.spectral_cache.get_or_compute(key, compute)
+
     def set_default(self, key: str, value: Any):
         if not hasattr(self, key):
             setattr(self, key, value)
@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+ChannelLoader = Callable[[], np.ndarray]
+
+
+class _LazyILocIndexer:
+    def __init__(self, store: "LazyChannelStore"):
+        self._store = store
+
+    def __getitem__(self, key) -> pd.DataFrame:
+        index = pd.RangeIndex(len(self._store))[key]
+        return pd.DataFrame(
+            {name: self._store.get_values(name)[key] for name in self._store.columns},
+            index=index,
+        )
+
+
+class LazyChannelStore:
+    """
+    Stand-in for Measurement.channel_df that loads channels on first access.
+
+    Each channel is registered with a loader that decodes, aligns and
+    calibrates it. Loaded channels are cached, and the least recently used
+    ones are dropped when the cache grows past memory_budget_bytes. Only the
+    parts of the DataFrame interface used by analyses and exporters are
+    supported: column access, .iloc row slicing, .columns, .empty and len().
+    """
+
+    def __init__(self, length: int, memory_budget_bytes: Optional[int] = None):
+        self._length = length
+        self._loaders: dict[str, ChannelLoader] = {}
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.memory_budget_bytes = memory_budget_bytes
+        self.iloc = _LazyILocIndexer(self)
+
+    def add_channel(self, name: str, loader: ChannelLoader, values=None):
+        """Register a channel loader, optionally with already loaded values."""
+        self._loaders[name] = loader
+        self._cache.pop(name, None)
+        if values is not None:
+            self._store_values(name, values)
+
+    def get_values(self, name: str) -> np.ndarray:
+        """Return the values of a channel, loading them if not cached."""
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name]
+        if name not in self._loaders:
+            raise KeyError(name)
+        return self._store_values(name, self._loaders[name]())
+
+    def _store_values(self, name: str, values) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        if len(values) != self._length:
+            raise ValueError(
+                f"Channel {name} has {len(values)} values, expected {self._length}")
+        self._cache[name] = values
+        self._cache.move_to_end(name)
+        self._evict()
+        return values
+
+    def _evict(self):
+        if self.memory_budget_bytes is None:
+            return
+        # Always keep the most recently used channel
+        while len(self._cache) > 1 and self.cached_bytes > self.memory_budget_bytes:
+            self._cache.popitem(last=False)
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(values.nbytes for values in self._cache.values())
+
+    @property
+    def cached_channels(self) -> list[str]:
+        return list(self._cache.keys())
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index(list(self._loaders.keys()))
+
+    @property
+    def empty(self) -> bool:
+        return self._length == 0 or not self._loaders
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._length, len(self._loaders)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, name) -> bool:
+        return name in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders.keys())
+
+    def __getitem__(self, key):
+        if isinstance(key, (list, tuple, pd.Index)):
+            return pd.DataFrame({name: self.get_values(name) for name in key})
+        return pd.Series(self.get_values(key), name=key, copy=False)
+
+    def drop(self, columns, errors: str = 'raise') -> "LazyChannelStore":
+        """Return a store without the given channels, like DataFrame.drop."""
+        if isinstance(columns, str):
+            columns = [columns]
+        missing = [name for name in columns if name not in self._loaders]
+        if missing and errors == 'raise':
+            raise KeyError(f"{missing} not found in channels")
+
+        store = LazyChannelStore(self._length, self.memory_budget_bytes)
+        for name, loader in self._loaders.items():
+            if name not in columns:
+                store._loaders[name] = loader
+                if name in self._cache:
+                    store._cache[name] = self._cache[name]
+        return store
@@ -0,0 +1,134 @@
+"""
+Min/max envelopes for drawing long signals.
+
+On screen, a line with millions of points is at most one vertical stroke per
+pixel column, but every point still has to be transformed and drawn.
+EnvelopePyramid keeps the minimum and maximum of blocks of samples at several
+block sizes, so the envelope of any index range can be drawn with a number of
+points bounded by the plot width. EnvelopeLine draws the envelope and refines
+it when the x limits of the axes change.
+"""
+from typing import Optional
+
+import numpy as np
+
+
+def reduce_blocks(values: np.ndarray, factor: int, reduce) -> np.ndarray:
+    """Reduce every factor consecutive values with reduce, the last block can be shorter."""
+    full_length = len(values) - len(values) % factor
+    reduced = reduce.reduce(values[:full_length].reshape(-1, factor), axis=1)
+    if full_length < len(values):
+        reduced = np.append(reduced, reduce.reduce(values[full_length:]))
+    return reduced
+
+
+class EnvelopePyramid:
+    """
+    Minimum and maximum of blocks of a signal at block sizes factor, factor**2, ...
+
+    NaNs are ignored unless a whole block is NaN.
+
+    :param data: 1-D signal.
+    :param factor: Ratio of the block sizes of consecutive levels.
+    :param min_blocks: Levels are added until a level has at most this many blocks.
+    """
+
+    def __init__(self, data, factor: int = 4, min_blocks: int = 256):
+        self.data = np.asarray(data, dtype=float).reshape(-1)
+        self.levels: list[tuple[int, np.ndarray, np.ndarray]] = []
+        mins = maxs = self.data
+        block_size = 1
+        while len(mins) > min_blocks:
+            mins = reduce_blocks(mins, factor, np.fmin)
+            maxs = reduce_blocks(maxs, factor, np.fmax)
+            block_size *= factor
+            self.levels.append((block_size, mins, maxs))
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the levels, the signal itself is not counted."""
+        return sum(mins.nbytes + maxs.nbytes for _, mins, maxs in self.levels)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get_envelope(self, low_index: int, high_index: int, max_points: float):
+        """
+        Points to draw for data[low_index:high_index] with at most max_points points.
+
+        Ranges that fit are returned as they are. Otherwise the finest level
+        that fits is used, with the minimum and maximum of each block placed
+        at the center of the block.
+
+        :return: Tuple of sample indexes and values of the points.
+        """
+        low_index = max(int(low_index), 0)
+        high_index = min(int(high_index), len(self.data))
+        if high_index <= low_index:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        if high_index - low_index <= max_points or not self.levels:
+            return np.arange(low_index, high_index), self.data[low_index:high_index]
+
+        for block_size, mins, maxs in self.levels:
+            first = low_index // block_size
+            stop = -(-high_index // block_size)
+            if 2 * (stop - first) <= max_points:
+                break
+        centers = np.clip(np.arange(first, stop) * block_size + block_size // 2, low_index, high_index - 1)
+        values = np.column_stack((mins[first:stop], maxs[first:stop])).reshape(-1)
+        return np.repeat(centers, 2), values
+
+
+class EnvelopeLine:
+    """
+    Line of the envelope of a signal, refined to the visible x range when the x limits change.
+
+    The axes only keeps a weak reference to the callback, so the caller has to
+    keep the EnvelopeLine as long as the plot is shown.
+
+    :param ax: Axes to draw to.
+    :param x: Ascending x coordinates of the samples of the signal.
+    :param pyramid: Envelope pyramid of the signal.
+    :param low_index: First sample to draw.
+    :param high_index: Sample after the last one to draw, the end of the signal if None.
+    :param points_per_pixel: Points per pixel of axes width, 0 draws every sample.
+    :param x_scale: Multiplier from x to the plotted x coordinates.
+    :param y_scale: Multiplier from the signal to the plotted y coordinates, -1 draws it inverted.
+    """
+
+    def __init__(self, ax, x, pyramid: EnvelopePyramid, low_index: int = 0,
+                 high_index: Optional[int] = None, points_per_pixel: float = 2,
+                 x_scale: float = 1.0, y_scale: float = 1.0, **plot_kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.pyramid = pyramid
+        self.low_index = max(int(low_index), 0)
+        length = min(len(self.x), len(pyramid))
+        self.high_index = length if high_index is None else min(int(high_index), length)
+        self.points_per_pixel = points_per_pixel
+        self.x_scale = x_scale
+        self.y_scale = y_scale
+        # Plot the initial envelope directly so that the axes autoscale to the signal
+        self.line, = ax.plot(*self.get_points(self.low_index, self.high_index), **plot_kwargs)
+        self.callback_id = ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def get_max_points(self) -> float:
+        if self.points_per_pixel <= 0:
+            return np.inf
+        return max(self.ax.bbox.width, 1) * self.points_per_pixel
+
+    def get_points(self, low_index: int, high_index: int):
+        indexes, values = self.pyramid.get_envelope(low_index, high_index, self.get_max_points())
+        if self.y_scale != 1:
+            values = values * self.y_scale
+        return self.x[indexes] * self.x_scale, values
+
+    def set_range(self, low_index: int, high_index: int):
+        self.line.set_data(*self.get_points(low_index, high_index))
+
+    def on_xlim_changed(self, ax):
+        x_low, x_high = sorted(ax.get_xlim())
+        # One extra sample on both sides so that the line continues past the view
+        low_index = np.searchsorted(self.x, x_low / self.x_scale) - 1
+        high_index = np.searchsorted(self.x, x_high / self.x_scale, side='right') + 1
+        self.set_range(max(low_index, self.low_index), min(high_index, self.high_index))
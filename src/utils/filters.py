@@ -1,4 +1,7 @@
-from scipy.signal import firwin, convolve, freqz
+from collections import OrderedDict
+from functools import lru_cache
+from scipy.signal import butter, firwin, freqz, resample_poly, sosfiltfilt
+from scipy.fft import next_fast_len, rfft, irfft
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -18,43 +21,142 @@ def mirror_pad(data, numtaps):
     return np.concatenate((start_mirror, data, end_mirror))
 
 
-def bandpass_filter(data, lowcut, highcut, fs, numtaps=settings.FILTER_NUMTAPS, window="hamming", mirror=True, use_epsilon=True, correct_mean=True):
+def get_padded_samples(data, pad, start, stop, mirror=True):
     """
-    Applies a phase-correct FIR bandpass filter with Hamming windowing.
-    The number of taps is automatically adjusted if the input data is too short.
+    Samples start:stop of the last axis of data padded with pad samples at both ends.
 
-    :param data: Array-like, the data to filter.
-    :param lowcut: float, the low cutoff frequency.
-    :param highcut: float, the high cutoff frequency.
-    :param fs: float, the sampling rate.
-    :param numtaps: int, the number of taps in the filter.
-    :param mirror: bool, optional, if set to True, pads the data with a mirrored copy.
-    :return: Array-like, the filtered data.
+    The padding mirrors the data like mirror_pad, or is zeros if mirror is
+    False. Samples outside the padded data are zeros.
+
+    :param data: Array-like, 1-D data or 2-D stack of rows.
+    :param pad: int, the number of padding samples at each end.
+    :return: Array-like, the samples with the last axis of length stop - start.
     """
+    length = data.shape[-1]
+    indexes = np.arange(start, stop) - pad
+    if mirror:
+        indexes = np.where(indexes < 0, -1 - indexes, indexes)
+        indexes = np.where(indexes >= length, 2 * length - 1 - indexes, indexes)
+    valid = (indexes >= 0) & (indexes < length)
+    samples = np.zeros(data.shape[:-1] + (stop - start,))
+    samples[..., valid] = data[..., indexes[valid]]
+    return samples
 
-    data = np.asarray(data, dtype=float)
-    data_length = len(data)
-    if data_length < 4:
-        return data.copy()
 
-    original_mean = np.mean(data)
+def get_filter_key(numtaps, lowcut, highcut, fs, window):
+    return (int(numtaps), float(lowcut), float(highcut), float(fs), window)
 
-    # Adjust number of taps if data is too short
-    if data_length < numtaps:
-        # Calculate new number of taps that's smaller than data length
-        # Keep it odd for FIR filter
-        new_numtaps = data_length - (data_length % 2) - 1
-        # Ensure we have at least 3 taps for a meaningful filter
-        new_numtaps = max(3, new_numtaps)
-        numtaps = new_numtaps
-        logging.warning("Data length too small for filter length. Using smaller filter window length.")
 
-    epsilon = 0.0001
-    # Pad the data with a mirrored copy if mirror is True
-    if mirror:
-        data = mirror_pad(data, numtaps)
+class FIRFilterBank:
+    """
+    Band-pass FIR filters with memoized coefficients.
+
+    Coefficients and their frequency responses are designed once per
+    (numtaps, lowcut, highcut, fs, window) and kept for the most recently used
+    max_filters filters. Data is filtered block by block with FFT overlap-save,
+    so long channels are filtered without padded copies of the whole channel.
+
+    :param block_size: int, the number of output samples computed per FFT block.
+    :param max_filters: int, the number of filter designs to keep.
+    """
+
+    def __init__(self, block_size=settings.FILTER_BLOCK_SIZE, max_filters=settings.FILTER_BANK_MAX_FILTERS):
+        self.block_size = block_size
+        self.max_filters = max_filters
+        self._filters = OrderedDict()
+
+    def get_coefficients(self, numtaps, lowcut, highcut, fs, window="hamming"):
+        """
+        Returns the coefficients of a band-pass filter, designing them on first use.
+
+        :return: Array-like, read-only filter coefficients.
+        """
+        key = get_filter_key(numtaps, lowcut, highcut, fs, window)
+        if key in self._filters:
+            self._filters.move_to_end(key)
+            return self._filters[key]["coefficients"]
+
+        fir_coeff = design_bandpass_filter(*key)
+        fir_coeff.setflags(write=False)
+        self._filters[key] = {"coefficients": fir_coeff, "responses": {}}
+        while len(self._filters) > self.max_filters:
+            self._filters.popitem(last=False)
+        return fir_coeff
+
+    def _get_frequency_response(self, key, nfft):
+        responses = self._filters[key]["responses"]
+        if nfft not in responses:
+            responses[nfft] = rfft(self._filters[key]["coefficients"], nfft)
+        return responses[nfft]
 
-    # Create the filter coefficients
+    def filter(self, data, lowcut, highcut, fs, numtaps=settings.FILTER_NUMTAPS, window="hamming", mirror=True, correct_mean=True):
+        """
+        Applies a phase-correct FIR bandpass filter along the last axis of data.
+        The number of taps is automatically adjusted if the input data is too short.
+
+        :param data: Array-like, 1-D data or 2-D stack of rows to filter.
+        :param lowcut: float, the low cutoff frequency.
+        :param highcut: float, the high cutoff frequency.
+        :param fs: float, the sampling rate.
+        :param numtaps: int, the number of taps in the filter.
+        :param mirror: bool, optional, if set to True, pads the data with a mirrored copy.
+        :param correct_mean: bool, optional, if set to True, keeps the mean of each row.
+        :return: Array-like, the filtered data.
+        """
+        data = np.asarray(data, dtype=float)
+        data_length = data.shape[-1]
+        if data_length < 4:
+            return data.copy()
+
+        # Adjust number of taps if data is too short
+        if data_length < numtaps:
+            # Calculate new number of taps that's smaller than data length
+            # Keep it odd for FIR filter
+            new_numtaps = data_length - (data_length % 2) - 1
+            # Ensure we have at least 3 taps for a meaningful filter
+            new_numtaps = max(3, new_numtaps)
+            numtaps = new_numtaps
+            logging.warning("Data length too small for filter length. Using smaller filter window length.")
+
+        self.get_coefficients(numtaps, lowcut, highcut, fs, window)
+        key = get_filter_key(numtaps, lowcut, highcut, fs, window)
+
+        # Overlap-save: each block of output needs numtaps - 1 preceding input samples
+        pad = numtaps if mirror else 0
+        offset = (numtaps - 1) // 2 + pad
+        block_size = min(max(self.block_size, numtaps), data_length)
+        nfft = next_fast_len(block_size + numtaps - 1, real=True)
+        block_size = nfft - numtaps + 1
+        response = self._get_frequency_response(key, nfft)
+
+        filtered_data = np.empty(data.shape)
+        for start in range(0, data_length, block_size):
+            stop = min(start + block_size, data_length)
+            first_sample = offset + start - numtaps + 1
+            samples = get_padded_samples(
+                data, pad, first_sample, offset + stop, mirror)
+            filtered_block = irfft(rfft(samples, nfft) * response, nfft)
+            filtered_data[..., start:stop] = filtered_block[..., numtaps - 1:numtaps - 1 + stop - start]
+
+        if correct_mean:
+            filtered_data -= np.mean(filtered_data, axis=-1, keepdims=True)
+            filtered_data += np.mean(data, axis=-1, keepdims=True)
+
+        return filtered_data
+
+
+def design_bandpass_filter(numtaps, lowcut, highcut, fs, window="hamming"):
+    """
+    Designs the coefficients of a band-pass FIR filter.
+
+    :param numtaps: int, the number of taps in the filter.
+    :param lowcut: float, the low cutoff frequency.
+    :param highcut: float, the high cutoff frequency.
+    :param fs: float, the sampling rate.
+    :param window: str, "hamming" applies an additional Hamming window to the coefficients.
+    :return: Array-like, the filter coefficients.
+    """
+    epsilon = 0.0001
     fir_coeff = firwin(numtaps, [epsilon+lowcut, highcut], pass_zero=False, fs=fs)
 
     if window == "hamming":
@@ -86,15 +188,142 @@ def bandpass_filter(data, lowcut, highcut, fs, numtaps=settings.FILTER_NUMTAPS,
         plt.xlim(0, fs / 2)
         plt.show()
 
-    # Apply the filter
-    filtered_data = convolve(data, fir_coeff, mode='same')
+    return fir_coeff
 
-    # Remove the mirrored padding if mirror is True
-    if mirror:
-        filtered_data = filtered_data[numtaps:-numtaps]
+
+filter_bank = FIRFilterBank()
+
+
+@lru_cache(maxsize=settings.FILTER_BANK_MAX_FILTERS)
+def design_iir_bandpass_filter(order, lowcut, highcut, fs):
+    """
+    Designs a Butterworth band-pass filter as second-order sections.
+
+    A low cutoff of zero gives a low-pass filter and a high cutoff at or above
+    the Nyquist frequency a high-pass filter.
+
+    :return: Array-like, the second-order sections, or None if the band covers all frequencies.
+    """
+    nyquist = fs / 2
+    if lowcut <= 0 and highcut >= nyquist:
+        return None
+    if lowcut <= 0:
+        sos = butter(order, highcut, btype="lowpass", output="sos", fs=fs)
+    elif highcut >= nyquist:
+        sos = butter(order, lowcut, btype="highpass", output="sos", fs=fs)
+    else:
+        sos = butter(order, [lowcut, highcut], btype="bandpass", output="sos", fs=fs)
+    return sos
+
+
+def iir_bandpass_filter(data, lowcut, highcut, fs, order=settings.IIR_FILTER_ORDER, mirror=True, correct_mean=True):
+    """
+    Applies a zero-phase Butterworth bandpass filter along the last axis of data.
+    The filter runs forward and backward with sosfiltfilt, so its order is doubled.
+
+    :param data: Array-like, 1-D data or 2-D stack of rows to filter.
+    :param lowcut: float, the low cutoff frequency.
+    :param highcut: float, the high cutoff frequency.
+    :param fs: float, the sampling rate.
+    :param order: int, the order of the Butterworth filter.
+    :param mirror: bool, optional, if set to True, pads the data with a mirrored copy, otherwise with an odd extension.
+    :param correct_mean: bool, optional, if set to True, keeps the mean of each row.
+    :return: Array-like, the filtered data.
+    """
+    data = np.asarray(data, dtype=float)
+    data_length = data.shape[-1]
+    if data_length < 4:
+        return data.copy()
+
+    sos = design_iir_bandpass_filter(int(order), float(lowcut), float(highcut), float(fs))
+    if sos is None:
+        filtered_data = data.copy()
+    else:
+        # Pad with at least one period of the low cutoff to settle the filter at the edges
+        padlen = 3 * (2 * len(sos) + 1)
+        if lowcut > 0:
+            padlen = max(padlen, int(np.ceil(fs / lowcut)))
+        padlen = min(padlen, data_length - 1)
+        filtered_data = sosfiltfilt(sos, data, axis=-1,
+                                    padtype="even" if mirror else "odd", padlen=padlen)
+
+    if correct_mean:
+        filtered_data -= np.mean(filtered_data, axis=-1, keepdims=True)
+        filtered_data += np.mean(data, axis=-1, keepdims=True)
+
+    return filtered_data
+
+
+def get_decimation_factor(highcut, fs, max_cutoff_fraction=settings.MULTIRATE_FILTER_MAX_CUTOFF_FRACTION):
+    """
+    Largest integer decimation factor that keeps highcut below max_cutoff_fraction
+    of the decimated Nyquist frequency.
+    """
+    if highcut <= 0:
+        return 1
+    return max(1, int(max_cutoff_fraction * fs / (2 * highcut)))
+
+
+def multirate_bandpass_filter(data, lowcut, highcut, fs, order=settings.IIR_FILTER_ORDER, mirror=True, correct_mean=True):
+    """
+    Applies a zero-phase bandpass filter at a reduced sampling rate.
+
+    Data is decimated by get_decimation_factor, filtered with
+    iir_bandpass_filter and interpolated back to the original sampling rate.
+    The resampling filters are linear phase, so the result stays zero-phase.
+    Falls back to iir_bandpass_filter when the band is too close to Nyquist
+    for decimation.
+
+    :param data: Array-like, 1-D data or 2-D stack of rows to filter.
+    :param lowcut: float, the low cutoff frequency.
+    :param highcut: float, the high cutoff frequency.
+    :param fs: float, the sampling rate.
+    :param order: int, the order of the Butterworth filter.
+    :param mirror: bool, optional, if set to True, pads the data with a mirrored copy, otherwise with an odd extension.
+    :param correct_mean: bool, optional, if set to True, keeps the mean of each row.
+    :return: Array-like, the filtered data.
+    """
+    data = np.asarray(data, dtype=float)
+    data_length = data.shape[-1]
+    factor = get_decimation_factor(highcut, fs)
+    if factor < 2 or data_length // factor < 4:
+        return iir_bandpass_filter(data, lowcut, highcut, fs, order=order, mirror=mirror, correct_mean=correct_mean)
+
+    decimated = resample_poly(data, 1, factor, axis=-1, padtype="line")
+    filtered_decimated = iir_bandpass_filter(
+        decimated, lowcut, highcut, fs / factor, order=order, mirror=mirror, correct_mean=False)
+    filtered_data = resample_poly(
+        filtered_decimated, factor, 1, axis=-1, padtype="line")[..., :data_length]
 
     if correct_mean:
-        filtered_data = filtered_data - np.mean(filtered_data)
-        filtered_data += original_mean
+        filtered_data -= np.mean(filtered_data, axis=-1, keepdims=True)
+        filtered_data += np.mean(data, axis=-1, keepdims=True)
 
     return filtered_data
+
+
+def bandpass_filter(data, lowcut, highcut, fs, numtaps=settings.FILTER_NUMTAPS, window="hamming", mirror=True, use_epsilon=True, correct_mean=True, filter_type=None):
+    """
+    Applies a phase-correct FIR bandpass filter with Hamming windowing.
+    The number of taps is automatically adjusted if the input data is too short.
+    2-D data is filtered row by row in one call.
+
+    :param data: Array-like, the data to filter.
+    :param lowcut: float, the low cutoff frequency.
+    :param highcut: float, the high cutoff frequency.
+    :param fs: float, the sampling rate.
+    :param numtaps: int, the number of taps in the filter.
+    :param mirror: bool, optional, if set to True, pads the data with a mirrored copy.
+    :param filter_type: str, optional, "fir", "iir" or "multirate". Defaults to settings.BAND_PASS_FILTER_TYPE.
+    :return: Array-like, the filtered data.
+    """
+    if filter_type is None:
+        filter_type = settings.BAND_PASS_FILTER_TYPE
+    if filter_type == "iir":
+        return iir_bandpass_filter(data, lowcut, highcut, fs, mirror=mirror, correct_mean=correct_mean)
+    if filter_type == "multirate":
+        return multirate_bandpass_filter(data, lowcut, highcut, fs, mirror=mirror, correct_mean=correct_mean)
+    if filter_type != "fir":
+        raise ValueError(f"Unknown band pass filter type: {filter_type}")
+    return filter_bank.filter(data, lowcut, highcut, fs, numtaps=numtaps, window=window,
+                              mirror=mirror, correct_mean=correct_mean)
@@ -0,0 +1,85 @@
+import threading
+from typing import Any, Callable, Optional
+
+# Loading stages in the order loaders report them
+LOAD_STAGES = [
+    "Unzipping",
+    "Parsing",
+    "Aligning",
+    "Calibrating",
+    "Calculating channels",
+    "Segmenting",
+]
+
+ProgressCallback = Callable[[str, float], None]
+
+
+class LoadCancelledError(Exception):
+    """Raised inside a loader when loading has been cancelled."""
+
+
+class LoadProgress:
+    """
+    Progress reporter passed to loaders that accept a progress argument.
+
+    Loaders call stage() when they enter one of LOAD_STAGES and update() with
+    the completed fraction of the current stage. Both raise
+    LoadCancelledError once cancel() has been called, so loaders stop at the
+    next reported step. Loaders that need to show dialogs while running in a
+    worker thread use run_in_main_thread().
+
+    :param callback: Called with the current stage and its completed fraction.
+    :param main_thread_runner: Runs a function on the GUI thread and returns its result.
+    """
+
+    def __init__(self,
+                 callback: Optional[ProgressCallback] = None,
+                 main_thread_runner: Optional[Callable[..., Any]] = None):
+        self.callback = callback
+        self.main_thread_runner = main_thread_runner
+        self.current_stage: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise LoadCancelledError("Loading was cancelled")
+
+    def stage(self, stage: str):
+        self.current_stage = stage
+        self.update(0.0)
+
+    def update(self, fraction: float):
+        self.check_cancelled()
+        if self.callback is not None:
+            self.callback(self.current_stage, fraction)
+
+    def run_in_main_thread(self, function: Callable[..., Any], *args, **kwargs):
+        if self.main_thread_runner is None:
+            return function(*args, **kwargs)
+        return self.main_thread_runner(function, *args, **kwargs)
+
+
+def get_overall_fraction(stage: Optional[str], fraction: float) -> float:
+    """Completed fraction of the whole load when fraction of stage is done."""
+    if stage not in LOAD_STAGES:
+        return 0.0
+    return (LOAD_STAGES.index(stage) + min(max(fraction, 0.0), 1.0)) / len(LOAD_STAGES)
+
+
+def report_stage(progress: Optional[LoadProgress], stage: str):
+    """Report a loading stage if a progress reporter was given."""
+    if progress is not None:
+        progress.stage(stage)
+
+
+def report_fraction(progress: Optional[LoadProgress], fraction: float):
+    """Report the completed fraction of the current stage if a progress reporter was given."""
+    if progress is not None:
+        progress.update(fraction)
@@ -4,6 +4,8 @@ import numpy as np
 import pandas as pd
 import json
 from enum import Enum
+from utils.envelope import EnvelopePyramid
+from utils.result_cache import ResultCache
 
 class MeasurementFileType(Enum):
     HEADER = "Header"
@@ -83,6 +85,180 @@ class Measurement:
     pm_data: dict[str, pd.DataFrame] = field(default_factory=dict)
     # cd_segments: list[CDSegment] = field(default_factory=list)
     patch_segments: list[PatchSegment] = field(default_factory=list)
+    # Spectral results shared by all analysis windows of this measurement
+    spectral_cache: ResultCache = field(
+        default_factory=lambda: ResultCache(get_spectral_cache_max_bytes()),
+        repr=False,
+        compare=False,
+    )
+    # Band pass filtered channels and segment stacks shared by all analysis windows
+    filter_cache: ResultCache = field(
+        default_factory=lambda: ResultCache(get_filter_cache_max_bytes()),
+        repr=False,
+        compare=False,
+    )
+    # Channel data index of the first sample of each segment, set by split_data_to_segments
+    segment_starts: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=np.intp),
+        repr=False,
+        compare=False,
+    )
+    segment_length: int = 0
+    # Segments of all channels as one (channel, sample, position) array, segments holds views to it
+    segment_tensor: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 0, 0)),
+        repr=False,
+        compare=False,
+    )
+
+    def get_filtered_channel(self, channel: str, lowcut: float, highcut: float,
+                             filter_type: Optional[str] = None, low_index: int = 0,
+                             high_index: Optional[int] = None) -> np.ndarray:
+        """
+        Band pass filtered samples low_index:high_index of a channel.
+
+        Results are kept in filter_cache, so windows filtering the same channel
+        range with the same band share one filtering run.
+
+        :return: Read-only filtered samples.
+        """
+        from utils.filters import bandpass_filter
+        filter_type = get_band_pass_filter_type(filter_type)
+        high_index = len(self.channel_df) if high_index is None else int(high_index)
+        key = ("channel", channel, float(lowcut), float(highcut), filter_type, int(low_index), high_index)
+        return self.filter_cache.get_or_compute(key, lambda: bandpass_filter(
+            self.channel_df[channel].iloc[low_index:high_index],
+            lowcut, highcut, 1 / self.sample_step, filter_type=filter_type))
+
+    def get_filtered_segments(self, channel: str, lowcut: float, highcut: float,
+                              filter_type: Optional[str] = None, low_index: int = 0,
+                              high_index: Optional[int] = None) -> np.ndarray:
+        """
+        Band pass filtered positions low_index:high_index of every segment of a channel.
+
+        Each segment is filtered on its own, so rows of the result can be
+        selected afterwards. Results are kept in filter_cache. After the
+        measurement is split to segments again, only segments whose position
+        in the channel data changed are filtered again.
+
+        :return: Read-only 2-D array with one filtered row per segment.
+        """
+        from utils.filters import bandpass_filter
+        filter_type = get_band_pass_filter_type(filter_type)
+        segments = np.asarray(self.segments[channel], dtype=float)
+        high_index = segments.shape[-1] if high_index is None else int(high_index)
+        key = ("segments", channel, float(lowcut), float(highcut), filter_type, int(low_index), high_index)
+        positions = self.get_segment_positions()
+
+        def filter_segments(rows):
+            return bandpass_filter(segments[rows, low_index:high_index],
+                                   lowcut, highcut, 1 / self.sample_step, filter_type=filter_type)
+
+        cached = self.filter_cache.get(key)
+        if cached is not None:
+            cached_positions, filtered = cached
+            if cached_positions == positions:
+                return filtered
+            if positions is not None and cached_positions is not None and cached_positions[0] == positions[0]:
+                rows = get_matching_rows(cached_positions[1], positions[1])
+                reused = rows >= 0
+                updated = np.empty((len(segments), filtered.shape[-1]))
+                updated[reused] = filtered[rows[reused]]
+                if not reused.all():
+                    updated[~reused] = filter_segments(~reused)
+                self.filter_cache.put(key, (positions, updated))
+                return updated
+
+        filtered = filter_segments(slice(None))
+        self.filter_cache.put(key, (positions, filtered))
+        return filtered
+
+    def get_envelope_pyramid(self, channel: str, lowcut: Optional[float] = None,
+                             highcut: Optional[float] = None, filter_type: Optional[str] = None,
+                             low_index: int = 0, high_index: Optional[int] = None) -> EnvelopePyramid:
+        """
+        Min/max envelope pyramid of a channel for drawing, kept in filter_cache.
+
+        Without lowcut the pyramid covers the whole unfiltered channel.
+        Otherwise it covers the band pass filtered positions low_index:high_index,
+        as returned by get_filtered_channel.
+        """
+        if lowcut is None:
+            key = ("envelope", channel)
+            return self.filter_cache.get_or_compute(key, lambda: EnvelopePyramid(self.channel_df[channel]))
+        filter_type = get_band_pass_filter_type(filter_type)
+        high_index = len(self.channel_df) if high_index is None else int(high_index)
+        key = ("envelope", channel, float(lowcut), float(highcut), filter_type, int(low_index), high_index)
+        return self.filter_cache.get_or_compute(key, lambda: EnvelopePyramid(self.get_filtered_channel(
+            channel, lowcut, highcut, filter_type=filter_type, low_index=low_index, high_index=high_index)))
+
+    def get_segment_positions(self, sample_indexes=None) -> Optional[tuple]:
+        """
+        Hashable position of segments in the channel data, for cache keys.
+
+        :param sample_indexes: Segments to include, all segments if None. Out of range indexes are skipped.
+        :return: Tuple of the segment length and the start indexes of the
+            segments, or None if the segments were not made by split_data_to_segments.
+        """
+        if not self.segments or any(
+                len(channel_segments) != len(self.segment_starts) for channel_segments in self.segments.values()):
+            return None
+        starts = self.segment_starts
+        if sample_indexes is not None:
+            starts = starts[[index for index in sample_indexes if 0 <= index < len(starts)]]
+        return self.segment_length, tuple(starts.tolist())
+
+    def uses_segment_tensor(self) -> bool:
+        """Whether segments are views to segment_tensor, in the same channel order."""
+        return len(self.segments) == len(self.segment_tensor) and all(
+            isinstance(channel_segments, np.ndarray) and channel_segments.base is self.segment_tensor
+            for channel_segments in self.segments.values())
+
+    def get_segment_stack(self, channels, sample_indexes=None, low_index: int = 0,
+                          high_index: Optional[int] = None) -> np.ndarray:
+        """
+        Positions low_index:high_index of the selected segments of one or more channels.
+
+        Consecutive samples of one channel are returned as a view to
+        segment_tensor without copying.
+
+        :param channels: Channel name, or a list of channel names.
+        :param sample_indexes: Indexes of the samples, all samples if None. Out of range indexes are skipped.
+        :return: 2-D (sample, position) float array for one channel, or 3-D
+            (channel, sample, position) float array for a list of channels.
+        """
+        channel_list = [channels] if isinstance(channels, str) else list(channels)
+        if not channel_list:
+            return np.empty((0, 0, 0))
+        num_samples = min(len(self.segments[channel]) for channel in channel_list)
+        samples = get_sample_selection(sample_indexes, num_samples)
+
+        if self.uses_segment_tensor():
+            channel_indexes = [list(self.segments).index(channel) for channel in channel_list]
+            if len(channel_indexes) == 1:
+                stack = self.segment_tensor[channel_indexes[0]:channel_indexes[0] + 1]
+            else:
+                stack = self.segment_tensor[channel_indexes]
+            stack = stack[:, samples, low_index:high_index]
+        else:
+            stack = np.array([
+                np.asarray(self.segments[channel], dtype=float)[:num_samples][samples, low_index:high_index]
+                for channel in channel_list
+            ])
+        return stack[0] if isinstance(channels, str) else stack
+
+    def clear_segments(self):
+        """Remove the segments, for when there are not enough peaks to split the data."""
+        self.segments = {}
+        self.segment_tensor = np.empty((0, 0, 0))
+        self.segment_starts = np.empty(0, dtype=np.intp)
+        self.segment_length = 0
+        self.clear_segment_caches()
+
+    def clear_segment_caches(self):
+        """Drop cached results that depend on the segments, for when segments are replaced directly."""
+        self.spectral_cache.clear()
+        self.filter_cache.pop_where(lambda key: key[0] == "segments")
 
     def get_file_path(self, file_type: MeasurementFileType):
         if file_type == MeasurementFileType.HEADER:
@@ -108,33 +284,78 @@ class Measurement:
     #         segments.append(CDSegment(start_dist, end_dist, self.sample_step))
     #     return segments
 
-    def split_data_to_segments(self):
-        """Split data into segments based on peak locations."""
-        segments = {}
+    def get_segment_bounds(self):
+        """
+        Start indexes and common length of the segments between peak locations.
+
+        Segments span from the edge of one tape to the edge of the next one and
+        are trimmed around their center to the length of the shortest segment.
+
+        :return: Tuple of the start index of each trimmed segment and the segment length.
+        """
+        peak_locations = np.asarray(self.peak_locations, dtype=float)
+        if len(peak_locations) < 2:
+            return np.empty(0, dtype=np.intp), 0
+
         tape_half_width_m = self.tape_width_mm / 2000.0
+        data_length = min(len(self.distances), len(self.channel_df))
+        start_indexes = np.minimum(np.searchsorted(
+            self.distances, peak_locations[:-1] + tape_half_width_m, side='left'), data_length)
+        end_indexes = np.minimum(np.searchsorted(
+            self.distances, peak_locations[1:] - tape_half_width_m, side='right'), data_length)
 
-        for channel in self.channels:
-            channel_segments = []
-            for i in range(len(self.peak_locations)-1):
-                start_dist = self.peak_locations[i] + tape_half_width_m
-                end_dist = self.peak_locations[i+1] - tape_half_width_m
+        lengths = np.maximum(end_indexes - start_indexes, 0)
+        segment_length = int(lengths.min())
+        return (start_indexes + (lengths - segment_length) // 2).astype(np.intp), segment_length
 
-                start_index = np.searchsorted(
-                    self.distances, start_dist, side='left')
-                end_index = np.searchsorted(
-                    self.distances, end_dist, side='right')
+    def split_data_to_segments(self, incremental: bool = True):
+        """
+        Split data into segments based on peak locations.
 
-                segment = self.channel_df[channel].iloc[start_index:end_index]
-                channel_segments.append(segment)
+        Segments of all channels are gathered to segment_tensor, and
+        segments[channel] is a view to it. With incremental, segments that
+        start at the same channel data index with the same length as before
+        are reused, so moving one peak only copies the segments next to it.
+        Set incremental to False if the channel data has changed.
+        """
+        starts, segment_length = self.get_segment_bounds()
+        channels = list(self.channels) if len(starts) else []
+        shape = (len(channels), len(starts), segment_length)
 
-            if channel_segments:
-                min_length = min(map(len, channel_segments))
-                trimmed_segments = [
-                    seg[(len(seg) - min_length) // 2: (len(seg) + min_length) // 2] for seg in channel_segments]
+        previous = self.segment_tensor
+        rows = None
+        if incremental and segment_length == self.segment_length and self.uses_segment_tensor() \
+                and list(self.segments) == channels and previous.shape[1] == len(self.segment_starts):
+            rows = get_matching_rows(self.segment_starts, starts)
 
-                segments[channel] = np.array(trimmed_segments)
+        if rows is None:
+            tensor = np.empty(shape)
+            changed = np.ones(len(starts), dtype=bool)
+        else:
+            reused = rows >= 0
+            changed = ~reused
+            if previous.shape == shape and previous.flags.writeable \
+                    and np.array_equal(rows[reused], np.flatnonzero(reused)):
+                # Same segments in the same rows, only replace the moved ones
+                tensor = previous
+            else:
+                tensor = np.empty(shape)
+                tensor[:, reused] = previous[:, rows[reused]]
 
+        if changed.any():
+            gather_indexes = starts[changed, None] + np.arange(segment_length)
+            for channel_index, channel in enumerate(channels):
+                values = np.asarray(self.channel_df[channel], dtype=float)
+                if changed.all():
+                    np.take(values, gather_indexes, out=tensor[channel_index])
+                else:
+                    tensor[channel_index, changed] = values[gather_indexes]
+
+        segments = {channel: tensor[channel_index] for channel_index, channel in enumerate(channels)}
+        self.segment_tensor = tensor
         self.segments = segments
+        self.segment_starts = starts
+        self.segment_length = segment_length
         # self.cd_segments = self.get_cd_segments(self.peak_locations, tape_half_width_m)
 
         if segments:
@@ -160,3 +381,53 @@ def get_default_tape_width_mm():
         return getattr(settings, "TAPE_WIDTH_MM", 50.0)
     except ImportError:
         return 50.0
+
+
+def get_spectral_cache_max_bytes():
+    try:
+        import settings
+        return int(getattr(settings, "SPECTRAL_CACHE_MAX_SIZE_MB", 256) * 1024 * 1024)
+    except ImportError:
+        return 256 * 1024 * 1024
+
+
+def get_filter_cache_max_bytes():
+    try:
+        import settings
+        return int(getattr(settings, "FILTER_CACHE_MAX_SIZE_MB", 512) * 1024 * 1024)
+    except ImportError:
+        return 512 * 1024 * 1024
+
+
+def get_band_pass_filter_type(filter_type=None):
+    if filter_type is not None:
+        return filter_type
+    try:
+        import settings
+        return getattr(settings, "BAND_PASS_FILTER_TYPE", "fir")
+    except ImportError:
+        return "fir"
+
+
+def get_matching_rows(previous_starts, starts):
+    """
+    Row of each segment start in previous_starts, -1 for starts that are not there.
+    """
+    previous_rows = {start: row for row, start in enumerate(np.asarray(previous_starts).tolist())}
+    return np.array([previous_rows.get(start, -1) for start in np.asarray(starts).tolist()], dtype=np.intp)
+
+
+def get_sample_selection(sample_indexes, num_samples: int):
+    """
+    Index for selecting samples from segments, a slice when the samples are consecutive.
+
+    :param sample_indexes: Indexes of the samples, all samples if None. Out of range indexes are skipped.
+    """
+    if sample_indexes is None:
+        return slice(0, num_samples)
+    indexes = [index for index in sample_indexes if 0 <= index < num_samples]
+    if not indexes:
+        return slice(0, 0)
+    if indexes == list(range(indexes[0], indexes[-1] + 1)):
+        return slice(indexes[0], indexes[-1] + 1)
+    return indexes
@@ -0,0 +1,364 @@
+"""
+On-disk cache of loaded measurements.
+
+A loaded measurement is stored as a Fortran-ordered .npy matrix of channel
+values, a .npy array of distances and a JSON file with the remaining
+metadata. Entries are keyed by the content hash of the loaded files, the
+loader used and the settings that change the loaded data, so reopening the
+same files skips parsing, alignment, calibration and calculated channels.
+Cached channel values are memory-mapped on load. The least recently used
+entries are removed when the cache grows past MEASUREMENT_CACHE_MAX_SIZE_MB.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+import settings
+from utils.measurement import Measurement
+
+CACHE_FORMAT_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+CHANNELS_FILE = "channels.npy"
+DISTANCES_FILE = "distances.npy"
+METADATA_FILE = "metadata.json"
+# Prefix of directories of evicted entries that are being deleted
+EVICTED_PREFIX = ".evicted-"
+
+METADATA_ATTRIBUTES = [
+    "units",
+    "header_file_path",
+    "calibration_file_path",
+    "data_file_path",
+    "pm_file_path",
+    "measurement_label",
+    "samples_file_path",
+    "peak_channel",
+    "threshold",
+    "sample_step",
+    "pm_speed",
+    "tape_width_mm",
+    "peak_locations",
+    "selected_samples",
+    "pm_data",
+]
+FILE_PATH_ATTRIBUTES = [
+    "header_file_path",
+    "calibration_file_path",
+    "data_file_path",
+    "pm_file_path",
+    "samples_file_path",
+]
+
+logger = logging.getLogger(__name__)
+
+# Content hashes of files already hashed in this session, keyed by path, size and modification time
+_file_hashes: dict[tuple[str, int, int], str] = {}
+
+
+def get_cache_dir() -> str:
+    return settings.MEASUREMENT_CACHE_DIR or os.path.join(
+        tempfile.gettempdir(), "tapio-analysis-cache")
+
+
+def hash_file(file_path: str) -> str:
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        file_hash = hashlib.blake2b(digest_size=20)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                file_hash.update(block)
+        _file_hashes[memo_key] = file_hash.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def hash_files(file_paths: list[str]) -> str:
+    """Hash the names and contents of the given files, independent of their location and order."""
+    file_hashes = sorted(
+        (os.path.basename(file_path), hash_file(file_path))
+        for file_path in file_paths if os.path.isfile(file_path)
+    )
+    return hashlib.blake2b(json.dumps(file_hashes).encode(), digest_size=20).hexdigest()
+
+
+def describe_function(function) -> str:
+    try:
+        return inspect.getsource(function)
+    except (OSError, TypeError):
+        return getattr(function, '__qualname__', repr(function))
+
+
+def get_code_names(code) -> set[str]:
+    """Global and attribute names used by code and the code nested in it, e.g. lambdas."""
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= get_code_names(constant)
+    return names
+
+
+def describe_function_globals(function, described: Optional[set] = None) -> dict:
+    """
+    Global values read by function and the functions it calls, e.g. channel
+    name candidates in settings, which can change without changing the source.
+    """
+    described = set() if described is None else described
+    code = getattr(function, '__code__', None)
+    if code is None or function in described:
+        return {}
+    described.add(function)
+
+    function_globals = getattr(function, '__globals__', {})
+    names = get_code_names(code)
+    values = {}
+    for name in sorted(names):
+        if name not in function_globals:
+            continue
+        value = function_globals[name]
+        if inspect.ismodule(value):
+            # Attributes read from modules, e.g. settings.BASIS_WEIGHT_CHANNEL_CANDIDATES
+            for attribute in sorted(names):
+                attribute_value = getattr(value, attribute, None)
+                if inspect.isfunction(attribute_value):
+                    values[f"{name}.{attribute}"] = describe_function(attribute_value)
+                    values.update(describe_function_globals(attribute_value, described))
+                elif attribute_value is not None and not callable(attribute_value) \
+                        and not inspect.ismodule(attribute_value):
+                    values[f"{name}.{attribute}"] = repr(attribute_value)
+        elif inspect.isfunction(value):
+            values[name] = describe_function(value)
+            values.update(describe_function_globals(value, described))
+        elif not callable(value):
+            values[name] = repr(value)
+    return values
+
+
+def describe_calculated_channel(channel: dict) -> dict:
+    function = channel['function']
+    return {
+        "name": channel['name'],
+        "unit": channel['unit'],
+        "function": describe_function(function),
+        "globals": describe_function_globals(function),
+    }
+
+
+def is_cacheable(loader) -> bool:
+    """
+    Loaders can define is_cacheable() returning False when their result
+    depends on values asked from the user, which are not part of the cache key.
+    """
+    loader_is_cacheable = getattr(loader, "is_cacheable", None)
+    return loader_is_cacheable is None or bool(loader_is_cacheable())
+
+
+def get_settings_fingerprint() -> dict:
+    """Settings that change the data a loader produces."""
+    return {
+        "IGNORE_CHANNELS": list(settings.IGNORE_CHANNELS),
+        "CALCULATED_CHANNELS": [
+            describe_calculated_channel(channel) for channel in settings.CALCULATED_CHANNELS],
+        "TAPE_WIDTH_MM": settings.TAPE_WIDTH_MM,
+        "FLIP_LOADED_DATA": settings.FLIP_LOADED_DATA,
+        "PQ_LOADER_GENERATE_DISTANCES": settings.PQ_LOADER_GENERATE_DISTANCES,
+    }
+
+
+def get_cache_key(files_hash: str, loader_name: str) -> str:
+    key_data = {
+        "version": CACHE_FORMAT_VERSION,
+        "files": files_hash,
+        "loader": loader_name,
+        "settings": get_settings_fingerprint(),
+    }
+    return hashlib.blake2b(
+        json.dumps(key_data, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (np.ndarray, pd.Index)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def store_measurement(key: str, measurement: Measurement):
+    """Write a measurement to the cache under key."""
+    cache_dir = get_cache_dir()
+    entry_dir = os.path.join(cache_dir, key)
+    if os.path.isdir(entry_dir):
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=f"{key}-", dir=cache_dir)
+    try:
+        channels = list(measurement.channel_df.columns)
+        channel_values = np.lib.format.open_memmap(
+            os.path.join(temp_dir, CHANNELS_FILE),
+            mode='w+',
+            dtype=float,
+            shape=(len(measurement.channel_df), len(channels)),
+            fortran_order=True,
+        )
+        # Copy one channel at a time to keep memory use bounded
+        for index, channel in enumerate(channels):
+            channel_values[:, index] = measurement.channel_df[channel]
+        channel_values.flush()
+        del channel_values
+
+        np.save(os.path.join(temp_dir, DISTANCES_FILE),
+                np.asarray(measurement.distances, dtype=float))
+
+        metadata = {
+            attribute: getattr(measurement, attribute)
+            for attribute in METADATA_ATTRIBUTES
+        }
+        metadata["channel_columns"] = channels
+        metadata["channels"] = list(measurement.channels)
+        with open(os.path.join(temp_dir, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f, default=_to_json)
+
+        os.replace(temp_dir, entry_dir)
+    finally:
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    evict(settings.MEASUREMENT_CACHE_MAX_SIZE_MB * 1024 * 1024)
+
+
+def load_cached_measurement(key: str, file_paths: list[str]) -> Optional[Measurement]:
+    """Return the cached measurement for key, or None if it is not cached."""
+    entry_dir = os.path.join(get_cache_dir(), key)
+    metadata_path = os.path.join(entry_dir, METADATA_FILE)
+    if not os.path.isfile(metadata_path):
+        return None
+
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+
+    # Copy-on-write mapping, analyses can modify the data without touching the cache
+    channel_values = np.load(os.path.join(entry_dir, CHANNELS_FILE), mmap_mode='c')
+    distances = np.load(os.path.join(entry_dir, DISTANCES_FILE))
+
+    measurement = Measurement()
+    for attribute in METADATA_ATTRIBUTES:
+        setattr(measurement, attribute, metadata[attribute])
+    measurement.channel_df = pd.DataFrame(
+        channel_values, columns=metadata["channel_columns"], copy=False)
+    measurement.channels = metadata["channels"]
+    measurement.distances = distances
+
+    # Point file paths to the files that were opened now, they may have been extracted elsewhere
+    current_paths = {os.path.basename(file_path): file_path for file_path in file_paths}
+    for attribute in FILE_PATH_ATTRIBUTES:
+        cached_path = getattr(measurement, attribute)
+        if cached_path:
+            setattr(measurement, attribute, current_paths.get(
+                os.path.basename(cached_path), cached_path))
+
+    if measurement.peak_locations:
+        measurement.split_data_to_segments()
+
+    # Mark entry as recently used for eviction
+    os.utime(metadata_path)
+    return measurement
+
+
+def get_entry_size(entry_dir: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+
+
+def remove_entry(cache_dir: str, entry_dir: str) -> bool:
+    """
+    Remove a cache entry, return False if it is in use and was kept.
+
+    The entry is renamed before deleting so that an entry whose files can not
+    all be deleted, e.g. memory-mapped files on Windows, is never found again.
+    Leftovers are deleted on later evictions.
+    """
+    evicted_dir = tempfile.mkdtemp(prefix=EVICTED_PREFIX, dir=cache_dir)
+    try:
+        os.replace(entry_dir, os.path.join(evicted_dir, os.path.basename(entry_dir)))
+    except OSError as e:
+        logger.debug("Could not evict cached measurement %s: %s", entry_dir, e)
+        os.rmdir(evicted_dir)
+        return False
+    shutil.rmtree(evicted_dir, ignore_errors=True)
+    return True
+
+
+def evict(max_size_bytes: int):
+    """Remove least recently used cache entries until the cache fits in max_size_bytes."""
+    cache_dir = get_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if name.startswith(EVICTED_PREFIX):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            continue
+        metadata_path = os.path.join(entry_dir, METADATA_FILE)
+        if os.path.isfile(metadata_path):
+            entries.append((os.path.getmtime(metadata_path), entry_dir, get_entry_size(entry_dir)))
+
+    total_size = sum(size for _, _, size in entries)
+    for _, entry_dir, size in sorted(entries):
+        if total_size <= max_size_bytes:
+            break
+        logger.debug("Evicting cached measurement %s", entry_dir)
+        if remove_entry(cache_dir, entry_dir):
+            total_size -= size
+
+
+def find_cached_measurement(file_paths: list[str], loader_names: list[str]) -> Optional[Measurement]:
+    """Return the first cached measurement of file_paths loaded by any of loader_names."""
+    if not settings.MEASUREMENT_CACHE_ENABLED:
+        return None
+
+    try:
+        files_hash = hash_files(file_paths)
+        for loader_name in loader_names:
+            measurement = load_cached_measurement(
+                get_cache_key(files_hash, loader_name), file_paths)
+            if measurement is not None:
+                logger.info("Loaded measurement from cache (%s)", loader_name)
+                return measurement
+    except Exception as e:
+        logger.warning("Could not read measurement cache: %s", e)
+    return None
+
+
+def cache_measurement(file_paths: list[str], loader_name: str, measurement: Measurement):
+    """Store a measurement of file_paths loaded by loader_name in the cache."""
+    if not settings.MEASUREMENT_CACHE_ENABLED:
+        return
+
+    try:
+        store_measurement(get_cache_key(hash_files(file_paths), loader_name), measurement)
+    except Exception as e:
+        logger.warning("Could not write measurement cache: %s", e)
+
+
+def load_with_cache(file_paths: list[str], loader_name: str, load: Callable[[], Optional[Measurement]]) -> Optional[Measurement]:
+    """Return the cached measurement of file_paths, or load it with load() and cache it."""
+    measurement = find_cached_measurement(file_paths, [loader_name])
+    if measurement is not None:
+        return measurement
+
+    measurement = load()
+    if measurement is not None:
+        cache_measurement(file_paths, loader_name, measurement)
+    return measurement
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+
+def get_nbytes(value) -> int:
+    """Approximate memory use of a result made of arrays, tuples, lists, dicts and objects with nbytes."""
+    if isinstance(value, (tuple, list)):
+        return sum(get_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(get_nbytes(item) for item in value.values())
+    return getattr(value, "nbytes", 0)
+
+
+def make_key(value) -> Hashable:
+    """Convert lists, dicts and arrays in a cache key to hashable tuples."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, make_key(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(make_key(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return (value.shape, value.dtype.str, value.tobytes())
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _set_read_only(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            _set_read_only(item)
+
+
+class ResultCache:
+    """
+    Least recently used cache of computed results with a memory budget.
+
+    Results are looked up with get_or_compute, which only calls the compute
+    function on a miss. Cached arrays are made read-only since they are
+    shared by every caller. The least recently used results are dropped when
+    the cached results grow past max_bytes. Hits and misses are counted.
+
+    :param max_bytes: Memory budget of the cached results, None for no limit.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._nbytes = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]):
+        if key in self._results:
+            return self.get(key)
+
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def get(self, key: Hashable, default=None):
+        if key not in self._results:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._results.move_to_end(key)
+        return self._results[key][0]
+
+    def put(self, key: Hashable, value):
+        self.pop(key)
+        nbytes = get_nbytes(value)
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+        _set_read_only(value)
+        self._results[key] = (value, nbytes)
+        self._nbytes += nbytes
+        while self.max_bytes is not None and self._nbytes > self.max_bytes:
+            _, (_, evicted_nbytes) = self._results.popitem(last=False)
+            self._nbytes -= evicted_nbytes
+
+    def pop(self, key: Hashable):
+        if key in self._results:
+            _, nbytes = self._results.pop(key)
+            self._nbytes -= nbytes
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [key for key in self._results if predicate(key)]:
+            self.pop(key)
+
+    def clear(self):
+        self._results.clear()
+        self._nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._results
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._results),
+            "bytes": self._nbytes,
+        }
@@ -25,6 +25,66 @@ def safe_spectral_params(requested_nperseg, overlap_fraction, data_length, requi
     return nperseg, noverlap
 
 
+def _windowed_cross_correlation(x, y, max_lag, block_size):
+    """Cross-correlation of x and y for lags -max_lag..max_lag, computed block by block."""
+    correlation = np.zeros(2 * max_lag + 1)
+    x_padded = np.concatenate([np.zeros(max_lag), x, np.zeros(max_lag + len(y))])
+    for start in range(0, len(y), block_size):
+        y_block = y[start:start + block_size]
+        # Lag k pairs y[n] with x[n + k], so each block needs max_lag extra samples of x on both sides
+        x_segment = x_padded[start:start + len(y_block) + 2 * max_lag]
+        correlation += scipy.signal.correlate(
+            x_segment, y_block, mode='valid', method='fft')
+    return correlation
+
+
+def cross_correlation_lag(x, y, max_lag=None, block_size=None):
+    """
+    FFT cross-correlation lag search between two equally sampled signals.
+
+    The correlation is normalized so that identical signals give 1 at lag
+    zero. With max_lag, only lags within +-max_lag samples are computed,
+    block by block with overlap-add, so memory use does not grow with the
+    signal length. The peak is refined to a fraction of a sample by fitting
+    a parabola through the maximum and its neighbours.
+
+    :param x: Reference signal.
+    :param y: Signal compared against x.
+    :param max_lag: Optional, largest lag in samples searched in either direction.
+    :param block_size: Optional, number of samples of y correlated per block when max_lag is given.
+    :return: Tuple of lags in samples, normalized correlation at each lag and the lag of the maximum.
+        A positive lag means that features of y appear in x lag samples later.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x = x - np.mean(x)
+    y = y - np.mean(y)
+
+    if max_lag is None or max_lag >= max(len(x), len(y)) - 1:
+        correlation = scipy.signal.correlate(x, y, mode='full', method='fft')
+        lags = scipy.signal.correlation_lags(len(x), len(y), mode='full')
+    else:
+        max_lag = max(int(max_lag), 0)
+        if block_size is None:
+            block_size = max(4 * max_lag, settings.CROSS_CORRELATION_BLOCK_SIZE)
+        correlation = _windowed_cross_correlation(x, y, max_lag, block_size)
+        lags = np.arange(-max_lag, max_lag + 1)
+
+    norm = np.sqrt(np.sum(x ** 2) * np.sum(y ** 2))
+    if norm > 0:
+        correlation = correlation / norm
+
+    peak_index = int(np.argmax(correlation))
+    peak_lag = float(lags[peak_index])
+    if 0 < peak_index < len(correlation) - 1:
+        left, center, right = correlation[peak_index - 1:peak_index + 2]
+        curvature = left - 2 * center + right
+        if curvature < 0:
+            peak_lag += 0.5 * (left - right) / curvature
+
+    return lags, correlation, peak_lag
+
+
 def vandermonde(w, N):
     L = len(w)
     Z = np.exp(np.full((L, N), np.arange(N)).T * np.array(w) * 1j)
@@ -39,43 +99,71 @@ def single_nls(x, w, L):
     return (x.T @ Z @ np.linalg.inv(Z.T @ Z) @ Z.T @ x).real
 
 
-def hs_units(x, Fs, w_initial, wrange, user_f_min, user_f_max, L=10):
-    # Harmonic summation method for fundamental frequency estimation
-    X = np.fft.fft(x)
-    freqs = np.fft.fftfreq(len(x), 1/Fs)
-
-    # Calculate the default f_min and f_max based on w_initial and wrange
-    calculated_f_min = w_initial - wrange
-    calculated_f_max = w_initial + wrange
-
-    # Adjust f_min and f_max based on user-defined limits
-    f_min = max(calculated_f_min, user_f_min)
-    f_max = min(calculated_f_max, user_f_max)
-    valid_indices = np.where((freqs >= f_min) & (freqs <= f_max))[0]
-
-    max_sum = 0
-    fundamental_freq = 0
+def harmonic_summation(freqs, magnitudes, f_min, f_max, L=10, interpolate=False):
+    """
+    Harmonic summation fundamental frequency estimate from a magnitude spectrum.
+
+    Every bin between f_min and f_max is a candidate fundamental, scored by
+    the sum of the magnitudes at its harmonics 1..L. All candidates and
+    harmonics are evaluated as one array operation. Harmonics above the
+    highest frequency of the spectrum are skipped.
+
+    :param freqs: Ascending, equally spaced frequencies of the spectrum.
+    :param magnitudes: Magnitude spectrum at freqs.
+    :param interpolate: Interpolate magnitudes linearly between bins instead of
+        using the nearest bin, and refine the best candidate to a fraction of a
+        bin by fitting a parabola through its score and the neighbouring scores.
+    :return: Estimated fundamental frequency, 0 if no candidate has a positive score.
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    magnitudes = np.abs(np.asarray(magnitudes))
+    candidates = np.flatnonzero((freqs >= f_min) & (freqs <= f_max))
+    if len(candidates) == 0 or len(freqs) < 2:
+        return 0.0
+
+    spacing = freqs[1] - freqs[0]
+    harmonic_freqs = freqs[candidates, None] * np.arange(1, L + 1)
+    if interpolate:
+        harmonic_magnitudes = np.interp(harmonic_freqs, freqs, magnitudes)
+    else:
+        harmonic_indexes = np.rint((harmonic_freqs - freqs[0]) / spacing).astype(np.intp)
+        harmonic_magnitudes = magnitudes[np.clip(harmonic_indexes, 0, len(freqs) - 1)]
+    scores = np.sum(harmonic_magnitudes, axis=1, where=harmonic_freqs <= freqs[-1])
+
+    best = int(np.argmax(scores))
+    if scores[best] <= 0:
+        return 0.0
+    fundamental_freq = float(freqs[candidates[best]])
+    if interpolate and 0 < best < len(scores) - 1:
+        left, center, right = scores[best - 1:best + 2]
+        curvature = left - 2 * center + right
+        if curvature < 0:
+            fundamental_freq += 0.5 * (left - right) / curvature * spacing
+    return fundamental_freq
 
-    # Calculate the spacing between bins in frequency domain
-    freq_spacing = Fs / len(x)
 
-    for index in valid_indices:
-        current_freq = freqs[index]
-        harmonic_sums = np.abs(X[index])
+def hs_units(x, Fs, w_initial, wrange, user_f_min, user_f_max, L=10, spectrum=None, interpolate=False):
+    """
+    Harmonic summation fundamental frequency estimate near w_initial.
 
-        for harmonic in range(2, L+1):
-            harmonic_freq = current_freq * harmonic
-            if harmonic_freq < Fs / 2:
-                # Calculate harmonic index directly based on the frequency and spacing
-                harmonic_index = int(np.round(harmonic_freq / freq_spacing))
-                if harmonic_index < len(X):
-                    harmonic_sums += np.abs(X[harmonic_index])
+    Candidates are searched within w_initial +- wrange, limited to
+    user_f_min..user_f_max, see harmonic_summation.
 
-        if harmonic_sums > max_sum:
-            max_sum = harmonic_sums
-            fundamental_freq = current_freq
+    :param x: Signal, only used when spectrum is not given.
+    :param spectrum: Optional tuple of frequencies and magnitude spectrum,
+        for example an already computed Welch amplitude spectrum. Without it
+        the FFT magnitude of x is used.
+    :return: Estimated fundamental frequency in the units of Fs.
+    """
+    # Adjust f_min and f_max based on user-defined limits
+    f_min = max(w_initial - wrange, user_f_min)
+    f_max = min(w_initial + wrange, user_f_max)
 
-    return fundamental_freq
+    if spectrum is None:
+        x = np.asarray(x, dtype=float)
+        spectrum = np.fft.rfftfreq(len(x), 1 / Fs), np.abs(np.fft.rfft(x))
+    freqs, magnitudes = spectrum
+    return harmonic_summation(freqs, magnitudes, f_min, f_max, L, interpolate)
 
 
 def nls_units(x, Fs, w_initial, wrange=0.1, step=0.01, L=10):
@@ -129,26 +217,179 @@ def nls_rad(x, w_initial, L=10, wrange=0.1, step=0.01):
     return max_w
 
 
+def nls_harmonic_power(x, w, L):
+    """
+    Asymptotic NLS cost of fundamental w in rad/sample.
+
+    For long signals Z^H Z of single_nls approaches N times the identity, so
+    the cost is proportional to the summed power of x at the harmonics 1..L
+    of w, which needs no matrix inversion.
+    """
+    x = np.asarray(x, dtype=float)
+    phasor = np.exp(-1j * w * np.arange(len(x)))
+    harmonic = np.ones(len(x), dtype=complex)
+    power = 0.0
+    for harmonic_number in range(1, L + 1):
+        # Harmonics above the Nyquist frequency are skipped
+        if harmonic_number > 1 and harmonic_number * w > np.pi:
+            break
+        harmonic *= phasor
+        power += np.abs(x @ harmonic) ** 2
+    return power
+
+
+def fast_nls(x, w_min, w_max, L=10, oversampling=4, tol=1e-9):
+    """
+    Fast approximate NLS fundamental frequency estimate in rad/sample.
+
+    The harmonic power of every candidate on a zero-padded FFT grid between
+    w_min and w_max is read from one FFT of x. The best candidate is then
+    refined with a golden-section search of nls_harmonic_power within one
+    grid step on both sides.
+
+    :param oversampling: Zero-padding factor of the FFT grid.
+    :param tol: Width in rad/sample at which the golden-section search stops.
+    :return: Estimated fundamental frequency in rad/sample.
+    """
+    x = np.asarray(x, dtype=float)
+    fft_length = scipy.fft.next_fast_len(max(int(oversampling * len(x)), 2), real=True)
+    grid_step = 2 * np.pi / fft_length
+    power = np.abs(scipy.fft.rfft(x, fft_length)) ** 2
+
+    candidates = np.arange(max(int(np.ceil(w_min / grid_step)), 1), int(np.floor(w_max / grid_step)) + 1)
+    if len(candidates):
+        harmonic_indexes = candidates[:, None] * np.arange(1, L + 1)
+        scores = np.sum(power[np.minimum(harmonic_indexes, len(power) - 1)], axis=1,
+                        where=harmonic_indexes < len(power))
+        best = candidates[np.argmax(scores)] * grid_step
+        low, high = max(w_min, best - grid_step), min(w_max, best + grid_step)
+    else:
+        low, high = w_min, w_max
+
+    # Golden-section search for the maximum of the harmonic power
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = low + (1 - ratio) * (high - low), low + ratio * (high - low)
+    power_a, power_b = nls_harmonic_power(x, a, L), nls_harmonic_power(x, b, L)
+    while high - low > tol:
+        if power_a >= power_b:
+            high, b, power_b = b, a, power_a
+            a = low + (1 - ratio) * (high - low)
+            power_a = nls_harmonic_power(x, a, L)
+        else:
+            low, a, power_a = a, b, power_b
+            b = low + ratio * (high - low)
+            power_b = nls_harmonic_power(x, b, L)
+    return (low + high) / 2
+
+
+def fast_nls_units(x, Fs, w_initial, wrange=0.1, L=10):
+    """
+    Fast approximate NLS fundamental frequency estimate within w_initial +- wrange.
+
+    Unlike nls_units the result is not limited to a grid of steps, see fast_nls.
+
+    :return: Estimated fundamental frequency in the units of Fs.
+    """
+    to_rad = 2 * np.pi / Fs
+    w = fast_nls(x, max(w_initial - wrange, 0) * to_rad, (w_initial + wrange) * to_rad, L)
+    return w / to_rad
+
+
 def generate_sine_wave(freq, sample_rate, duration, amplitude=1.0):
     t = np.arange(0, duration, 1 / sample_rate)  # Time vector
     sine_wave = amplitude * np.sin(2 * np.pi * freq * t)
     return sine_wave
 
 
-def harmonic_fitting_units(x, Fs, w):
-    # Function to return single "mean revolution" using least squares harmonic model fitting
-    # Called SOS analysis (Separate Original Signals)
+def harmonic_basis(n, w_rad, L):
+    """Cosines and sines of harmonics 1..L of w_rad at samples n, one column per harmonic and function."""
+    angles = np.multiply.outer(np.asarray(n, dtype=float) * w_rad, np.arange(1, L + 1))
+    return np.hstack((np.cos(angles), np.sin(angles)))
+
+
+def least_squares_harmonics(x, w_rad, L, chunk_size):
+    """
+    Least squares cosine and sine amplitudes of harmonics 1..L of w_rad in x.
+
+    The normal equations of the real harmonic model are accumulated chunk by
+    chunk, so memory use does not depend on the length of x.
+    """
+    normal_matrix = np.zeros((2 * L, 2 * L))
+    projection = np.zeros(2 * L)
+    for start in range(0, len(x), chunk_size):
+        chunk = np.asarray(x[start:start + chunk_size], dtype=float)
+        basis = harmonic_basis(np.arange(start, start + len(chunk)), w_rad, L)
+        normal_matrix += basis.T @ basis
+        projection += basis.T @ chunk
+    coefficients, _, _, _ = np.linalg.lstsq(normal_matrix, projection, rcond=None)
+    return coefficients
+
+
+def synchronous_average_harmonics(x, w_rad, L, chunk_size):
+    """
+    Cosine and sine amplitudes of harmonics 1..L of w_rad from the synchronous average of x.
+
+    x is resampled with linear interpolation to the same number of points per
+    revolution of w_rad and the complete revolutions are averaged, a chunk
+    of revolutions at a time. The harmonics are taken from the FFT of the average.
+
+    :return: Coefficients like least_squares_harmonics, or None if x is shorter than one revolution.
+    """
+    period = 2 * np.pi / w_rad
+    num_revolutions = int((len(x) - 1) // period)
+    points_per_revolution = max(int(np.ceil(period)), 2 * L + 2)
+    if num_revolutions < 1:
+        return None
+
+    revolutions_per_chunk = max(chunk_size // points_per_revolution, 1)
+    phase = np.arange(points_per_revolution) / points_per_revolution
+    revolution_sum = np.zeros(points_per_revolution)
+    for first in range(0, num_revolutions, revolutions_per_chunk):
+        revolutions = np.arange(first, min(first + revolutions_per_chunk, num_revolutions))
+        positions = (revolutions[:, None] + phase) * period
+        indexes = np.minimum(positions.astype(np.intp), len(x) - 2)
+        start, stop = indexes.min(), indexes.max() + 2
+        chunk = np.asarray(x[start:stop], dtype=float)
+        fractions = positions - indexes
+        revolution_sum += np.sum(
+            chunk[indexes - start] * (1 - fractions) + chunk[indexes - start + 1] * fractions, axis=0)
+
+    spectrum = np.fft.rfft(revolution_sum / num_revolutions)[1:L + 1] * 2 / points_per_revolution
+    return np.concatenate((spectrum.real, -spectrum.imag))
+
+
+def harmonic_fitting_units(x, Fs, w, method=None, chunk_size=None):
+    """
+    Single "mean revolution" of x at frequency w from a harmonic model.
+
+    Called SOS analysis (Separate Original Signals). The model has the
+    harmonics 1..settings.SOS_HARMONICS of w without a constant term. Both
+    methods process x in chunks with constant memory use and linear runtime.
+
+    :param Fs: Sampling rate of x.
+    :param w: Frequency of the revolution, in the units of Fs.
+    :param method: "least_squares" or "synchronous_average", settings.SOS_METHOD if None.
+        Synchronous averaging falls back to least squares on data shorter than one revolution.
+    :param chunk_size: Samples processed at a time, settings.SOS_CHUNK_SIZE if None.
+    :return: Model of one revolution, sampled at Fs.
+    """
     L = settings.SOS_HARMONICS
+    method = method or settings.SOS_METHOD
+    chunk_size = chunk_size or settings.SOS_CHUNK_SIZE
     w_rad = w / Fs * 2 * np.pi  # Convert to rad/sample for processing
-    L_array = np.arange(-L, L+1)
-    L_array = L_array[L_array != 0]
-    v_freqs = w_rad * L_array
-    Z = vandermonde(v_freqs, len(x))
-    a_est, _, _, _ = scipy.linalg.lstsq(Z, x, lapack_driver="gelsy")
-    # Reconstructing the signal using the harmonic model
-    real_y = (Z @ a_est).real
+
+    coefficients = None
+    if method == "synchronous_average":
+        coefficients = synchronous_average_harmonics(x, w_rad, L, chunk_size)
+    elif method != "least_squares":
+        raise ValueError(f"Unknown SOS method: {method}")
+    if coefficients is None:
+        coefficients = least_squares_harmonics(x, w_rad, L, chunk_size)
+
+    # Reconstructing one revolution using the harmonic model
     period_samples = int(Fs / w)
-    return real_y[:period_samples]
+    return harmonic_basis(np.arange(period_samples), w_rad, L) @ coefficients
+
 
 def get_n_peaks(data, n, threshold = 0):
     """
@@ -0,0 +1,239 @@
+"""
+Batched and incremental spectral estimation.
+
+CD analyses work on the profiles of the selected samples. These helpers take
+the profiles as one 2-D (profiles, positions) array and run each SciPy
+estimator once along the last axis instead of once per profile.
+
+MD spectra can be estimated incrementally with incremental_welch, which keeps
+the periodograms of Welch segments on a grid aligned to the start of the
+measurement so that a changed analysis range only needs the new segments.
+MD spectrograms use the same grid in tiled_spectrogram, which caches the
+columns in tiles and keeps time-decimated levels for overviews.
+"""
+import numpy as np
+from scipy.signal import coherence, spectrogram, welch
+
+from utils.measurement import get_sample_selection
+from utils.result_cache import ResultCache
+
+
+def get_profile_stack(segments, selected_samples, low_index, high_index) -> np.ndarray:
+    """
+    Stack the selected profiles of a channel, cut to low_index:high_index.
+
+    :param segments: Profiles of a channel, measurement.segments[channel].
+    :param selected_samples: Indexes of the profiles to use. Out of range indexes are skipped.
+    :return: 2-D float array with one row per valid selected sample, a view
+        to segments when the selected samples are consecutive.
+    """
+    segments = np.asarray(segments, dtype=float)
+    if segments.ndim != 2:
+        return np.empty((0, 0))
+    return segments[get_sample_selection(selected_samples, len(segments)), low_index:high_index]
+
+
+def mean_welch(profiles, fs, window, nperseg, noverlap, scaling='spectrum'):
+    """Welch power spectrum of every profile, averaged over the profiles."""
+    f, Pxx = welch(profiles, fs=fs, window=window, nperseg=nperseg,
+                   noverlap=noverlap, scaling=scaling, axis=-1)
+    return f, np.mean(np.atleast_2d(Pxx), axis=0)
+
+
+def mean_spectrogram(profiles, fs, window, nperseg, noverlap, mode='psd', scaling='density'):
+    """Spectrogram of every mean-removed profile, averaged over the profiles."""
+    profiles = np.atleast_2d(profiles)
+    profiles = profiles - np.mean(profiles, axis=-1, keepdims=True)
+    freqs, bins, Pxx = spectrogram(profiles, fs=fs, window=window, nperseg=nperseg,
+                                   noverlap=noverlap, mode=mode, scaling=scaling, axis=-1)
+    return freqs, bins, np.mean(Pxx, axis=0)
+
+
+def normalize_profiles(profiles):
+    """
+    Normalize every profile to zero mean and unit standard deviation.
+
+    :return: Tuple of the normalized profiles and a mask of the profiles that
+        could be normalized. Constant and non-finite profiles are left out.
+    """
+    profiles = np.atleast_2d(np.asarray(profiles, dtype=float))
+    if profiles.shape[-1] < 2:
+        return profiles[:0], np.zeros(len(profiles), dtype=bool)
+    std = np.std(profiles, axis=-1, keepdims=True)
+    valid = (np.isfinite(std) & (std != 0)).reshape(-1)
+    normalized = (profiles[valid] - np.mean(profiles[valid], axis=-1, keepdims=True)) / std[valid]
+    return normalized, valid
+
+
+def mean_coherence(profiles1, profiles2, fs, window, nperseg, noverlap):
+    """
+    Coherence of every pair of profiles, averaged over the pairs.
+
+    Pairs where either profile is constant are skipped.
+
+    :return: Tuple of frequencies and mean coherence, or None if no pair could be used.
+    """
+    normalized1, valid1 = normalize_profiles(profiles1)
+    normalized2, valid2 = normalize_profiles(profiles2)
+    valid = valid1 & valid2
+    if not valid.any():
+        return None
+    f, Cxy = coherence(normalized1[valid[valid1]], normalized2[valid[valid2]], fs=fs,
+                       window=window, nperseg=nperseg, noverlap=noverlap, axis=-1)
+    return f, np.mean(Cxy, axis=0)
+
+
+def get_segment_grid_range(low_index, high_index, nperseg, noverlap):
+    """
+    Grid segments that fit inside low_index:high_index.
+
+    Segment k of the grid covers samples k * step:k * step + nperseg, where
+    step = nperseg - noverlap.
+
+    :return: Tuple of the first segment and the segment after the last one.
+    """
+    step = nperseg - noverlap
+    first = -(-int(low_index) // step)
+    stop = (int(high_index) - nperseg) // step + 1
+    return first, max(first, stop)
+
+
+def segment_periodograms(data, first, stop, fs, window, nperseg, noverlap, scaling='spectrum'):
+    """
+    Periodograms of grid segments first:stop of data, one row per segment.
+
+    Rows are scaled like welch with the same parameters, so their mean is the
+    Welch estimate over the segments.
+    """
+    step = nperseg - noverlap
+    samples = np.asarray(data[first * step:(stop - 1) * step + nperseg], dtype=float)
+    f, _, Sxx = spectrogram(samples, fs=fs, window=window, nperseg=nperseg, noverlap=noverlap,
+                            detrend='constant', scaling=scaling, mode='psd')
+    return f, Sxx.T
+
+
+def incremental_welch(cache: ResultCache, key, data, low_index, high_index, fs, window,
+                      nperseg, noverlap, scaling='spectrum'):
+    """
+    Welch spectrum of data[low_index:high_index] from cached grid segment periodograms.
+
+    Periodograms of the grid segments are kept in cache under key as one
+    contiguous block of segments. Only segments missing from the block are
+    computed, and the block is extended while it fits in the cache budget.
+    Segments are aligned to the start of data instead of low_index, so the
+    result can differ slightly from welch over the same range. If no grid
+    segment fits in the range, plain welch is used.
+
+    :param key: Cache key identifying data and the spectral parameters.
+    :return: Tuple of frequencies and averaged power spectrum.
+    """
+    first, stop = get_segment_grid_range(low_index, high_index, nperseg, noverlap)
+    if stop <= first:
+        return welch(np.asarray(data[low_index:high_index], dtype=float), fs=fs, window=window,
+                     nperseg=nperseg, noverlap=noverlap, scaling=scaling)
+
+    cached = cache.get(key)
+    if cached is not None:
+        f, start, periodograms = cached
+        end = start + len(periodograms)
+    if cached is None or first > end or stop < start:
+        f, periodograms = segment_periodograms(
+            data, first, stop, fs, window, nperseg, noverlap, scaling)
+        start = first
+    else:
+        blocks = [periodograms]
+        if first < start:
+            f, before = segment_periodograms(
+                data, first, start, fs, window, nperseg, noverlap, scaling)
+            blocks.insert(0, before)
+        if stop > end:
+            f, after = segment_periodograms(
+                data, end, stop, fs, window, nperseg, noverlap, scaling)
+            blocks.append(after)
+        if len(blocks) > 1:
+            periodograms = np.concatenate(blocks)
+            start = min(start, first)
+            if cache.max_bytes is not None and periodograms.nbytes > cache.max_bytes:
+                periodograms = periodograms[first - start:stop - start]
+                start = first
+
+    if cached is None or start != cached[1] or len(periodograms) != len(cached[2]):
+        cache.put(key, (f, start, periodograms))
+    return f, np.mean(periodograms[first - start:stop - start], axis=0)
+
+
+def get_spectrogram_tile(cache: ResultCache, key, data, level, tile, num_columns, fs, window,
+                         nperseg, noverlap, tile_columns, factor):
+    """
+    Tile of a spectrogram pyramid level, from cache or computed.
+
+    Level 0 tiles hold tile_columns grid segment periodograms. A column of
+    level n is the average of factor columns of level n - 1, averaged in
+    amplitude so that mean amplitudes over the columns do not depend on the level.
+
+    :return: Tuple of frequencies and the columns of the tile, one row per column.
+    """
+    def compute():
+        if level == 0:
+            first = tile * tile_columns
+            return segment_periodograms(data, first, min(first + tile_columns, num_columns),
+                                        fs, window, nperseg, noverlap, scaling='density')
+
+        child_columns = -(-num_columns // factor**(level - 1))
+        child_tiles = range(tile * factor, min((tile + 1) * factor, -(-child_columns // tile_columns)))
+        f = None
+        children = []
+        for child in child_tiles:
+            f, columns = get_spectrogram_tile(cache, key, data, level - 1, child, num_columns, fs, window,
+                                              nperseg, noverlap, tile_columns, factor)
+            children.append(columns)
+        amplitudes = np.sqrt(np.concatenate(children))
+        group_starts = np.arange(0, len(amplitudes), factor)
+        group_sizes = np.diff(np.append(group_starts, len(amplitudes)))[:, None]
+        return f, np.square(np.add.reduceat(amplitudes, group_starts, axis=0) / group_sizes)
+
+    return cache.get_or_compute((key, level, tile), compute)
+
+
+def tiled_spectrogram(cache: ResultCache, key, data, low_index, high_index, fs, window,
+                      nperseg, noverlap, max_columns, tile_columns=256, factor=4):
+    """
+    Power spectral density spectrogram of data[low_index:high_index] from cached tiles.
+
+    Columns are grid segments aligned to the start of data, like in
+    incremental_welch, with the mean of each segment removed. They are
+    computed in tiles of tile_columns columns, so a changed range reuses the
+    tiles it shares with earlier ranges. If the range has more than
+    max_columns columns, the first decimated level that fits is used instead.
+
+    :param key: Cache key identifying data and the spectral parameters.
+    :param max_columns: Maximum number of columns to return, usually the plot width in pixels.
+    :return: Tuple of frequencies, column distances from low_index in units of
+        1 / fs and the spectrogram with one column per time step, or None if no
+        grid segment fits in the range.
+    """
+    first, stop = get_segment_grid_range(low_index, high_index, nperseg, noverlap)
+    if stop <= first:
+        return None
+    step = nperseg - noverlap
+    num_columns = (len(data) - nperseg) // step + 1
+
+    level = 0
+    while -(-stop // factor**level) - first // factor**level > max(int(max_columns), 1):
+        level += 1
+    level_size = factor**level
+    level_first = first // level_size
+    level_stop = -(-stop // level_size)
+
+    f = None
+    tiles = []
+    for tile in range(level_first // tile_columns, (level_stop - 1) // tile_columns + 1):
+        f, columns = get_spectrogram_tile(cache, key, data, level, tile, num_columns, fs, window,
+                                          nperseg, noverlap, tile_columns, factor)
+        tiles.append(columns)
+    offset = level_first // tile_columns * tile_columns
+    columns = np.concatenate(tiles)[level_first - offset:level_stop - offset]
+
+    centers = np.clip(np.arange(level_first, level_stop) * level_size + (level_size - 1) / 2, first, stop - 1)
+    bins = (centers * step + nperseg / 2 - low_index) / fs
+    return f, bins, columns.T
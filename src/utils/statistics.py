@@ -38,3 +38,103 @@ def normalized_least_squares_slope(data, positions=None):
         return 0.0
 
     return float(np.sum(x_offset * y_offset) / denominator)
+
+
+def get_finite_rows(block) -> np.ndarray:
+    """Rows of a 2-D block without non-finite values, the block itself if all rows are finite."""
+    block = np.asarray(block, dtype=float)
+    finite = np.isfinite(block).all(axis=1)
+    return block if finite.all() else block[finite]
+
+
+class StreamingCovariance:
+    """
+    Covariance and correlation of channels accumulated over blocks of rows.
+
+    Blocks are merged with the pairwise update of Chan et al., which is as
+    stable as Welford's method but handles a whole block with one matrix
+    product. Rows with non-finite values are skipped. The minimum and
+    maximum of each channel are kept as well.
+
+    :param num_channels: Number of columns in the blocks.
+    """
+
+    def __init__(self, num_channels: int):
+        self.count = 0
+        self.mean = np.zeros(num_channels)
+        self.scatter = np.zeros((num_channels, num_channels))
+        self.minimum = np.full(num_channels, np.inf)
+        self.maximum = np.full(num_channels, -np.inf)
+
+    def update(self, block):
+        """Add a 2-D block with one row per observation and one column per channel."""
+        block = get_finite_rows(block)
+        block_count = len(block)
+        if block_count == 0:
+            return
+
+        block_mean = block.mean(axis=0)
+        centered = block - block_mean
+        total = self.count + block_count
+        delta = block_mean - self.mean
+        self.scatter += centered.T @ centered + np.outer(delta, delta) * self.count * block_count / total
+        self.mean += delta * block_count / total
+        self.count = total
+        self.minimum = np.minimum(self.minimum, block.min(axis=0))
+        self.maximum = np.maximum(self.maximum, block.max(axis=0))
+
+    def covariance(self, ddof: int = 1) -> np.ndarray:
+        if self.count <= ddof:
+            return np.full_like(self.scatter, np.nan)
+        return self.scatter / (self.count - ddof)
+
+    def correlation(self) -> np.ndarray:
+        """Pearson correlation matrix, NaN for channels without variation."""
+        std = np.sqrt(np.diag(self.scatter))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = self.scatter / np.outer(std, std)
+        correlation[~np.isfinite(correlation)] = np.nan
+        return np.clip(correlation, -1.0, 1.0)
+
+
+def get_bin_indexes(values, minimum, maximum, bins):
+    """Index of the equal width bin of each value between minimum and maximum, maximum in the last bin."""
+    width = (maximum - minimum) / bins
+    if width <= 0 or not np.isfinite(width):
+        return np.zeros(len(values), dtype=np.intp)
+    return np.clip(((values - minimum) / width).astype(np.intp), 0, bins - 1)
+
+
+def pairwise_histograms(data, minimum, maximum, bins, block_size, channel_bins=None):
+    """
+    2-D histograms of every pair of channels and 1-D histograms of every channel.
+
+    Rows are processed in blocks of block_size, and rows with non-finite
+    values are skipped like in StreamingCovariance.
+
+    :param data: 2-D array with one row per observation and one column per channel.
+    :param minimum: Lower edge of the bins of each channel.
+    :param maximum: Upper edge of the bins of each channel.
+    :param bins: Number of bins along each channel in the 2-D histograms.
+    :param channel_bins: Number of bins in the 1-D histograms, bins if None.
+    :return: Array (channel y, channel x, bin y, bin x) of counts and array (channel, bin) of counts.
+    """
+    num_channels = data.shape[1]
+    pair_counts = np.zeros((num_channels, num_channels, bins, bins), dtype=np.int64)
+    channel_bins = channel_bins or bins
+    channel_counts = np.zeros((num_channels, channel_bins), dtype=np.int64)
+    for start in range(0, len(data), block_size):
+        block = get_finite_rows(data[start:start + block_size])
+        indexes = [get_bin_indexes(block[:, channel], minimum[channel], maximum[channel], bins)
+                   for channel in range(num_channels)]
+        for channel_y in range(num_channels):
+            channel_counts[channel_y] += np.bincount(get_bin_indexes(
+                block[:, channel_y], minimum[channel_y], maximum[channel_y], channel_bins), minlength=channel_bins)
+            for channel_x in range(channel_y + 1, num_channels):
+                pair_counts[channel_y, channel_x] += np.bincount(
+                    indexes[channel_y] * bins + indexes[channel_x], minlength=bins * bins).reshape(bins, bins)
+
+    for channel_y in range(num_channels):
+        for channel_x in range(channel_y):
+            pair_counts[channel_y, channel_x] = pair_counts[channel_x, channel_y].T
+    return pair_counts, channel_counts
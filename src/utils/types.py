@@ -3,6 +3,7 @@ from typing import Any, Optional, Callable, Literal, Protocol, ClassVar
 from abc import abstractmethod
 from PyQt6.QtWidgets import QPushButton
 from utils.measurement import Measurement
+from utils.load_progress import LoadProgress
 import json
 
 AnalysisType = Literal["MD", "CD"]
@@ -73,20 +74,30 @@ class MainWindowSection:
     modules: list[MainWindowSectionModule]
 
 class LoaderModule(Protocol):
-    """Protocol defining the interface for loader modules."""
+    """
+    Protocol defining the interface for loader modules.
+
+    Loaders may define is_cacheable() returning False to bypass the
+    measurement cache, e.g. when they ask the user for values while loading.
+    """
 
     menu_text: ClassVar[str]
     file_types: ClassVar[str]
 
     @staticmethod
     @abstractmethod
-    def load_data(fileNames: list[str], parent: Optional[Any] = None) -> Measurement | None:
+    def load_data(fileNames: list[str], parent: Optional[Any] = None, progress: Optional[LoadProgress] = None) -> Measurement | None:
         """
         Load data from the specified files.
 
+        Loaders that accept progress are run in a background thread. They
+        report their stages through it, stop with LoadCancelledError when the
+        user cancels, and open any dialogs with progress.run_in_main_thread.
+
         Args:
             fileNames: List of file paths to load data from
             parent: Optional parent widget for loader-owned dialogs
+            progress: Optional progress reporter for background loading
         """
         pass
 